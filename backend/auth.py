@@ -1,18 +1,30 @@
 # backend/auth.py
+import asyncio
+import contextvars
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
-from typing import Optional
-from fastapi import Depends, HTTPException, status, APIRouter
+from typing import Iterable, List, Optional
+from fastapi import Depends, Form, Header, HTTPException, status, APIRouter
+from fastapi.concurrency import run_in_threadpool
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 from pydantic import BaseModel
 
-from . import storage
+from . import metrics, storage
 
 # --- Config ---
 SECRET_KEY = "replace-this-with-a-secret-key"  # 🔐 change in production
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 60
+TOKEN_CACHE_SECONDS = 30       # how long decoded claims are reused without jwt.decode
+TOKEN_CACHE_SIZE = 10000
+HASH_WORKERS = max(2, min(4, os.cpu_count() or 1))   # bcrypt releases the GIL, so threads scale
+HASH_QUEUE_LIMIT = 64          # hashing calls running or waiting before logins get a 429
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/login")
@@ -24,9 +36,11 @@ class Token(BaseModel):
     access_token: str
     token_type: str
     role: str
+    tenant: str
 
 class TokenData(BaseModel):
     username: Optional[str] = None
+    tenant: Optional[str] = None
 
 class FacultyCreate(BaseModel):
     username: str
@@ -37,27 +51,59 @@ class FacultyUpdate(BaseModel):
 
 # ---------------- Utils ----------------
 def verify_password(plain_password, hashed_password):
-    return pwd_context.verify(plain_password, hashed_password)
+    with metrics.span("bcrypt.verify"):
+        return pwd_context.verify(plain_password, hashed_password)
 
 def get_password_hash(password):
-    return pwd_context.hash(password)
+    with metrics.span("bcrypt.hash"):
+        return pwd_context.hash(password)
+
+def get_user(username: str) -> Optional[dict]:
+    """Indexed lookup; usernames are unique so there is at most one match."""
+    users = storage.find("users", username=username)
+    return users[0] if users else None
+
+# ---------------- Hashing pool ----------------
+# bcrypt at cost 12 is ~250ms of CPU; keeping it on its own small pool means a burst
+# of logins queues here instead of eating the threads that serve timetable reads.
+_hash_pool = ThreadPoolExecutor(max_workers=HASH_WORKERS, thread_name_prefix="bcrypt")
+_hash_slots = threading.BoundedSemaphore(HASH_QUEUE_LIMIT)
+_default_admin_lock = threading.Lock()
+
+async def run_hashing(fn, *args):
+    """Run a bcrypt-bound call on the hashing pool, or 429 right away when it is full."""
+    if not _hash_slots.acquire(blocking=False):
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Too many logins in progress, try again shortly",
+            headers={"Retry-After": "1"},
+        )
+    # In the caller's context, so storage calls inside hit the caller's tenant
+    future = _hash_pool.submit(contextvars.copy_context().run, fn, *args)
+    # Freed when the work ends, not when the client gives up on it
+    future.add_done_callback(lambda _: _hash_slots.release())
+    return await asyncio.wrap_future(future)
+
+def hash_passwords(passwords: Iterable[str]) -> List[str]:
+    """Hash many passwords in parallel (bulk imports); no queue limit, callers are admins."""
+    return list(_hash_pool.map(get_password_hash, passwords))
 
 def authenticate_user(username: str, password: str):
-    users = storage.get_state().get("users", [])
-
-    # ✅ Hardcode default admin if none exists
-    if not any(u["role"] == "admin" for u in users):
-        default_admin = {
-            "username": "admin",
-            "hashed_password": get_password_hash("admin"),  # username=admin, password=admin
-            "role": "admin",
-        }
-        users.append(default_admin)
-        storage.set_state({"users": users})
-
-    for u in users:
-        if u["username"] == username and verify_password(password, u["hashed_password"]):
-            return u
+    # ✅ Hardcode default admin if none exists (only writes when there is no admin yet,
+    # and never next to a non-admin user who already has the name)
+    if not storage.find("users", role="admin") and not get_user("admin"):
+        with _default_admin_lock:   # logins run in parallel on the hashing pool
+            if not storage.find("users", role="admin") and not get_user("admin"):
+                default_admin = {
+                    "username": "admin",
+                    "hashed_password": get_password_hash("admin"),  # username=admin, password=admin
+                    "role": "admin",
+                }
+                storage.insert_new("users", "username", default_admin)
+
+    user = get_user(username)
+    if user and verify_password(password, user["hashed_password"]):
+        return user
     return None
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
@@ -66,61 +112,97 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode.update({"exp": expire})
     return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
 
-def get_current_user(token: str = Depends(oauth2_scheme)):
+# token -> (cached until, claims); only tokens that decoded cleanly are kept
+_token_cache: "OrderedDict[str, tuple]" = OrderedDict()
+_token_cache_lock = threading.Lock()
+
+def decode_token(token: str) -> dict:
+    """jwt.decode with a short-lived cache, so every request doesn't re-verify the signature."""
+    now = time.time()
+    with _token_cache_lock:
+        hit = _token_cache.get(token)
+        if hit is not None and hit[0] > now:
+            _token_cache.move_to_end(token)
+            return hit[1]
+    with metrics.span("auth.decode"):
+        claims = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    # Never serve a token from cache past its own expiry
+    until = min(now + TOKEN_CACHE_SECONDS, claims.get("exp", now))
+    with _token_cache_lock:
+        _token_cache[token] = (until, claims)
+        _token_cache.move_to_end(token)
+        while len(_token_cache) > TOKEN_CACHE_SIZE:
+            _token_cache.popitem(last=False)
+    return claims
+
+async def get_current_user(token: str = Depends(oauth2_scheme)):
+    """
+    The user behind a bearer token. Also makes the token's tenant (college)
+    current, so the endpoint and the threads it uses read and write that
+    college's storage shard only.
+    """
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        payload = decode_token(token)
         username: str = payload.get("sub")
         if username is None:
             raise credentials_exception
-    except JWTError:
+        # Tokens issued before tenants existed belong to the default college
+        storage.use_tenant(payload.get("tenant"))
+    except (JWTError, ValueError):
         raise credentials_exception
 
-    users = storage.get_state().get("users", [])
-    for u in users:
-        if u["username"] == username:
-            return u
+    # Looked up on every request, so a deleted user loses access right away
+    user = await run_in_threadpool(get_user, username)
+    if user:
+        return user
     raise credentials_exception
 
 # ---------------- Routes ----------------
 @router.post("/login", response_model=Token)
-def login(form_data: OAuth2PasswordRequestForm = Depends()):
-    user = authenticate_user(form_data.username, form_data.password)
+async def login(form_data: OAuth2PasswordRequestForm = Depends(), tenant: Optional[str] = Form(None),
+                x_tenant: Optional[str] = Header(None)):
+    """Log in to one college: the `tenant` form field or X-Tenant header, else the default one."""
+    tenant = tenant or x_tenant or storage.DEFAULT_TENANT
+    if not storage.tenant_exists(tenant):
+        raise HTTPException(status_code=400, detail=f"Unknown college '{tenant}'")
+    storage.use_tenant(tenant)
+    user = await run_hashing(authenticate_user, form_data.username, form_data.password)
     if not user:
         raise HTTPException(status_code=400, detail="Invalid username or password")
 
     access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = create_access_token(
-        data={"sub": user["username"]}, expires_delta=access_token_expires
+        data={"sub": user["username"], "tenant": tenant}, expires_delta=access_token_expires
     )
-    return {"access_token": access_token, "token_type": "bearer", "role": user["role"]}
+    return {"access_token": access_token, "token_type": "bearer", "role": user["role"], "tenant": tenant}
 
 # ✅ Current logged-in user
 @router.get("/me")
 def read_users_me(current_user: dict = Depends(get_current_user)):
-    return {"username": current_user["username"], "role": current_user["role"]}
+    return {"username": current_user["username"], "role": current_user["role"], "tenant": storage.current_tenant()}
 
 # ✅ Admin creates faculty accounts
 @router.post("/register/faculty")
-def register_faculty(data: FacultyCreate, current_user: dict = Depends(get_current_user)):
+async def register_faculty(data: FacultyCreate, current_user: dict = Depends(get_current_user)):
     if current_user["role"] != "admin":
         raise HTTPException(status_code=403, detail="Not authorized")
 
-    users = storage.get_state().get("users", [])
-    if any(u["username"] == data.username for u in users):
+    # Checked before paying for bcrypt, and again by insert_new: another request may take the name meanwhile
+    if await run_in_threadpool(get_user, data.username):
         raise HTTPException(status_code=400, detail="Username already exists")
 
     new_faculty = {
         "username": data.username,
-        "hashed_password": get_password_hash(data.password),
+        "hashed_password": await run_hashing(get_password_hash, data.password),
         "role": "faculty",
     }
-    users.append(new_faculty)
-    storage.set_state({"users": users})
+    if not await run_in_threadpool(storage.insert_new, "users", "username", new_faculty, actor=current_user["username"]):
+        raise HTTPException(status_code=400, detail="Username already exists")
 
     return {"msg": "Faculty registered successfully", "username": data.username}
 
@@ -129,24 +211,25 @@ def register_faculty(data: FacultyCreate, current_user: dict = Depends(get_curre
 def list_faculty(current_user: dict = Depends(get_current_user)):
     if current_user["role"] != "admin":
         raise HTTPException(status_code=403, detail="Not authorized")
-    users = storage.get_state().get("users", [])
-    return [u for u in users if u["role"] == "faculty"]
+    return storage.find("users", role="faculty")
 
 # ✅ Admin updates faculty password
 @router.put("/faculty/{username}")
-def update_faculty(username: str, data: FacultyUpdate, current_user: dict = Depends(get_current_user)):
+async def update_faculty(username: str, data: FacultyUpdate, current_user: dict = Depends(get_current_user)):
     if current_user["role"] != "admin":
         raise HTTPException(status_code=403, detail="Not authorized")
 
-    state = storage.get_state()
-    users = state.get("users", [])
-    for u in users:
-        if u["username"] == username and u["role"] == "faculty":
-            u["hashed_password"] = get_password_hash(data.new_password)
-            storage.set_state({"users": users})
-            return {"msg": "Faculty password updated", "username": username}
+    match = {"username": username, "role": "faculty"}
+    if not await run_in_threadpool(storage.find, "users", **match):
+        raise HTTPException(status_code=404, detail="Faculty not found")
 
-    raise HTTPException(status_code=404, detail="Faculty not found")
+    hashed = await run_hashing(get_password_hash, data.new_password)
+    updated = await run_in_threadpool(
+        storage.update, "users", match, {"hashed_password": hashed}, actor=current_user["username"]
+    )
+    if not updated:   # deleted while the password was hashing
+        raise HTTPException(status_code=404, detail="Faculty not found")
+    return {"msg": "Faculty password updated", "username": username}
 
 # ✅ Admin deletes faculty
 @router.delete("/faculty/{username}")
@@ -154,12 +237,7 @@ def delete_faculty(username: str, current_user: dict = Depends(get_current_user)
     if current_user["role"] != "admin":
         raise HTTPException(status_code=403, detail="Not authorized")
 
-    state = storage.get_state()
-    users = state.get("users", [])
-    new_users = [u for u in users if not (u["username"] == username and u["role"] == "faculty")]
-
-    if len(new_users) == len(users):
+    if not storage.delete("users", {"username": username, "role": "faculty"}, actor=current_user["username"]):
         raise HTTPException(status_code=404, detail="Faculty not found")
 
-    storage.set_state({"users": new_users})
     return {"msg": f"Faculty {username} deleted successfully"}
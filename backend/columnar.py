@@ -0,0 +1,127 @@
+# backend/columnar.py
+import base64
+import sys
+from array import array
+from typing import Any, Dict, Iterator, List, Optional
+
+COLUMNS = ("day", "period", "room", "teacher", "subject", "batch")
+FORMAT = "columnar/1"
+
+
+def _encode(codes: array) -> str:
+    if sys.byteorder == "big":
+        codes = array(codes.typecode, codes)
+        codes.byteswap()
+    return base64.b64encode(codes.tobytes()).decode("ascii")
+
+
+def _decode(text: str, typecode: str) -> array:
+    codes = array(typecode)
+    codes.frombytes(base64.b64decode(text))
+    if sys.byteorder == "big":
+        codes.byteswap()
+    return codes
+
+
+class Timetable:
+    """
+    A timetable as one small-int array per column plus a lookup table of the
+    distinct values in each column. Row i is
+    {c: tables[c][codes[c][i]] for c in COLUMNS}; dicts are only built when
+    someone iterates.
+    """
+
+    __slots__ = ("tables", "codes", "extra")
+
+    def __init__(self, tables: Dict[str, list], codes: Dict[str, array], extra: Optional[Dict[int, dict]] = None):
+        self.tables = tables
+        self.codes = codes
+        self.extra = extra or {}   # row index -> fields outside COLUMNS, rarely used
+
+    @classmethod
+    def from_rows(cls, rows) -> "Timetable":
+        tables: Dict[str, list] = {c: [] for c in COLUMNS}
+        lookup: Dict[str, Dict[Any, int]] = {c: {} for c in COLUMNS}
+        columns: Dict[str, list] = {c: [] for c in COLUMNS}
+        extra = {}
+        for n, row in enumerate(rows):
+            for c in COLUMNS:
+                value = row.get(c)
+                code = lookup[c].get(value)
+                if code is None:
+                    code = lookup[c][value] = len(tables[c])
+                    tables[c].append(value)
+                columns[c].append(code)
+            if len(row) > len(COLUMNS):
+                more = {k: v for k, v in row.items() if k not in COLUMNS}
+                if more:
+                    extra[n] = more
+        codes = {c: array("H" if len(tables[c]) <= 0xFFFF else "I", columns[c]) for c in COLUMNS}
+        return cls(tables, codes, extra)
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "Timetable":
+        typecodes = data.get("typecodes") or {}
+        tables = {c: list(data["tables"][c]) for c in COLUMNS}
+        codes = {c: _decode(data["codes"][c], typecodes.get(c, "H")) for c in COLUMNS}
+        extra = {int(k): dict(v) for k, v in (data.get("extra") or {}).items()}
+        return cls(tables, codes, extra)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """JSON-ready stored form: lookup tables plus base64 little-endian code arrays."""
+        data = {
+            "format": FORMAT,
+            "size": len(self),
+            "tables": {c: list(self.tables[c]) for c in COLUMNS},
+            "typecodes": {c: self.codes[c].typecode for c in COLUMNS},
+            "codes": {c: _encode(self.codes[c]) for c in COLUMNS},
+        }
+        if self.extra:
+            data["extra"] = {str(k): v for k, v in self.extra.items()}
+        return data
+
+    def __len__(self) -> int:
+        return len(self.codes["day"])
+
+    def row(self, i: int) -> Dict[str, Any]:
+        entry = {c: self.tables[c][self.codes[c][i]] for c in COLUMNS}
+        if i in self.extra:
+            entry.update(self.extra[i])
+        return entry
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        return (self.row(i) for i in range(len(self)))
+
+    def rows(self) -> List[Dict[str, Any]]:
+        return list(self)
+
+
+# ------------------- Helpers for stored values -------------------
+
+def is_packed(value) -> bool:
+    return isinstance(value, dict) and value.get("format") == FORMAT
+
+
+def unpack(value) -> Timetable:
+    """Timetable from the stored form, a Timetable, or legacy list-of-dict rows."""
+    if isinstance(value, Timetable):
+        return value
+    if is_packed(value):
+        return Timetable.from_dict(value)
+    return Timetable.from_rows(value or [])
+
+
+def pack(value) -> Dict[str, Any]:
+    """Stored form of a timetable given in any shape unpack() takes."""
+    if is_packed(value):
+        return dict(value)
+    return unpack(value).to_dict()
+
+
+def render(value) -> List[Dict[str, Any]]:
+    """The API's list-of-rows shape; [] for a missing timetable."""
+    if value is None:
+        return []
+    if isinstance(value, (list, tuple)):
+        return [dict(e) for e in value]
+    return unpack(value).rows()
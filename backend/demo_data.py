@@ -1,4 +1,6 @@
 # backend/demo_data.py
+import random
+
 from .auth import get_password_hash
 
 def get_demo_state():
@@ -50,3 +52,102 @@ def get_demo_state():
         ],
         "latest_timetable": []
     }
+
+
+# ------------------- Synthetic institutes -------------------
+
+DAYS = ["Mon", "Tue", "Wed", "Thu", "Fri"]
+TEACHING_PERIODS = [1, 2, 3, 5, 6, 7, 8]   # the default 09:00-16:00 day; period 4 is lunch
+LAB_STARTS = [1, 2, 5, 6, 7]               # starts of two teaching periods in a row
+BATCH_SIZES = (40, 50, 60, 70)
+ROOM_CAPACITIES = (40, 60, 60, 80, 120)
+
+
+def get_synthetic_state(
+    batches: int = 6,
+    teachers: int = 12,
+    rooms: int = 6,
+    subjects_per_batch: int = 6,
+    lab_share: float = 0.2,
+    availability: float = 1.0,
+    fixed_share: float = 0.0,
+    seed: int = 0,
+) -> dict:
+    """
+    A made-up institute for benchmarks and load tests, reproducible for a given seed.
+
+    - `lab_share`: share of each batch's subjects that are labs (one 2-period session a week, in a lab room).
+      The rest are 3 single periods a week.
+    - `availability`: share of the teaching periods each teacher can teach (1.0 = no restriction).
+    - `fixed_share`: share of subjects with one class pinned to a fixed slot. Fixed slots never clash
+      with each other or with a teacher's availability.
+
+    There are no users (benchmarks skip bcrypt); every teacher gets the load it is assigned.
+    """
+    rng = random.Random(seed)
+    n_labs = max(1, rooms // 5) if lab_share > 0 else 0
+    room_list = [{"name": f"Lab {i + 1}", "capacity": 80, "type": "lab"} for i in range(n_labs)]
+    room_list += [{"name": f"Room {100 + i + 1}", "capacity": rng.choice(ROOM_CAPACITIES), "type": "classroom"}
+                  for i in range(rooms - n_labs)]
+
+    teacher_list = []
+    for i in range(teachers):
+        keep = max(2, round(len(TEACHING_PERIODS) * availability))
+        periods = []
+        if keep < len(TEACHING_PERIODS):
+            chosen = set(rng.sample(TEACHING_PERIODS, keep))
+            if not any(q + 1 in chosen for q in chosen):
+                chosen.update(rng.choice(LAB_STARTS) + k for k in (0, 1))   # room for a 2-period lab
+            periods = sorted(chosen)
+        teacher_list.append({"name": f"Teacher {i + 1}", "code": f"T{i + 1}", "max_load": 0, "avail_periods": periods})
+
+    batch_list = [{"name": f"B{i + 1}", "size": rng.choice(BATCH_SIZES), "semester": 1 + i % 8, "max_per_day": 6}
+                  for i in range(batches)]
+
+    subjects = []
+    taken = set()          # (("teacher"|"batch", name), day, period) already pinned
+    n_labs_per_batch = round(subjects_per_batch * lab_share)
+    for b in batch_list:
+        for j in range(subjects_per_batch):
+            lab = j < n_labs_per_batch
+            teacher = teacher_list[len(subjects) % teachers]
+            s = {
+                "name": f"{b['name']} {'Lab' if lab else 'Subject'} {j + 1}",
+                "code": f"{b['name']}-S{j + 1}",
+                "batch": b["name"],
+                "teacher_code": teacher["code"],
+                "classes_per_week": 1 if lab else 3,
+                "duration": 2 if lab else 1,
+                "fixed_slots": None,
+            }
+            teacher["max_load"] += s["classes_per_week"] * s["duration"]
+            if rng.random() < fixed_share:
+                s["fixed_slots"] = _pick_fixed_slot(rng, s, teacher, taken)
+            subjects.append(s)
+
+    return {
+        "users": [],
+        "config": {"days": list(DAYS)},
+        "rooms": room_list,
+        "teachers": teacher_list,
+        "batches": batch_list,
+        "subjects": subjects,
+        "latest_timetable": [],
+    }
+
+
+def _pick_fixed_slot(rng: random.Random, subject: dict, teacher: dict, taken: set):
+    """One "Day-period" start that keeps the whole session inside teaching hours and clash-free, or None."""
+    allowed = set(teacher["avail_periods"] or TEACHING_PERIODS)
+    owners = (("teacher", teacher["code"]), ("batch", subject["batch"]))
+    options = []
+    for day in DAYS:
+        for start in TEACHING_PERIODS:
+            cover = range(start, start + subject["duration"])
+            if all(q in allowed for q in cover) and not any((o, day, q) in taken for o in owners for q in cover):
+                options.append((day, start))
+    if not options:
+        return None
+    day, start = rng.choice(options)
+    taken.update((o, day, q) for o in owners for q in range(start, start + subject["duration"]))
+    return [f"{day}-{start}"]
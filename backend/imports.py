@@ -0,0 +1,228 @@
+# backend/imports.py
+import csv
+import io
+import itertools
+import json
+import typing
+from typing import Any, Dict, Iterator, List, Tuple
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.concurrency import run_in_threadpool
+from pydantic import ValidationError
+
+from . import models, storage
+from .auth import get_current_user, hash_passwords
+
+MAX_IMPORT_ROWS = 50000
+MAX_IMPORT_BYTES = 32 * 1024 * 1024
+MAX_REPORTED_ERRORS = 200
+
+# Entity kind -> schema each row is validated against
+IMPORT_MODELS = {
+    "rooms": models.Room,
+    "teachers": models.Teacher,
+    "subjects": models.Subject,
+    "batches": models.Batch,
+    "branches": models.Branch,
+    "users": models.User,
+}
+
+router = APIRouter(prefix="/import", tags=["import"])
+
+
+# ------------------- Parsing -------------------
+
+def _detect_format(request: Request, fmt: str | None) -> str:
+    if fmt:
+        return fmt
+    content_type = request.headers.get("content-type", "").split(";")[0].strip().lower()
+    if content_type in ("application/x-ndjson", "application/ndjson", "application/jsonl"):
+        return "ndjson"
+    if content_type in ("text/csv", "application/csv"):
+        return "csv"
+    return "json"
+
+
+def _list_fields(model) -> set:
+    """Fields typed as lists, which CSV cells carry as "1;2;3" or a JSON array."""
+    fields = set()
+    for name, field in model.model_fields.items():
+        annotation = field.annotation
+        args = typing.get_args(annotation) if typing.get_origin(annotation) is typing.Union else (annotation,)
+        if any(typing.get_origin(a) in (list, List) for a in args):
+            fields.add(name)
+    return fields
+
+
+def _split_cell(value: str):
+    if value.startswith("["):
+        try:
+            return json.loads(value)
+        except ValueError:
+            return value  # left as-is so validation reports it against this row
+    return [v.strip() for v in value.split(";") if v.strip()]
+
+
+def _csv_rows(text: str, model) -> Iterator[Tuple[int, Any]]:
+    list_fields = _list_fields(model)
+    reader = csv.DictReader(io.StringIO(text))
+    for record in reader:
+        row = {}
+        for key, value in record.items():
+            if key is None or value is None:
+                continue
+            key, value = key.strip(), value.strip()
+            if value == "":
+                continue  # empty cell -> model default
+            if key in list_fields:
+                value = _split_cell(value)
+            row[key] = value
+        yield reader.line_num, row
+
+
+class _Unreadable:
+    """An NDJSON line that isn't JSON; reported as that row's error, like a validation failure."""
+
+    def __init__(self, error: ValueError):
+        self.msg = f"Invalid JSON: {getattr(error, 'msg', error)}"   # without json's "line 1 column n"
+
+
+def _ndjson_rows(text: str) -> Iterator[Tuple[int, Any]]:
+    for n, line in enumerate(io.StringIO(text), start=1):
+        if not line.strip():
+            continue
+        try:
+            yield n, json.loads(line)
+        except ValueError as e:
+            yield n, _Unreadable(e)
+
+
+def _parse_rows(body: bytes, fmt: str, model) -> List[Tuple[int, Any]]:
+    """
+    (line/row number, raw row) pairs; raises ValueError for a body that can't be read at all.
+    NDJSON and CSV are parsed line by line and stop one row past MAX_IMPORT_ROWS.
+    """
+    text = body.decode("utf-8-sig")
+    if fmt == "json":
+        data = json.loads(text)
+        if isinstance(data, dict) and "items" in data:
+            data = data["items"]
+        if not isinstance(data, list):
+            raise ValueError("Expected a JSON array of rows")
+        rows = enumerate(data, start=1)
+    elif fmt == "ndjson":
+        rows = _ndjson_rows(text)
+    elif fmt == "csv":
+        rows = _csv_rows(text, model)
+    else:
+        raise ValueError(f"Unknown format '{fmt}' (use json, ndjson or csv)")
+    return list(itertools.islice(rows, MAX_IMPORT_ROWS + 1))
+
+
+# ------------------- Validation -------------------
+
+def _validate(kind: str, rows: List[Tuple[int, Any]]):
+    """Validate every row; returns (clean items, per-row errors)."""
+    model = IMPORT_MODELS[kind]
+    items, errors = [], []
+    for n, raw in rows:
+        if isinstance(raw, _Unreadable):
+            errors.append({"row": n, "errors": [{"loc": [], "msg": raw.msg}]})
+            continue
+        if not isinstance(raw, dict):
+            errors.append({"row": n, "errors": [{"loc": [], "msg": "Row must be an object"}]})
+            continue
+        try:
+            items.append((n, model(**raw).dict()))
+        except ValidationError as e:
+            errors.append({"row": n, "errors": e.errors(include_url=False, include_context=False, include_input=False)})
+
+    if kind == "users":
+        # Usernames are unique, both against storage and within the upload
+        seen = {u["username"] for u in storage.find("users")}
+        unique = []
+        for n, item in items:
+            if item["username"] in seen:
+                errors.append({"row": n, "errors": [{"loc": ["username"], "msg": "Username already exists"}]})
+            else:
+                seen.add(item["username"])
+                unique.append((n, item))
+        items = unique
+
+    errors.sort(key=lambda e: e["row"])
+    return [item for _, item in items], errors
+
+
+def _import(kind: str, body: bytes, fmt: str, skip_invalid: bool, dry_run: bool, actor: str) -> dict:
+    try:
+        rows = _parse_rows(body, fmt, IMPORT_MODELS[kind])
+    except (ValueError, csv.Error) as e:   # JSONDecodeError and UnicodeDecodeError are ValueErrors
+        raise HTTPException(400, detail=f"Could not read {fmt} body: {e}")
+    if len(rows) > MAX_IMPORT_ROWS:
+        raise HTTPException(413, detail=f"At most {MAX_IMPORT_ROWS} rows per import")
+
+    items, errors = _validate(kind, rows)
+    report = {
+        "kind": kind,
+        "received": len(rows),
+        "valid": len(items),
+        "error_count": len(errors),
+        "errors": errors[:MAX_REPORTED_ERRORS],
+        "inserted": 0,
+    }
+    if errors and not skip_invalid:
+        raise HTTPException(422, detail=report)
+    if dry_run or not items:
+        return report
+
+    if kind == "users":
+        hashes = hash_passwords([u.pop("password") for u in items])
+        for user, hashed in zip(items, hashes):
+            user["hashed_password"] = hashed
+
+    # One storage write (one journal op / one transaction) for the whole upload
+    report["inserted"] = storage.insert(kind, items, actor=actor)
+    return report
+
+
+# ------------------- Routes -------------------
+
+async def _read_body(request: Request) -> bytes:
+    """The request body, or 413 as soon as it is known to pass MAX_IMPORT_BYTES."""
+    too_large = HTTPException(413, detail=f"At most {MAX_IMPORT_BYTES} bytes per import")
+    length = request.headers.get("content-length")
+    if length and length.isdigit() and int(length) > MAX_IMPORT_BYTES:
+        raise too_large
+    chunks, size = [], 0
+    async for chunk in request.stream():   # also caps chunked bodies, which carry no length
+        size += len(chunk)
+        if size > MAX_IMPORT_BYTES:
+            raise too_large
+        chunks.append(chunk)
+    return b"".join(chunks)
+
+
+@router.post("/{kind}")
+async def bulk_import(
+    kind: str,
+    request: Request,
+    format: str | None = Query(None, pattern="^(json|ndjson|csv)$"),
+    skip_invalid: bool = False,
+    dry_run: bool = False,
+    current_user: dict = Depends(get_current_user),
+):
+    """
+    Import many rooms/teachers/subjects/batches/branches/users in one write.
+    Body is a JSON array, NDJSON or CSV (picked from Content-Type or ?format=).
+    Any invalid row rejects the whole upload with 422 unless ?skip_invalid=true.
+    """
+    if kind not in IMPORT_MODELS:
+        raise HTTPException(404, detail=f"Unknown kind '{kind}'")
+    if kind == "users" and current_user["role"] != "admin":
+        raise HTTPException(status_code=403, detail="Only admin can import users")
+
+    fmt = _detect_format(request, format)
+    body = await _read_body(request)
+    return await run_in_threadpool(
+        _import, kind, body, fmt, skip_invalid, dry_run, current_user["username"]
+    )
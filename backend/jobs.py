@@ -0,0 +1,210 @@
+# backend/jobs.py
+import contextvars
+import multiprocessing
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from queue import Empty
+from typing import Any, Callable, Dict, Optional
+
+from fastapi import APIRouter, Depends, HTTPException
+
+from . import storage
+from .auth import get_current_user
+from .solver import SolveCancelled
+
+MAX_RUNNING_JOBS = 2       # jobs solving at once per college; more are queued
+FINISHED_JOB_TTL = 3600    # seconds a finished job stays pollable
+
+router = APIRouter(prefix="/timetable/jobs", tags=["jobs"])
+
+_jobs: Dict[str, "Job"] = {}
+_jobs_lock = threading.Lock()
+_executors: Dict[str, ThreadPoolExecutor] = {}   # one queue per tenant
+_manager = None
+
+
+def _get_manager():
+    """Manager for the cancel flag and progress queue shared with solver processes."""
+    global _manager
+    with _jobs_lock:
+        if _manager is None:
+            _manager = multiprocessing.get_context("spawn").Manager()
+        return _manager
+
+
+def _get_executor(tenant: str) -> ThreadPoolExecutor:
+    """The tenant's own job queue, so one college's backlog never holds up another's jobs."""
+    with _jobs_lock:
+        if tenant not in _executors:
+            _executors[tenant] = ThreadPoolExecutor(max_workers=MAX_RUNNING_JOBS,
+                                                    thread_name_prefix=f"timetable-job-{tenant}")
+        return _executors[tenant]
+
+
+def shutdown():
+    global _manager
+    with _jobs_lock:
+        jobs = list(_jobs.values())
+    for job in jobs:
+        job.cancel()
+    with _jobs_lock:
+        for executor in _executors.values():
+            executor.shutdown(wait=False, cancel_futures=True)
+        _executors.clear()
+        if _manager is not None:
+            _manager.shutdown()
+            _manager = None
+
+
+# ------------------- Job -------------------
+
+class Job:
+    def __init__(self, kind: str, owner: str, total: int):
+        manager = _get_manager()
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.owner = owner
+        self.tenant = storage.current_tenant()
+        self.status = "queued"   # queued | running | done | failed | cancelled
+        self.total = total
+        self.done = 0
+        self.solutions = 0
+        self.best_objective: Optional[float] = None
+        self.error: Optional[str] = None
+        self.result: Any = None
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        # Proxies, so solver processes can see cancellation and report progress
+        self.stop_event = manager.Event()
+        self.progress = manager.Queue()
+
+    @property
+    def channel(self):
+        return self.stop_event, self.progress
+
+    def cancelled(self) -> bool:
+        return self.stop_event.is_set()
+
+    def cancel(self):
+        self.stop_event.set()
+        if self.status == "queued":
+            self._finish("cancelled")
+
+    def drain_progress(self):
+        """Fold progress messages from the solver processes into the summary."""
+        while True:
+            try:
+                info = self.progress.get_nowait()
+            except Empty:
+                return
+            self.solutions += 1
+            objective = info.get("objective")
+            if objective is not None and (self.best_objective is None or objective < self.best_objective):
+                self.best_objective = objective
+
+    def _finish(self, status: str, error: Optional[str] = None):
+        self.status = status
+        self.error = error
+        self.finished_at = time.time()
+
+    def summary(self) -> dict:
+        return {
+            "job_id": self.id,
+            "kind": self.kind,
+            "status": self.status,
+            "progress": {
+                "candidates_done": self.done,
+                "candidates_total": self.total,
+                "solutions_found": self.solutions,
+                "best_objective": self.best_objective,
+            },
+            "error": self.error,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+
+
+def _run(job: Job, work: Callable[[Job], Any]):
+    if job.status != "queued":
+        return
+    job.status = "running"
+    job.started_at = time.time()
+    try:
+        job.result = work(job)
+        job._finish("done")
+    except SolveCancelled:
+        job._finish("cancelled")
+    except (ValueError, RuntimeError) as e:
+        job._finish("cancelled" if job.cancelled() else "failed", str(e))
+    except Exception as e:
+        job._finish("failed", f"Unexpected error: {e}")
+    finally:
+        job.drain_progress()
+
+
+def _prune():
+    cutoff = time.time() - FINISHED_JOB_TTL
+    for job_id, job in list(_jobs.items()):
+        if job.finished_at is not None and job.finished_at < cutoff:
+            del _jobs[job_id]
+
+
+def submit(kind: str, owner: str, total: int, work: Callable[[Job], Any]) -> Job:
+    """
+    Queue `work(job)` on the current tenant's executor and return the job
+    right away; work runs with the caller's tenant (and other context).
+    """
+    job = Job(kind, owner, total)
+    with _jobs_lock:
+        _prune()
+        _jobs[job.id] = job
+    _get_executor(job.tenant).submit(contextvars.copy_context().run, _run, job, work)
+    return job
+
+
+def _visible(job: Job, current_user: dict) -> bool:
+    """Same college, and the caller's own job unless they are its admin."""
+    return job.tenant == storage.current_tenant() and (
+        job.owner == current_user["username"] or current_user["role"] == "admin")
+
+
+def get_job(job_id: str, current_user: dict) -> Job:
+    job = _jobs.get(job_id)
+    if job is None or not _visible(job, current_user):
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+
+# ------------------- Routes -------------------
+
+@router.get("")
+def list_jobs(current_user: dict = Depends(get_current_user)):
+    return [j.summary() for j in list(_jobs.values()) if _visible(j, current_user)]
+
+
+@router.get("/{job_id}")
+def job_status(job_id: str, current_user: dict = Depends(get_current_user)):
+    job = get_job(job_id, current_user)
+    if job.status == "running":
+        job.drain_progress()
+    return job.summary()
+
+
+@router.get("/{job_id}/result")
+def job_result(job_id: str, current_user: dict = Depends(get_current_user)):
+    job = get_job(job_id, current_user)
+    if job.status != "done":
+        raise HTTPException(status_code=409, detail=f"Job is {job.status}")
+    return job.result
+
+
+@router.post("/{job_id}/cancel")
+def cancel_job(job_id: str, current_user: dict = Depends(get_current_user)):
+    job = get_job(job_id, current_user)
+    if job.status in ("queued", "running"):
+        job.cancel()
+    return job.summary()
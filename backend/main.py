@@ -1,11 +1,17 @@
 # backend/main.py
-from fastapi import FastAPI, Depends, HTTPException, Query
+from fastapi import FastAPI, Depends, HTTPException, Query, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from typing import List, Optional, Dict, Any
 from contextlib import asynccontextmanager
-
-from . import models, storage, demo_data, scheduler
+from concurrent.futures import CancelledError, wait
+import itertools
+import math
+import multiprocessing
+import os
+import threading
+
+from . import models, storage, demo_data, solver, jobs, imports, result_cache, columnar, timetable_views, streaming, scoring, soft_constraints, tenants, metrics, profiling, week
 from .auth import router as auth_router, get_current_user, get_password_hash
 
 # ------------------- Lifespan -------------------
@@ -18,6 +24,8 @@ async def lifespan(app: FastAPI):
     except Exception as e:
         print("WARNING: Startup issue...", e)
     yield
+    jobs.shutdown()
+    _shutdown_solver_pool()
 
 
 app = FastAPI(
@@ -35,9 +43,19 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(streaming.CompressionMiddleware)  # gzip/br, negotiated per request
+app.add_middleware(profiling.SlowRequestMiddleware)   # a no-op until PUT /profiling/settings sets slow_ms
+if metrics.ENABLED:
+    app.add_middleware(metrics.MetricsMiddleware)  # outermost, so latencies include compression
 
-# ------------------- Auth Router -------------------
+# ------------------- Routers -------------------
 app.include_router(auth_router)
+app.include_router(jobs.router)
+app.include_router(imports.router)
+app.include_router(timetable_views.router)
+app.include_router(tenants.router)
+app.include_router(metrics.router, dependencies=[Depends(tenants.require_metrics_access)])
+app.include_router(profiling.router)
 
 
 @app.get("/")
@@ -71,11 +89,7 @@ def reset_open():
 
 @app.post("/seed-demo")
 def seed_demo():
-    state = demo_data.get_demo_state()
-    s = storage.get_state()
-    s.clear()
-    s.update(state)
-    storage.save_state(s)
+    storage.save_state(demo_data.get_demo_state())
     _create_default_admin()
     return {"status": "demo data loaded"}
 
@@ -83,55 +97,91 @@ def seed_demo():
 # ------------------- CRUD Endpoints -------------------
 
 @app.get("/state")
-def get_state(current_user: dict = Depends(get_current_user)):
-    return storage.get_state()
+def get_state(request: Request, format: Optional[str] = Query(None, pattern="^(json|ndjson)$"),
+              current_user: dict = Depends(get_current_user)):
+    """
+    The whole state, streamed. Timetables are stored columnar and rendered to
+    rows one at a time as they are sent. With ?format=ndjson (or Accept:
+    application/x-ndjson) each line is {"key", "value"}; candidates get one
+    line each with an "index".
+    """
+    s = storage.read_state()
+
+    def value(key):
+        if key == "timetable_candidates":
+            return (columnar.render(c) for c in s[key] or ())
+        if key == "latest_timetable" and s[key] is not None:
+            return columnar.render(s[key])
+        return s[key]
+
+    if streaming.wants_ndjson(request, format):
+        def lines():
+            for key in s:
+                if key == "timetable_candidates":
+                    for i, rows in enumerate(value(key)):
+                        yield {"key": key, "index": i, "value": rows}
+                else:
+                    yield {"key": key, "value": value(key)}
+        return streaming.ndjson_response(lines())
+    return streaming.json_response({key: value(key) for key in s})
+
+
+@app.get("/audit")
+def audit_log(limit: int = Query(100, ge=0), op: Optional[str] = None, current_user: dict = Depends(get_current_user)):
+    """Logged writes, newest last; e.g. ?op=finalize shows who finalized which candidate."""
+    if current_user["role"] != "admin":
+        raise HTTPException(status_code=403, detail="Only admin can read the audit log")
+    return storage.history(limit, op)
+
+
+@app.get("/state/export")
+def export_state(pretty: bool = True, current_user: dict = Depends(get_current_user)):
+    if current_user["role"] != "admin":
+        raise HTTPException(status_code=403, detail="Only admin can export data")
+    return Response(
+        storage.export_state(pretty),
+        media_type="application/json",
+        headers={"Content-Disposition": 'attachment; filename="data.json"'},
+    )
 
 
 @app.post("/rooms")
 def add_room(room: models.Room, current_user: dict = Depends(get_current_user)):
-    s = storage.get_state()
-    s.setdefault("rooms", []).append(room.dict())
-    storage.save_state(s)
+    storage.insert("rooms", [room.dict()], actor=current_user["username"])
     return {"status": "room added"}
 
 
 @app.post("/teachers")
 def add_teacher(t: models.Teacher, current_user: dict = Depends(get_current_user)):
-    s = storage.get_state()
-    s.setdefault("teachers", []).append(t.dict())
-    storage.save_state(s)
+    storage.insert("teachers", [t.dict()], actor=current_user["username"])
     return {"status": "teacher added"}
 
 
 @app.post("/subjects")
 def add_subject(subj: models.Subject, current_user: dict = Depends(get_current_user)):
-    s = storage.get_state()
-    s.setdefault("subjects", []).append(subj.dict())
-    storage.save_state(s)
+    storage.insert("subjects", [subj.dict()], actor=current_user["username"])
     return {"status": "subject added"}
 
 
 @app.post("/batches")
 def add_batch(b: models.Batch, current_user: dict = Depends(get_current_user)):
-    s = storage.get_state()
-    s.setdefault("batches", []).append(b.dict())
-    storage.save_state(s)
+    storage.insert("batches", [b.dict()], actor=current_user["username"])
     return {"status": "batch added"}
 
 
 @app.post("/branches")
 def add_branch(b: models.Branch, current_user: dict = Depends(get_current_user)):
-    s = storage.get_state()
-    s.setdefault("branches", []).append(b.dict())
-    storage.save_state(s)
+    storage.insert("branches", [b.dict()], actor=current_user["username"])
     return {"status": "branch added"}
 
 
 @app.post("/config")
 def update_config(cfg: models.Config, current_user: dict = Depends(get_current_user)):
-    s = storage.get_state()
-    s["config"] = cfg.dict()
-    storage.save_state(s)
+    try:
+        soft_constraints.resolve([c.dict() for c in cfg.soft_constraints])
+    except ValueError as e:
+        raise HTTPException(400, str(e))
+    storage.set_value("config", cfg.dict(), actor=current_user["username"])
     return {"status": "config updated"}
 
 
@@ -140,7 +190,7 @@ def update_config(cfg: models.Config, current_user: dict = Depends(get_current_u
 @app.get("/college/config")
 def get_college_config(current_user: dict = Depends(get_current_user)):
     """Return available batches, branches and subjects for dropdowns."""
-    s = storage.get_state()
+    s = storage.read_state()
     return {
         "batches": [b.get("name") for b in s.get("batches", [])],
         "branches": [br.get("name") for br in s.get("branches", [])],
@@ -153,8 +203,7 @@ def get_college_config(current_user: dict = Depends(get_current_user)):
 
 @app.get("/classrooms")
 def get_classrooms(current_user: dict = Depends(get_current_user)):
-    s = storage.get_state()
-    return s.get("rooms", [])
+    return storage.find("rooms")
 
 
 @app.get("/auth/faculty")
@@ -166,56 +215,19 @@ def get_faculty_profile(current_user: dict = Depends(get_current_user)):
 
 # ------------------- Timetable Generation -------------------
 
-class PeriodDef(BaseModel):
-    name: str
-    start: str
-    end: str
-    is_lunch: Optional[bool] = False
-
-
 class GenerateRequest(BaseModel):
     batches: Optional[List[str]] = None
     branches: Optional[List[str]] = None
     subjects: Optional[List[str]] = None
-    periods: Optional[List[PeriodDef]] = None
-
-
-def _compute_periods_from_config(cfg: Dict[str, Any]) -> List[Dict[str, Any]]:
-    def parse_hhmm(t: str) -> int:
-        try:
-            h, m = t.split(":")
-            return int(h) * 60 + int(m)
-        except Exception:
-            return 9 * 60  # default 09:00
-
-    start_time = cfg.get("start_time", "09:00")
-    end_time = cfg.get("end_time", "16:00")
-    per_len = int(cfg.get("period_length_minutes", 50))
-    lunch_after = int(cfg.get("lunch_after_period", 3))
-
-    start_min = parse_hhmm(start_time)
-    end_min = parse_hhmm(end_time)
-
-    periods = []
-    idx = 1
-    cur = start_min
-    while cur + per_len <= end_min:
-        s_h, s_m = divmod(cur, 60)
-        e_h, e_m = divmod(cur + per_len, 60)
-        slot = {
-            "name": f"Period {idx}",
-            "start": f"{s_h:02d}:{s_m:02d}",
-            "end": f"{e_h:02d}:{e_m:02d}",
-            "is_lunch": False,
-        }
-        if idx == lunch_after + 1:
-            slot["name"] = "Lunch"
-            slot["is_lunch"] = True
-        periods.append(slot)
-        cur += per_len
-        idx += 1
-
-    return periods
+    periods: Optional[List[models.Period]] = None
+    time_limit_seconds: Optional[float] = None  # wall-clock budget for the whole generate call
+    workers: Optional[int] = None               # CP-SAT search workers per candidate
+    seed: Optional[int] = None                  # base seed; candidate i uses seed + i
+    background: bool = False                    # return a job id instead of waiting
+    use_cache: bool = True                      # reuse candidates of an identical earlier problem
+    summary_only: bool = False                  # return candidate summaries; fetch each from /timetable/candidates/{i}
+    soft_constraints: Optional[List[models.SoftConstraint]] = None  # override the config's, by name
+    gap_limit: Optional[float] = Field(default=None, ge=0, le=1)
 
 
 def _build_solver_state(state: dict, req: Optional[GenerateRequest] = None) -> dict:
@@ -228,7 +240,9 @@ def _build_solver_state(state: dict, req: Optional[GenerateRequest] = None) -> d
 
     if req:
         if req.batches:
-            batches = [b for b in batches if b.get("name") in set(req.batches)]
+            sel_batches = set(req.batches)
+            batches = [b for b in batches if b.get("name") in sel_batches]
+            subjects = [s for s in subjects if s.get("batch") in sel_batches]
         if req.branches:
             sel_branches = set(req.branches)
             subjects = [s for s in subjects if s.get("branch") in sel_branches or not s.get("branch")]
@@ -238,19 +252,10 @@ def _build_solver_state(state: dict, req: Optional[GenerateRequest] = None) -> d
 
     batch_dict = {b["name"]: b for b in batches if "name" in b}
 
-    periods_from_req = [p.dict() for p in (req.periods or [])]
-    periods_from_cfg = config.get("periods") or []
-    periods = periods_from_req or periods_from_cfg or _compute_periods_from_config(config)
-
-    solver_config = {
-        "days": config.get("days", ["Mon", "Tue", "Wed", "Thu", "Fri"]),
-        "periods_per_day": int(config.get("periods_per_day", len(periods) or 6)),
-        "periods": periods,
-        "lab_length_minutes": int(config.get("lab_length_minutes", 100)),
-    }
+    periods_from_req = [p.dict() for p in ((req.periods if req else None) or [])]
 
     return {
-        "config": solver_config,
+        "config": week.solver_config(config, periods_from_req),
         "rooms": rooms,
         "teachers": teachers,
         "subjects": subjects,
@@ -259,39 +264,321 @@ def _build_solver_state(state: dict, req: Optional[GenerateRequest] = None) -> d
     }
 
 
-def _call_scheduler(solver_state: dict, seed: int | None = None):
+CANDIDATE_COUNT = 3
+# Solves running at once. Each gets solver.default_workers(SOLVER_PROCESSES) CP-SAT workers,
+# so processes x workers stays about cpu_count however many requests are queued.
+SOLVER_PROCESSES = max(min(CANDIDATE_COUNT, os.cpu_count() or 1), (os.cpu_count() or 1) // solver.MAX_WORKERS)
+JOB_POLL_SECONDS = 0.25  # how often a background job refreshes its progress
+
+
+def _solver_options(state: dict, req: Optional[GenerateRequest] = None, parallel_runs: int = CANDIDATE_COUNT) -> dict:
+    """
+    Time budget, workers and soft constraints: request first, then config,
+    then solver defaults. The time budget covers all `parallel_runs` solves:
+    when the pool can't run them at once, each gets its share of it.
+    """
+    config = state.get("config", {}) or {}
+    time_limit = (req.time_limit_seconds if req else None) or config.get("solver_time_limit_seconds")
+    workers = (req.workers if req else None) or config.get("solver_workers")
+    gap_limit = req.gap_limit if req and req.gap_limit is not None else config.get("solver_gap_limit")
+    requested = [c.dict() for c in req.soft_constraints] if req and req.soft_constraints else None
     try:
-        return scheduler.make_timetable(solver_state, seed=seed)  # type: ignore
-    except TypeError:
-        return scheduler.make_timetable(solver_state)
+        soft = soft_constraints.resolve(config.get("soft_constraints"), requested)
+    except ValueError as e:
+        raise HTTPException(400, str(e))
+    rounds = math.ceil(parallel_runs / SOLVER_PROCESSES)
+    return {
+        "time_limit": float(time_limit or solver.DEFAULT_TIME_LIMIT) / rounds,
+        "workers": int(workers or solver.default_workers(SOLVER_PROCESSES)),
+        "soft": soft,
+        "gap_limit": gap_limit,
+    }
+
 
+# ------------------- Solver Pool -------------------
+# One process pool per app, SOLVER_PROCESSES wide and reused across requests,
+# with a queue per college in front of it (tenants.FairPool).
+# "spawn" keeps the workers free of the server's threads and open sockets.
+
+_solver_pool: Optional[tenants.FairPool] = None
+_solver_pool_lock = threading.Lock()
+
+
+def _get_solver_pool() -> tenants.FairPool:
+    global _solver_pool
+    with _solver_pool_lock:
+        if _solver_pool is None:
+            _solver_pool = tenants.FairPool(
+                max_workers=SOLVER_PROCESSES,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return _solver_pool
+
+
+def _shutdown_solver_pool():
+    global _solver_pool
+    with _solver_pool_lock:
+        if _solver_pool is not None:
+            _solver_pool.shutdown()
+            _solver_pool = None
+
+
+def _call_scheduler(solver_state: dict, seed: int | None = None, options: Optional[dict] = None, channel=None):
+    kwargs = dict(options or {})
+    if channel is not None:
+        # (stop event, progress queue) manager proxies from a background job
+        stop_event, progress = channel
+        kwargs["should_stop"] = stop_event.is_set
+        kwargs["on_progress"] = lambda info: progress.put(dict(info, seed=seed))
+    # Packed before it crosses the process boundary: a fraction of the pickle size
+    return columnar.pack(solver.make_timetable(solver_state, seed=seed, **kwargs))
+
+
+def _generate_candidates(solver_state: dict, n: int = CANDIDATE_COUNT, options: Optional[dict] = None,
+                         seed: int = 0, job: Optional[jobs.Job] = None):
+    """
+    Solve `n` candidates at once on the shared pool, in the current
+    college's queue. Each one gets its own seed, which also picks its
+    branching order inside the solver. Candidates that time out are dropped
+    as long as at least one succeeds.
+    """
+    pool = _get_solver_pool()
+    channel = job.channel if job else None
+    profile = profiling.next_generate()   # armed through PUT /profiling/settings
+    call = (profiling.profiled, _call_scheduler) if profile else (_call_scheduler,)
+    futures = [pool.submit(metrics.traced, *call, solver_state, seed + i, options, channel) for i in range(n)]
 
-def _generate_candidates(solver_state: dict, n: int = 3):
     candidates = []
-    for i in range(n):
-        result = _call_scheduler(solver_state, seed=i)
-        candidates.append(result)
+    errors = []
+    try:
+        pending = set(futures)
+        while pending:
+            _, pending = wait(pending, timeout=JOB_POLL_SECONDS)
+            if job:
+                job.done = n - len(pending)
+                job.drain_progress()
+                if job.cancelled():
+                    for fut in pending:
+                        fut.cancel()
+        for fut in futures:
+            try:
+                result = metrics.replay(fut.result())
+                candidates.append(profile.unwrap(result) if profile else result)
+            except CancelledError:
+                continue
+            except RuntimeError as e:   # includes a crashed worker; the pool replaces it
+                errors.append(e)
+    finally:
+        for fut in futures:
+            fut.cancel()
+        if profile:
+            profile.save(candidates=len(candidates), errors=[str(e) for e in errors])
+
+    if job and job.cancelled():
+        raise solver.SolveCancelled("Solve cancelled")
+    if not candidates and errors:
+        raise errors[0]
     return candidates
 
 
+def _store_candidates(candidates: list, actor: Optional[str] = None):
+    storage.set_value("timetable_candidates", [columnar.pack(c) for c in candidates], actor=actor)
+
+
+def _cached_candidates(solver_state: dict, options: dict, seed: int, use_cache: bool = True,
+                       job: Optional[jobs.Job] = None):
+    """_generate_candidates behind the result cache; returns (candidates, cache hit?)."""
+    key = result_cache.problem_key(solver_state, options, seed, CANDIDATE_COUNT, namespace=storage.current_tenant())
+    if use_cache:
+        candidates = result_cache.get(key)
+        if candidates is not None:
+            return candidates, True
+    candidates = _generate_candidates(solver_state, CANDIDATE_COUNT, options, seed, job=job)
+    if len(candidates) == CANDIDATE_COUNT:   # a timed-out candidate might succeed next time
+        result_cache.put(key, candidates)
+    return candidates, False
+
+
+def _candidate_summaries(candidates: list, ctx: scoring.Context, soft: Optional[List[dict]] = None) -> List[dict]:
+    """Size, quality metrics and soft-constraint penalties of each candidate; lower score is better."""
+    weights = scoring.weights(soft)
+    summaries = []
+    for i, c in enumerate(candidates):
+        tt = columnar.unpack(c)
+        values = scoring.metrics(tt, ctx, soft)
+        summaries.append({
+            "index": i,
+            "entries": len(tt),
+            "batches": len(tt.tables["batch"]),
+            "teachers": len(tt.tables["teacher"]),
+            "rooms": len(tt.tables["room"]),
+            "days": len(tt.tables["day"]),
+            "score": scoring.score(values, weights),
+            "metrics": values,
+        })
+    return summaries
+
+
+def _ranking(summaries: List[dict]) -> List[int]:
+    return [s["index"] for s in sorted(summaries, key=lambda s: (s["score"], s["index"]))]
+
+
+def _candidates_response(result: dict, candidates: list, summaries: List[dict], summary_only: bool, ndjson: bool):
+    """
+    Generate's response: the result fields, then each candidate rendered (or
+    summarised) only as it is written out. NDJSON sends the result fields as
+    the first line and one {"index", "candidate" | "summary"} line per candidate.
+    """
+    def items():
+        for i, c in enumerate(candidates):
+            yield summaries[i] if summary_only else columnar.render(c)
+
+    if ndjson:
+        field = "summary" if summary_only else "candidate"
+        lines = ({"index": i, field: item} for i, item in enumerate(items()))
+        return streaming.ndjson_response(itertools.chain([result], lines))
+    return streaming.json_response({**result, "candidates": items()})
+
+
+def _check_feasible(solver_state: dict):
+    """Reject provably impossible input up front instead of after a full solve."""
+    try:
+        report = solver.analyze(solver_state)
+    except ValueError as e:
+        raise HTTPException(400, str(e))
+    if not report["feasible"]:
+        raise HTTPException(422, detail={"message": "Timetable is infeasible", **report})
+
+
+@app.get("/timetable/soft-constraints")
+def list_soft_constraints(current_user: dict = Depends(get_current_user)):
+    """The soft constraints config/generate can switch on, and the ones the config has on."""
+    config = storage.get_value("config") or {}
+    return {
+        "available": [{"name": c.name, "description": c.description, "params": c.defaults}
+                      for c in soft_constraints.CONSTRAINTS.values()],
+        "configured": soft_constraints.resolve(config.get("soft_constraints")),
+    }
+
+
+@app.get("/timetable/grid")
+def timetable_grid(current_user: dict = Depends(get_current_user)):
+    """The week the solver plans on: every day's periods with slot ids, lunch and the runs a lab can span."""
+    return timetable_views.current_grid().describe()
+
+
+@app.post("/timetable/check")
+def check_timetable(req: Optional[GenerateRequest] = None, current_user: dict = Depends(get_current_user)):
+    """Pre-solve diagnostics for the same selection /timetable/generate would solve."""
+    if current_user["role"] not in ["admin", "faculty"]:
+        raise HTTPException(status_code=403, detail="Only admin/faculty can check timetable input")
+    try:
+        return solver.analyze(_build_solver_state(storage.read_state(), req))
+    except ValueError as e:
+        raise HTTPException(400, str(e))
+
+
 @app.post("/timetable/generate")
-def generate_timetable(req: GenerateRequest, current_user: dict = Depends(get_current_user)):
+def generate_timetable(req: GenerateRequest, request: Request,
+                       format: Optional[str] = Query(None, pattern="^(json|ndjson)$"),
+                       current_user: dict = Depends(get_current_user)):
     if current_user["role"] not in ["admin", "faculty"]:
         raise HTTPException(status_code=403, detail="Only admin/faculty can generate timetable")
 
-    state = storage.get_state()
-    solver_state = _build_solver_state(state, req)
+    state = storage.read_state()
+    with metrics.span("generate.build_state"):
+        solver_state = _build_solver_state(state, req)
+    options = _solver_options(state, req)
+    seed = req.seed or 0
+    _check_feasible(solver_state)
+
+    if req.background:
+        def work(job: jobs.Job):
+            candidates, cached = _cached_candidates(solver_state, options, seed, req.use_cache, job=job)
+            _store_candidates(candidates, actor=job.owner)
+            summaries = _candidate_summaries(candidates, scoring.Context.from_solver_state(solver_state),
+                                             options["soft"])
+            return {"status": "candidates_generated", "count": len(candidates), "cached": cached,
+                    "ranking": _ranking(summaries),
+                    "candidates": summaries if req.summary_only else [columnar.render(c) for c in candidates]}
+
+        job = jobs.submit("generate", current_user["username"], CANDIDATE_COUNT, work)
+        return {"status": "job_queued", "job_id": job.id, "job": job.summary()}
 
     try:
-        candidates = _generate_candidates(solver_state, n=3)
+        with tenants.solve_slot():
+            candidates, cached = _cached_candidates(solver_state, options, seed, req.use_cache)
     except ValueError as e:
         raise HTTPException(400, str(e))
     except RuntimeError as e:
         raise HTTPException(409, str(e))
 
-    state["timetable_candidates"] = candidates
-    storage.save_state(state)
-    return {"status": "candidates_generated", "count": len(candidates), "candidates": candidates}
+    _store_candidates(candidates, actor=current_user["username"])
+    with metrics.span("generate.score", candidates=len(candidates)):
+        summaries = _candidate_summaries(candidates, scoring.Context.from_solver_state(solver_state),
+                                         options["soft"])
+    result = {"status": "candidates_generated", "count": len(candidates), "cached": cached,
+              "ranking": _ranking(summaries)}
+    return _candidates_response(result, candidates, summaries, req.summary_only,
+                                streaming.wants_ndjson(request, format))
+
+
+def _stored_summaries():
+    """Summaries of the stored candidates, scored with the configured soft constraints."""
+    state = storage.read_state()
+    soft = _solver_options(state)["soft"]
+    ctx = scoring.Context.from_solver_state(_build_solver_state(state))
+    return _candidate_summaries(state.get("timetable_candidates") or [], ctx, soft), soft
+
+
+@app.get("/timetable/candidates")
+def list_candidates(current_user: dict = Depends(get_current_user)):
+    """Summaries and scores of the stored candidates; fetch one with /timetable/candidates/{index}."""
+    return _stored_summaries()[0]
+
+
+@app.get("/timetable/candidates/ranking")
+def rank_candidates(current_user: dict = Depends(get_current_user)):
+    """Stored candidates best first, with the weights the score is built from."""
+    summaries, soft = _stored_summaries()
+    ranked = [summaries[i] for i in _ranking(summaries)]
+    return {"weights": scoring.weights(soft), "candidates": [{"rank": n + 1, **s} for n, s in enumerate(ranked)]}
+
+
+def _stored_timetable(ref: str):
+    """A candidate by index, or "latest" for the finalized timetable."""
+    if ref == "latest":
+        latest = storage.get_value("latest_timetable")
+        if not len(columnar.unpack(latest)):
+            raise HTTPException(404, detail="No finalized timetable")
+        return latest
+    candidates = storage.get_value("timetable_candidates") or []
+    index = int(ref) if ref.isdigit() else -1
+    if not 0 <= index < len(candidates):
+        raise HTTPException(404, detail=f"No candidate '{ref}' ({len(candidates)} stored)")
+    return candidates[index]
+
+
+@app.get("/timetable/candidates/diff")
+def diff_candidates(a: str = "0", b: str = "latest", current_user: dict = Depends(get_current_user)):
+    """What changes going from timetable a to b; each is a candidate index or "latest"."""
+    return {"a": a, "b": b, **scoring.diff(_stored_timetable(a), _stored_timetable(b))}
+
+
+@app.get("/timetable/candidates/{index}")
+def get_candidate(index: int, current_user: dict = Depends(get_current_user)):
+    candidates = storage.get_value("timetable_candidates") or []
+    if not 0 <= index < len(candidates):
+        raise HTTPException(404, detail=f"No candidate {index} ({len(candidates)} stored)")
+    return columnar.render(candidates[index])
+
+
+@app.delete("/timetable/cache")
+def clear_result_cache(current_user: dict = Depends(get_current_user)):
+    if current_user["role"] != "admin":
+        raise HTTPException(status_code=403, detail="Only admin can clear the cache")
+    # Only this college's results; other tenants keep theirs
+    return {"status": "cleared", "entries": result_cache.clear(storage.current_tenant())}
 
 
 @app.post("/timetable/finalize")
@@ -299,30 +586,87 @@ def finalize_timetable(choice: dict, current_user: dict = Depends(get_current_us
     if current_user["role"] != "admin":
         raise HTTPException(status_code=403, detail="Only admin can finalize timetable")
 
-    state = storage.get_state()
-    candidates = state.get("timetable_candidates", [])
-    if not candidates:
+    if not storage.get_value("timetable_candidates"):
         raise HTTPException(404, detail="No timetable candidates available. Generate first.")
 
     idx = int(choice.get("choice", 0))
-    if idx < 0 or idx >= len(candidates):
-        raise HTTPException(400, detail=f"Invalid choice index {idx}")
-
-    state["latest_timetable"] = candidates[idx]
-    storage.save_state(state)
+    try:
+        storage.finalize(idx, actor=current_user["username"])
+    except IndexError as e:
+        raise HTTPException(400, detail=str(e))
+    timetable_views.current_index()  # build the per-batch/teacher/room views now, not on the first read
     return {"status": "finalized", "chosen_index": idx}
 
 
+class RepairRequest(BaseModel):
+    unavailable: Dict[str, List[str]] = {}        # teacher code -> ["Mon-3", "Tue"] (a bare day = whole day)
+    closed_rooms: List[str] = []                  # room names
+    add_subjects: List[models.Subject] = []
+    remove_subjects: List[str] = []               # subject codes
+    time_limit_seconds: Optional[float] = None
+    workers: Optional[int] = None
+    apply: bool = False                           # save the result (and the room/subject edits)
+
+
+@app.post("/timetable/repair")
+def repair_timetable(req: RepairRequest, current_user: dict = Depends(get_current_user)):
+    """Patch the finalized timetable after a change, moving as few classes as possible."""
+    if current_user["role"] != "admin":
+        raise HTTPException(status_code=403, detail="Only admin can repair timetable")
+
+    state = storage.read_state()
+    previous = columnar.render(state.get("latest_timetable"))
+    if not previous:
+        raise HTTPException(404, detail="No finalized timetable to repair. Finalize one first.")
+
+    closed = set(req.closed_rooms)
+    removed = set(req.remove_subjects)
+    rooms = [r for r in state.get("rooms", []) if r.get("name") not in closed]
+    subjects = [s for s in state.get("subjects", []) if s.get("code") not in removed]
+    subjects += [s.dict() for s in req.add_subjects]
+    edited = {**state, "rooms": rooms, "subjects": subjects}
+
+    solver_state = _build_solver_state(edited)
+    options = _solver_options(edited, parallel_runs=1)
+    if req.time_limit_seconds:
+        options["time_limit"] = float(req.time_limit_seconds)
+    if req.workers:
+        options["workers"] = int(req.workers)
+
+    try:
+        with tenants.solve_slot():
+            result = metrics.replay(_get_solver_pool().submit(
+                metrics.traced, solver.repair_timetable, solver_state, previous, req.unavailable, **options
+            ).result())
+    except ValueError as e:
+        raise HTTPException(400, str(e))
+    except RuntimeError as e:
+        raise HTTPException(409, str(e))
+
+    if req.apply:
+        values = {"latest_timetable": columnar.pack(result["timetable"])}
+        if closed:
+            values["rooms"] = rooms
+        if removed or req.add_subjects:
+            values["subjects"] = subjects
+        storage.set_values(values, actor=current_user["username"])
+        timetable_views.current_index()
+    return {"status": "repaired" if req.apply else "preview", **result}
+
+
 @app.get("/timetable/latest")
-def get_latest_timetable(current_user: dict = Depends(get_current_user)):
-    return storage.get_state().get("latest_timetable", [])
+def get_latest_timetable(request: Request, current_user: dict = Depends(get_current_user)):
+    index = timetable_views.current_index()
+    return timetable_views.conditional(request, index.etag, index.timetable.rows)
 
 
 # ---- Compatibility Aliases ----
 
 @app.post("/schedule/generate")
-def schedule_generate_alias(req: GenerateRequest, current_user: dict = Depends(get_current_user)):
-    return generate_timetable(req, current_user)  # type: ignore
+def schedule_generate_alias(req: GenerateRequest, request: Request,
+                            format: Optional[str] = Query(None, pattern="^(json|ndjson)$"),
+                            current_user: dict = Depends(get_current_user)):
+    return generate_timetable(req, request, format, current_user)  # type: ignore
 
 
 @app.post("/timetable/select")
@@ -331,25 +675,20 @@ def timetable_select_alias(index: int = Query(0), current_user: dict = Depends(g
 
 
 @app.get("/timetable")
-def timetable_get_alias(current_user: dict = Depends(get_current_user)):
-    return get_latest_timetable(current_user)
+def timetable_get_alias(request: Request, current_user: dict = Depends(get_current_user)):
+    return get_latest_timetable(request, current_user)
 
 
 # ------------------- Default Admin -------------------
 
 def _create_default_admin():
-    s = storage.get_state()
-    users = s.get("users", [])
-    if not any(u.get("username") == "admin" for u in users):
-        admin_user = {
-            "username": "admin",
-            "hashed_password": get_password_hash("admin123"),
-            "role": "admin",
-            "name": "Super Admin",
-        }
-        users.append(admin_user)
-        s["users"] = users
-        storage.save_state(s)  # ✅ pass state explicitly
-        print("✅ Default admin created: username=admin, password=admin123")
-    else:
-        "INFO: Admin already exists"
\ No newline at end of file
+    if storage.find("users", username="admin"):
+        return  # INFO: Admin already exists
+    admin_user = {
+        "username": "admin",
+        "hashed_password": get_password_hash("admin123"),
+        "role": "admin",
+        "name": "Super Admin",
+    }
+    storage.insert("users", [admin_user])
+    print("✅ Default admin created: username=admin, password=admin123")
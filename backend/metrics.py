@@ -0,0 +1,251 @@
+# backend/metrics.py
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from typing import Any, Dict, List, Optional, Tuple
+
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import PlainTextResponse
+from starlette.datastructures import MutableHeaders
+
+# TIMETABLE_METRICS=0 turns every span into a no-op and removes the middleware
+ENABLED = os.environ.get("TIMETABLE_METRICS", "1") != "0"
+# TIMETABLE_SERVER_TIMING=1 adds a Server-Timing header with the spans of each request
+SERVER_TIMING = ENABLED and os.environ.get("TIMETABLE_SERVER_TIMING", "0") == "1"
+# Bearer token a Prometheus scraper can send instead of logging in (see tenants.require_metrics_access)
+SCRAPE_TOKEN = os.environ.get("TIMETABLE_METRICS_TOKEN") or None
+
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+router = APIRouter(tags=["metrics"])
+
+
+# ------------------- Registry -------------------
+
+def _key(labels: Dict[str, Any]) -> Tuple[Tuple[str, str], ...]:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(key, extra: str = "") -> str:
+    parts = [f'{k}="{_escape(v)}"' for k, v in key]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class Histogram:
+    """Prometheus-style histogram, one series per label set."""
+
+    def __init__(self, name: str, help: str, buckets=BUCKETS):
+        self.name, self.help, self.buckets = name, help, tuple(buckets)
+        self._series: Dict[tuple, list] = {}   # key -> [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        key = _key(labels)
+        i = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0] * (len(self.buckets) + 2)
+            if i < len(self.buckets):
+                series[i] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = {k: list(v) for k, v in self._series.items()}
+        for key, counts in sorted(series.items()):
+            running = 0
+            for bound, n in zip(self.buckets, counts):
+                running += n
+                le = 'le="%g"' % bound
+                lines.append(f"{self.name}_bucket{_labels(key, le)} {running}")
+            inf = 'le="+Inf"'
+            lines.append(f"{self.name}_bucket{_labels(key, inf)} {counts[-1]}")
+            lines.append(f"{self.name}_sum{_labels(key)} {counts[-2]:.6f}")
+            lines.append(f"{self.name}_count{_labels(key)} {counts[-1]}")
+        return lines
+
+
+class Counter:
+    def __init__(self, name: str, help: str):
+        self.name, self.help = name, help
+        self._series: Dict[tuple, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, value: float = 1, **labels):
+        key = _key(labels)
+        with self._lock:
+            self._series[key] = self._series.get(key, 0) + value
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            series = dict(self._series)
+        lines += [f"{self.name}{_labels(key)} {value:g}" for key, value in sorted(series.items())]
+        return lines
+
+
+REQUESTS = Histogram("timetable_http_request_duration_seconds", "HTTP request latency by route and status.")
+SPANS = Histogram("timetable_span_duration_seconds", "Time spent in instrumented steps (storage, auth, solver, bcrypt).")
+QUANTITIES = Counter("timetable_span_quantity_total",
+                     "Sums of what spans measured, e.g. bytes read or model variables, by span and field.")
+REGISTRY = [REQUESTS, SPANS, QUANTITIES]
+
+
+def render() -> str:
+    return "\n".join(line for metric in REGISTRY for line in metric.render()) + "\n"
+
+
+# ------------------- Spans -------------------
+
+_timings: ContextVar[Optional[list]] = ContextVar("timings", default=None)   # this request's (name, seconds)
+_capture: ContextVar[Optional[list]] = ContextVar("capture", default=None)   # records to ship to the parent
+
+
+def record(name: str, seconds: float, **fields):
+    """
+    One finished step. Numeric fields (bytes, variables, ...) are summed per
+    span; other fields (phase, status, backend) become labels.
+    """
+    if not ENABLED:
+        return
+    labels = {k: v for k, v in fields.items() if not isinstance(v, (int, float)) or isinstance(v, bool)}
+    SPANS.observe(seconds, span=name, **labels)
+    for field, value in fields.items():
+        if field not in labels:
+            QUANTITIES.inc(value, span=name, field=field)
+    timings = _timings.get()
+    if timings is not None:
+        timings.append((name, seconds))
+    captured = _capture.get()
+    if captured is not None:
+        captured.append((name, seconds, fields))
+
+
+class Span:
+    """A timed block; `set()` adds fields (bytes, status, ...) before it ends."""
+    __slots__ = ("name", "fields", "started")
+
+    def __init__(self, name: str, fields: dict):
+        self.name, self.fields = name, fields
+
+    def set(self, **fields):
+        self.fields.update(fields)
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        record(self.name, time.perf_counter() - self.started, **self.fields)
+        return False
+
+
+class _NoopSpan:
+    def set(self, **fields):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NOOP = _NoopSpan()
+
+
+def span(name: str, **fields):
+    """Time a block: `with metrics.span("storage.load", backend="json") as s: ...; s.set(bytes=n)`."""
+    return Span(name, fields) if ENABLED else _NOOP
+
+
+# ------------------- Across processes -------------------
+
+def traced(fn, *args, **kwargs):
+    """Run fn in a worker process and return (result, its span records) for replay() in the parent."""
+    token = _capture.set([])
+    try:
+        result = fn(*args, **kwargs)
+        return result, _capture.get()
+    finally:
+        _capture.reset(token)
+
+
+def replay(traced_result):
+    """Fold a traced() call's records into this process's metrics (and the request timing); returns its result."""
+    result, records = traced_result
+    for name, seconds, fields in records:
+        record(name, seconds, **fields)
+    return result
+
+
+# ------------------- Middleware -------------------
+
+def _route(scope) -> str:
+    route = scope.get("route")
+    path = getattr(route, "path", None)
+    if path:
+        return path
+    endpoint = scope.get("endpoint")
+    return getattr(endpoint, "__name__", "<unmatched>")
+
+
+def _server_timing(timings: list, total: float) -> str:
+    summed: Dict[str, float] = {}
+    for name, seconds in timings:
+        summed[name] = summed.get(name, 0.0) + seconds
+    parts = [f"{name};dur={seconds * 1000:.1f}" for name, seconds in summed.items()]
+    parts.append(f"app;dur={total * 1000:.1f}")
+    return ", ".join(parts)
+
+
+class MetricsMiddleware:
+    """Latency histogram per route and status; with SERVER_TIMING, the request's spans as a header."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        started = time.perf_counter()
+        timings: list = []
+        token = _timings.set(timings)
+        status = 500
+
+        async def send_timed(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                if SERVER_TIMING:
+                    headers = MutableHeaders(raw=message.setdefault("headers", []))
+                    headers.append("Server-Timing", _server_timing(timings, time.perf_counter() - started))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_timed)
+        finally:
+            _timings.reset(token)
+            REQUESTS.observe(time.perf_counter() - started, method=scope["method"], route=_route(scope), status=status)
+
+
+# ------------------- Routes -------------------
+
+@router.get("/metrics", response_class=PlainTextResponse)
+def metrics_endpoint():
+    """Prometheus text format: request latencies, span durations and span quantities."""
+    if not ENABLED:
+        raise HTTPException(404, detail="Metrics are disabled (TIMETABLE_METRICS=0)")
+    return PlainTextResponse(render(), media_type="text/plain; version=0.0.4")
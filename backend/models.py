@@ -1,6 +1,6 @@
 # backend/models.py
 from pydantic import BaseModel, Field
-from typing import List, Optional, Literal
+from typing import Any, Dict, List, Optional, Literal
 
 # ------------------------
 # Types
@@ -31,7 +31,8 @@ class Subject(BaseModel):
     batch: str                # which batch/group takes it
     teacher_code: str
     classes_per_week: int = Field(ge=1)
-    duration: int = 1
+    duration: Optional[int] = Field(default=None, ge=1)  # periods per session; default 1, or a lab's length
+    lab: bool = False         # without a duration, spans the config's lab_length_minutes
     fixed_slots: Optional[List[str]] = None  # e.g. ["Mon-3","Wed-5"]
 
 
@@ -46,9 +47,55 @@ class Branch(BaseModel):
     name: str
 
 
+class SoftConstraint(BaseModel):
+    name: str                 # one of backend/soft_constraints.py CONSTRAINTS, e.g. "avoid_last_slot"
+    weight: float = Field(default=1.0, ge=0)  # 0 switches it off
+    params: Dict[str, Any] = Field(default_factory=dict)
+
+
+class Period(BaseModel):
+    name: str
+    start: str                # "HH:MM"
+    end: str
+    is_lunch: Optional[bool] = False
+    shift: Optional[str] = None  # a lab never runs across a change of shift
+
+
+class Shift(BaseModel):
+    name: Optional[str] = None
+    start_time: str           # "HH:MM"
+    end_time: str
+    period_length_minutes: Optional[int] = Field(default=None, ge=1)  # default: the config's
+    lunch_after_period: Optional[int] = None  # counted within the shift; None = no lunch
+
+
+class DayGrid(BaseModel):
+    """One day's own timetable grid; unset fields fall back to the config's."""
+    start_time: Optional[str] = None
+    end_time: Optional[str] = None
+    period_length_minutes: Optional[int] = Field(default=None, ge=1)
+    lunch_after_period: Optional[int] = None
+    shifts: Optional[List[Shift]] = None
+    periods: Optional[List[Period]] = None
+
+
 class Config(BaseModel):
     days: List[Day] = ["Mon", "Tue", "Wed", "Thu", "Fri"]
     periods_per_day: int = 8
+    # The day grid (see backend/week.py): explicit periods, or periods cut from
+    # start/end times (one range or several shifts), with per-day overrides
+    start_time: Optional[str] = None          # default 09:00
+    end_time: Optional[str] = None            # default 16:00
+    period_length_minutes: Optional[int] = Field(default=None, ge=1)  # default 50
+    lunch_after_period: Optional[int] = None  # default 3; single-range days only
+    lab_length_minutes: Optional[int] = Field(default=None, ge=1)     # default 100
+    periods: Optional[List[Period]] = None
+    shifts: Optional[List[Shift]] = None
+    day_overrides: Dict[Day, DayGrid] = Field(default_factory=dict)   # e.g. {"Sat": {"end_time": "13:00"}}
+    solver_time_limit_seconds: Optional[float] = Field(default=None, gt=0)  # whole generate call
+    solver_workers: Optional[int] = Field(default=None, ge=1)
+    solver_gap_limit: Optional[float] = Field(default=None, ge=0, le=1)  # stop within this relative gap
+    soft_constraints: List[SoftConstraint] = Field(default_factory=list)
 
 
 # ------------------------
@@ -0,0 +1,346 @@
+# backend/profiling.py
+import cProfile
+import io
+import json
+import marshal
+import os
+import pstats
+import re
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from collections import Counter, deque
+from pathlib import Path
+from typing import Dict, List, Optional, Union
+
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import FileResponse
+from pydantic import BaseModel, Field
+
+from . import solver, storage
+from .auth import get_current_user
+from .tenants import require_operator
+
+PROFILE_DIR = Path(os.environ.get("TIMETABLE_PROFILE_DIR", Path(__file__).parent / "profiles"))
+# The oldest go beyond this; at least 1, the profile just written
+MAX_PROFILES = max(1, int(os.environ.get("TIMETABLE_MAX_PROFILES", "50")))
+SAMPLE_SECONDS = 0.005       # stack sampling interval inside a profiled solve
+SLOW_SAMPLE_SECONDS = 0.01   # ... and process-wide while slow requests are being caught
+SAMPLE_WINDOW = 300.0        # seconds of process-wide samples kept, the longest request that can be profiled
+SLOW_PROFILE_GAP = 1.0       # at most one slow-request profile per second
+ARTIFACTS = {"pstats": "profile.pstats", "summary": "summary.txt", "stacks": "stacks.txt", "search_log": "search.log"}
+PROFILE_ID = re.compile(r"^\d{8}-\d{6}-[0-9a-f]{6}$")
+
+router = APIRouter(prefix="/profiling", tags=["profiling"])
+
+
+# ------------------- Stack sampler -------------------
+
+_IDLE_FILES = {"threading.py", "queue.py", "selectors.py"}   # a thread parked here is waiting, not working
+
+
+def _frame(code) -> str:
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class Sampler:
+    """
+    Samples every thread's Python stack on a timer. Unlike cProfile it sees
+    all threads (the per-group solves, the server's thread pool) and its
+    output is the collapsed-stack format flamegraph tools read.
+    """
+
+    def __init__(self, interval: float = SAMPLE_SECONDS, window: Optional[float] = None):
+        self.interval, self.window = interval, window
+        self._samples: deque = deque()   # (perf_counter, stack as code objects, outermost first)
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="profile-sampler", daemon=True)
+
+    def start(self) -> "Sampler":
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        me = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            now = time.perf_counter()
+            taken = []
+            for ident, frame in sys._current_frames().items():
+                if ident == me or os.path.basename(frame.f_code.co_filename) in _IDLE_FILES:
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(frame.f_code)
+                    frame = frame.f_back
+                taken.append((now, tuple(reversed(stack))))
+            with self._lock:
+                self._samples.extend(taken)
+                if self.window is not None:
+                    while self._samples and self._samples[0][0] < now - self.window:
+                        self._samples.popleft()
+
+    def counts(self, since: float = 0.0, until: float = float("inf")) -> Counter:
+        """Samples per collapsed stack ("outer;...;inner") taken between two perf_counter readings."""
+        with self._lock:
+            stacks = Counter(stack for t, stack in self._samples if since <= t <= until)
+        return Counter({";".join(_frame(code) for code in stack): n for stack, n in stacks.items()})
+
+
+def _collapsed(counts: Counter) -> str:
+    return "".join(f"{stack} {n}\n" for stack, n in counts.most_common())
+
+
+# ------------------- Profile ring -------------------
+
+def _save(kind: str, meta: dict, files: Dict[str, Union[str, bytes]]) -> Optional[dict]:
+    """Write one profile directory, then drop the oldest beyond MAX_PROFILES."""
+    profile_id = f"{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:6]}"
+    path = PROFILE_DIR / profile_id
+    meta = {"id": profile_id, "kind": kind, "created_at": time.time(), **meta}
+    try:
+        path.mkdir(parents=True)
+        for artifact, content in files.items():
+            if isinstance(content, bytes):
+                (path / ARTIFACTS[artifact]).write_bytes(content)
+            else:
+                (path / ARTIFACTS[artifact]).write_text(content, encoding="utf-8")
+        meta["artifacts"] = sorted(a for a, name in ARTIFACTS.items() if (path / name).exists())
+        (path / "meta.json").write_text(json.dumps(meta, indent=2), encoding="utf-8")
+        dirs = sorted(p for p in PROFILE_DIR.iterdir() if p.is_dir())
+        for old in dirs[:max(0, len(dirs) - MAX_PROFILES)]:
+            shutil.rmtree(old, ignore_errors=True)
+    except OSError as e:
+        print(f"⚠️ Could not save {kind} profile: {e}")
+        return None
+    print(f"🔬 Saved {kind} profile {profile_id}")
+    return meta
+
+
+def list_profiles() -> List[dict]:
+    """Newest first."""
+    if not PROFILE_DIR.exists():
+        return []
+    profiles = []
+    for path in sorted(PROFILE_DIR.iterdir(), reverse=True):
+        try:
+            profiles.append(json.loads((path / "meta.json").read_text(encoding="utf-8")))
+        except (OSError, ValueError):
+            continue   # half written or pruned meanwhile
+    return profiles
+
+
+def _profile_path(profile_id: str) -> Path:
+    path = PROFILE_DIR / profile_id
+    if not PROFILE_ID.match(profile_id) or not (path / "meta.json").exists():
+        raise HTTPException(404, detail="Profile not found")
+    return path
+
+
+# ------------------- Profiled solves -------------------
+
+def profiled(fn, *args, **kwargs):
+    """
+    Run fn in a solver worker under cProfile and the stack sampler, with the
+    CP-SAT search log on. Returns (result, profile parts, error) so a failed
+    solve still reports its profile; GenerateProfile.unwrap re-raises.
+    """
+    sampler = Sampler().start()
+    profile = cProfile.Profile()
+    started = time.perf_counter()
+    result, error = None, None
+    with solver.search_logs() as logs:
+        profile.enable()
+        try:
+            result = fn(*args, **kwargs)
+        except Exception as e:
+            error = e
+        finally:
+            profile.disable()
+            sampler.stop()
+    profile.create_stats()
+    parts = {"seconds": round(time.perf_counter() - started, 3), "pstats": marshal.dumps(profile.stats),
+             "stacks": sampler.counts(), "search_logs": logs}
+    return result, parts, error
+
+
+class GenerateProfile:
+    """Collects the profiled solves of one generate call and saves them as one profile."""
+
+    def __init__(self):
+        self.tenant = storage.current_tenant()
+        self.started = time.perf_counter()
+        self.parts: List[dict] = []
+
+    def unwrap(self, outcome):
+        result, parts, error = outcome
+        self.parts.append(parts)
+        if error is not None:
+            raise error
+        return result
+
+    def save(self, **meta) -> Optional[dict]:
+        return _save("generate", {
+            "tenant": self.tenant,
+            "seconds": round(time.perf_counter() - self.started, 3),
+            "solves": [{"seconds": p["seconds"], "statuses": [log["status"] for log in p["search_logs"]]}
+                       for p in self.parts],
+            **meta,
+        }, self._files())
+
+    def _files(self) -> Dict[str, Union[str, bytes]]:
+        stacks, logs = Counter(), []
+        for i, part in enumerate(self.parts):
+            stacks.update(part["stacks"])
+            for log in part["search_logs"]:
+                logs.append(f"===== solve {i}, phase {log['phase']}: {log['status']} =====\n"
+                            f"{log['response_stats']}\n{log['log']}\n")
+        files = {"stacks": _collapsed(stacks), "search_log": "\n".join(logs)}
+        if self.parts:
+            # pstats only merges from files, so the workers' dumps go through a scratch directory
+            with tempfile.TemporaryDirectory() as scratch:
+                paths = []
+                for i, part in enumerate(self.parts):
+                    paths.append(os.path.join(scratch, f"{i}.pstats"))
+                    Path(paths[-1]).write_bytes(part["pstats"])
+                summary = io.StringIO()
+                stats = pstats.Stats(*paths, stream=summary)
+                stats.dump_stats(os.path.join(scratch, "merged.pstats"))
+                stats.sort_stats("cumulative").print_stats(60)
+                files["summary"] = summary.getvalue()
+                files["pstats"] = Path(scratch, "merged.pstats").read_bytes()
+        return files
+
+
+# ------------------- Switch -------------------
+
+_lock = threading.Lock()
+_settings = {"generate": 0, "slow_ms": None}
+_sampler: Optional[Sampler] = None
+_last_slow = 0.0
+
+
+def next_generate() -> Optional[GenerateProfile]:
+    """Claim one of the armed generate profiles, or None (the usual, lock-free case)."""
+    if not _settings["generate"]:
+        return None
+    with _lock:
+        if _settings["generate"] <= 0:
+            return None
+        _settings["generate"] -= 1
+    return GenerateProfile()
+
+
+def configure(generate: int, slow_ms: Optional[float]):
+    """Profile the next `generate` calls, and requests slower than `slow_ms` (None: off)."""
+    global _sampler
+    with _lock:
+        _settings.update(generate=generate, slow_ms=slow_ms)
+        if slow_ms is not None and _sampler is None:
+            _sampler = Sampler(SLOW_SAMPLE_SECONDS, window=SAMPLE_WINDOW).start()
+        elif slow_ms is None and _sampler is not None:
+            _sampler.stop()
+            _sampler = None
+
+
+def settings() -> dict:
+    with _lock:
+        return dict(_settings)
+
+
+# ------------------- Slow requests -------------------
+
+def _save_slow(scope, status: int, started: float, finished: float, tenant: str):
+    global _last_slow
+    sampler = _sampler
+    with _lock:
+        if sampler is None or finished - _last_slow < SLOW_PROFILE_GAP:
+            return
+        _last_slow = finished
+    counts = sampler.counts(started, finished)
+    route = getattr(scope.get("route"), "path", scope["path"])
+    _save("request", {
+        "tenant": tenant,
+        "method": scope["method"], "route": route, "path": scope["path"], "status": status,
+        "seconds": round(finished - started, 3), "samples": sum(counts.values()),
+        "note": "process-wide stack samples taken while the request ran",
+    }, {"stacks": _collapsed(counts)})
+
+
+class SlowRequestMiddleware:
+    """While a latency threshold is set, saves the stack samples of every request that exceeds it."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        threshold = _settings["slow_ms"]
+        if threshold is None or scope["type"] != "http" or scope["path"].startswith(router.prefix):
+            await self.app(scope, receive, send)
+            return
+        started = time.perf_counter()
+        status = 500
+
+        async def send_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        await self.app(scope, receive, send_status)
+        finished = time.perf_counter()
+        if (finished - started) * 1000 >= threshold:
+            await run_in_threadpool(_save_slow, scope, status, started, finished, storage.current_tenant())
+
+
+# ------------------- Routes -------------------
+
+class ProfilingSettings(BaseModel):
+    generate: int = Field(0, ge=0, le=100, description="profile the next N generate calls")
+    slow_ms: Optional[float] = Field(None, gt=0, description="profile requests slower than this; null turns it off")
+
+
+@router.get("")
+def get_profiling(current_user: dict = Depends(get_current_user)):
+    require_operator(current_user)
+    return {"settings": settings(), "profiles": list_profiles()}
+
+
+@router.put("/settings")
+def set_profiling(data: ProfilingSettings, current_user: dict = Depends(get_current_user)):
+    """Arm (or with zeros/null, disarm) profiling; replaces the previous settings."""
+    require_operator(current_user)
+    configure(data.generate, data.slow_ms)
+    return {"status": "profiling updated", "settings": settings()}
+
+
+@router.get("/{profile_id}")
+def get_profile(profile_id: str, current_user: dict = Depends(get_current_user)):
+    require_operator(current_user)
+    return json.loads((_profile_path(profile_id) / "meta.json").read_text(encoding="utf-8"))
+
+
+@router.get("/{profile_id}/{artifact}")
+def download_artifact(profile_id: str, artifact: str, current_user: dict = Depends(get_current_user)):
+    """pstats (for `python -m pstats` or snakeviz), summary, stacks (collapsed, for flamegraphs) or search_log."""
+    require_operator(current_user)
+    path = _profile_path(profile_id) / ARTIFACTS.get(artifact, "-")
+    if not path.exists():
+        raise HTTPException(404, detail=f"Profile {profile_id} has no {artifact}")
+    media_type = "application/octet-stream" if artifact == "pstats" else "text/plain"
+    return FileResponse(path, media_type=media_type, filename=f"{profile_id}-{path.name}")
+
+
+@router.delete("/{profile_id}")
+def delete_profile(profile_id: str, current_user: dict = Depends(get_current_user)):
+    require_operator(current_user)
+    shutil.rmtree(_profile_path(profile_id), ignore_errors=True)
+    return {"status": "profile deleted", "id": profile_id}
@@ -0,0 +1,125 @@
+# backend/result_cache.py
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Optional
+
+MAX_ENTRIES = 32                  # solved problems kept in memory
+MAX_BYTES = 64 * 1024 * 1024      # ... and their total JSON size
+# Set TIMETABLE_CACHE_DIR to keep results across restarts (one file per problem)
+CACHE_DIR = os.environ.get("TIMETABLE_CACHE_DIR")
+
+_entries: "OrderedDict[str, tuple]" = OrderedDict()   # key -> (size in bytes, value)
+_bytes = 0
+_lock = threading.Lock()
+
+
+def problem_key(*parts: Any, namespace: Optional[str] = None) -> str:
+    """
+    Content hash of everything that decides a solve (solver state, seed,
+    options, ...). Dict key order doesn't matter; tuples hash like lists.
+    With a namespace (the tenant) the key is "<namespace>/<hash>", so each
+    college only ever hits its own results and can clear them alone.
+    """
+    canonical = json.dumps(parts, sort_keys=True, separators=(",", ":"), default=str)
+    digest = hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+    return f"{namespace}/{digest}" if namespace else digest
+
+
+def _path(key: str) -> Optional[Path]:
+    return Path(CACHE_DIR) / f"{key}.json" if CACHE_DIR else None
+
+
+def _remember(key: str, value: Any, size: int):
+    global _bytes
+    if key in _entries:
+        _bytes -= _entries.pop(key)[0]
+    _entries[key] = (size, value)
+    _bytes += size
+    while _entries and (len(_entries) > MAX_ENTRIES or _bytes > MAX_BYTES):
+        old_key, (old_size, _) = _entries.popitem(last=False)
+        _bytes -= old_size
+        path = _path(old_key)
+        if path is not None:
+            path.unlink(missing_ok=True)
+
+
+def get(key: str) -> Optional[Any]:
+    with _lock:
+        hit = _entries.get(key)
+        if hit is not None:
+            _entries.move_to_end(key)
+            return hit[1]
+    path = _path(key)
+    if path is None or not path.exists():
+        return None
+    try:
+        text = path.read_text(encoding="utf-8")
+        value = json.loads(text)
+    except (OSError, ValueError):
+        return None  # half-written or unreadable; treat as a miss
+    with _lock:
+        _remember(key, value, len(text))
+    return value
+
+
+def _prune_disk():
+    """Keep CACHE_DIR within MAX_ENTRIES / MAX_BYTES, newest files first; covers files left by earlier runs."""
+    files = []
+    for path in Path(CACHE_DIR).rglob("*.json"):
+        try:
+            st = path.stat()
+        except FileNotFoundError:
+            continue
+        files.append((st.st_mtime, st.st_size, path))
+    files.sort(reverse=True)
+    total = 0
+    for i, (_, size, path) in enumerate(files):
+        total += size
+        if i >= MAX_ENTRIES or total > MAX_BYTES:
+            path.unlink(missing_ok=True)
+
+
+def put(key: str, value: Any):
+    text = json.dumps(value, separators=(",", ":"))
+    with _lock:
+        _remember(key, value, len(text))
+    path = _path(key)
+    if path is not None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # A temp file per writer: two identical solves finishing together both land safely
+        fd, tmp = tempfile.mkstemp(prefix=f".{path.name}.", suffix=".tmp", dir=path.parent)
+        try:
+            with open(fd, "w", encoding="utf-8") as f:
+                f.write(text)
+            os.replace(tmp, path)
+        except BaseException:
+            Path(tmp).unlink(missing_ok=True)
+            raise
+        _prune_disk()
+
+
+def clear(namespace: Optional[str] = None) -> int:
+    """Drop every entry, or only one namespace's; returns how many were in memory."""
+    global _bytes
+    prefix = f"{namespace}/" if namespace else ""
+    with _lock:
+        keys = [k for k in _entries if k.startswith(prefix)]
+        for key in keys:
+            _bytes -= _entries.pop(key)[0]
+    if CACHE_DIR:
+        root = Path(CACHE_DIR) / namespace if namespace else Path(CACHE_DIR)
+        for path in root.rglob("*.json") if root.is_dir() else ():
+            path.unlink(missing_ok=True)
+    return len(keys)
+
+
+def stats(namespace: Optional[str] = None) -> dict:
+    prefix = f"{namespace}/" if namespace else ""
+    with _lock:
+        sizes = [size for k, (size, _) in _entries.items() if k.startswith(prefix)]
+    return {"entries": len(sizes), "bytes": sum(sizes), "persistent": bool(CACHE_DIR)}
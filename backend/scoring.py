@@ -0,0 +1,227 @@
+# backend/scoring.py
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from . import columnar, soft_constraints, week
+
+# Penalty per unit of each metric; a candidate's score is the weighted sum (lower is better)
+WEIGHTS = {
+    "clashes": 1000.0,          # double-booked teacher/batch/room slots (should always be 0)
+    "over_capacity": 50.0,      # classes in a room smaller than the batch
+    "batch_gaps": 2.0,          # free periods between a batch's first and last class of a day
+    "teacher_gaps": 1.0,
+    "subject_repeats": 3.0,     # extra classes of a subject on a day it already has one
+    "last_period": 0.5,         # classes in the last teaching period of the day
+    "capacity_slack": 5.0,      # mean unused share of room seats (0..1)
+}
+METRICS = tuple(WEIGHTS) + ("room_utilization", "entries")
+
+
+# ------------------- Context -------------------
+
+class Context:
+    """
+    What scoring needs beyond the timetable: the week grid, room capacities,
+    batch sizes and the periods one class of each (batch, subject) takes.
+    """
+
+    def __init__(self, grid: week.Grid, capacity: Optional[Dict[str, int]] = None,
+                 size: Optional[Dict[str, int]] = None, class_periods: Optional[Dict[Tuple[str, str], int]] = None):
+        self.grid = grid
+        self.days = list(grid.days)
+        self.day_index = grid.day_index
+        self.n_periods = grid.n_periods
+        self.teaching = np.array(grid.teaching, dtype=bool).reshape(grid.n_days, grid.n_periods + 1)
+        self.teaching_before = np.cumsum(self.teaching, axis=1)   # per day, teaching periods in 1..q
+        self.last_period = np.array(grid.last_period, dtype=np.int64)   # per day
+        self.capacity = dict(capacity or {})
+        self.size = dict(size or {})
+        self.class_periods = dict(class_periods or {})   # (batch, subject name) -> periods, default 1
+
+    @classmethod
+    def from_solver_state(cls, solver_state: Dict[str, Any]) -> "Context":
+        batches = solver_state.get("batches", {}) or {}
+        if isinstance(batches, dict):
+            batches = batches.values()
+        grid = week.compile(solver_state.get("config", {}) or {})
+        return cls(
+            grid,
+            {r.get("name"): int(r.get("capacity", 0)) for r in solver_state.get("rooms", []) or []},
+            {b.get("name"): int(b.get("size", 0)) for b in batches},
+            {(s.get("batch"), s.get("name") or s.get("code")): grid.class_periods(s)
+             for s in solver_state.get("subjects", []) or []},
+        )
+
+
+# ------------------- Metrics -------------------
+
+def _column(tt: columnar.Timetable, column: str) -> np.ndarray:
+    return np.frombuffer(tt.codes[column], dtype=np.uint16 if tt.codes[column].typecode == "H" else np.uint32).astype(np.int64)
+
+
+def _lookup(table: list, mapping: Dict[Any, Any], missing, dtype=np.int64) -> np.ndarray:
+    """mapping applied to a lookup table, so it can be indexed by the column's codes."""
+    return np.array([mapping.get(v, missing) for v in table], dtype=dtype)
+
+
+def _occupancy(owner: np.ndarray, slot: np.ndarray, n_owners: int, n_slots: int) -> np.ndarray:
+    """Classes per (owner, slot), as an n_owners x n_slots count grid."""
+    return np.bincount(owner * n_slots + slot, minlength=n_owners * n_slots).reshape(n_owners, n_slots)
+
+
+def _gaps(occupied: np.ndarray, ctx: Context) -> int:
+    """Free teaching periods between each owner's first and last class, summed over owners and days."""
+    P = ctx.n_periods + 1
+    busy = occupied.reshape(-1, P) > 0          # one row per (owner, day)
+    day = np.tile(np.arange(len(ctx.days)), len(busy) // max(1, len(ctx.days)))
+    keep = busy.any(axis=1)
+    busy, day = busy[keep], day[keep]
+    if not len(busy):
+        return 0
+    first = busy.argmax(axis=1)
+    last = P - 1 - busy[:, ::-1].argmax(axis=1)
+    span = ctx.teaching_before[day, last] - ctx.teaching_before[day, first - 1]
+    return int((span - busy.sum(axis=1)).sum())
+
+
+def _clashes(occupied: np.ndarray) -> int:
+    return int(np.clip(occupied - 1, 0, None).sum())
+
+
+def _sorted_unique(keys: np.ndarray) -> np.ndarray:
+    keys = np.sort(keys)
+    return keys[np.r_[True, keys[1:] != keys[:-1]]] if len(keys) else keys
+
+
+class Rows:
+    """
+    A timetable's rows as integer arrays (teaching periods only), the shape
+    metrics and soft constraints count over. Owner x slot occupancy grids are
+    built on first use and shared.
+    """
+
+    def __init__(self, timetable, ctx: Context):
+        tt = columnar.unpack(timetable)
+        self.tt, self.ctx = tt, ctx
+        self.D, self.P = len(ctx.days), ctx.n_periods + 1
+        day = _lookup(tt.tables["day"], ctx.day_index, -1)[_column(tt, "day")]
+        period = np.array([p if isinstance(p, int) else -1 for p in tt.tables["period"]], dtype=np.int64)[_column(tt, "period")]
+        ok = (day >= 0) & (period > 0) & (period < self.P)
+        ok[ok] = ctx.teaching[day[ok], period[ok]]
+        self.day, self.period = day[ok], period[ok]
+        self.code = {c: _column(tt, c)[ok] for c in ("teacher", "batch", "room", "subject")}
+        self.slot = self.day * self.P + self.period
+        self.n_slots = self.D * self.P
+        self._occupied: Dict[str, np.ndarray] = {}
+
+    def occupied(self, kind: str) -> np.ndarray:
+        """Classes per (teacher/batch/room, slot); reshape(-1, P) gives one row per owner and day."""
+        if kind not in self._occupied:
+            self._occupied[kind] = _occupancy(self.code[kind], self.slot, len(self.tt.tables[kind]), self.n_slots)
+        return self._occupied[kind]
+
+    def repeats(self) -> int:
+        """
+        Classes of a subject beyond the first on a day, as spread_days counts
+        them: one class is the subject's class_periods, so a double period is
+        one class but two single periods back to back are two.
+        """
+        D, P = self.D, self.P
+        n_subjects = len(self.tt.tables["subject"])
+        batch, subject = self.code["batch"], self.code["subject"]
+        keys = _sorted_unique(((batch * n_subjects + subject) * D + self.day) * P + self.period)
+        groups, periods = np.unique(keys // P, return_counts=True)
+        pairs, pair_of = np.unique(groups // D, return_inverse=True)
+        length = np.array([self.ctx.class_periods.get((self.tt.tables["batch"][k // n_subjects],
+                                                       self.tt.tables["subject"][k % n_subjects]), 1)
+                           for k in pairs], dtype=np.int64)
+        classes = -(-periods // length[pair_of])
+        return int((classes - 1).sum())
+
+
+def metrics(timetable, ctx: Context, soft: Optional[List[dict]] = None) -> Dict[str, float]:
+    """
+    Quality metrics of one timetable, in a handful of array passes over its
+    integer codes, plus the penalty count of each soft constraint in `soft`.
+    """
+    rows = Rows(timetable, ctx)
+    tt, code = rows.tt, rows.code
+    capacity = _lookup(tt.tables["room"], ctx.capacity, np.nan, np.float64)[code["room"]]
+    size = _lookup(tt.tables["batch"], ctx.size, np.nan, np.float64)[code["batch"]]
+    known = ~np.isnan(capacity) & ~np.isnan(size) & (capacity > 0)
+    slack = 1.0 - size[known] / capacity[known]
+
+    by_teacher, by_batch, by_room = (rows.occupied(k) for k in ("teacher", "batch", "room"))
+    room_slots = max(1, len(ctx.capacity) or len(tt.tables["room"])) * max(1, int(ctx.teaching.sum()))
+    values = {
+        "clashes": _clashes(by_teacher) + _clashes(by_batch) + _clashes(by_room),
+        "over_capacity": int((slack < 0).sum()),
+        "batch_gaps": _gaps(by_batch, ctx),
+        "teacher_gaps": _gaps(by_teacher, ctx),
+        "subject_repeats": rows.repeats(),
+        "last_period": int((rows.period == ctx.last_period[rows.day]).sum()),
+        "capacity_slack": round(float(np.clip(slack, 0, None).mean()), 4) if len(slack) else 0.0,
+        "room_utilization": round(int((by_room > 0).sum()) / room_slots, 4),
+        "entries": len(tt),
+    }
+    for c in soft or ():
+        values[c["name"]] = soft_constraints.CONSTRAINTS[c["name"]].count(rows, c["params"])
+    return values
+
+
+def weights(soft: Optional[List[dict]] = None) -> Dict[str, float]:
+    """WEIGHTS plus the weight of each soft constraint in `soft`, which takes over the metric it `replaces`."""
+    out = {**WEIGHTS, **{c["name"]: c["weight"] for c in soft or ()}}
+    for c in soft or ():
+        out.pop(soft_constraints.CONSTRAINTS[c["name"]].replaces, None)
+    return out
+
+
+def score(values: Dict[str, float], weights: Optional[Dict[str, float]] = None) -> float:
+    weights = WEIGHTS if weights is None else weights
+    return round(sum(w * float(values.get(m, 0)) for m, w in weights.items()), 4)
+
+
+# ------------------- Diff -------------------
+
+MAX_DIFF_ROWS = 500
+
+
+def _row_set(timetable) -> set:
+    tt = columnar.unpack(timetable)
+    return set(zip(*(map(tt.tables[c].__getitem__, tt.codes[c]) for c in columnar.COLUMNS)))
+
+
+def diff(a, b) -> dict:
+    """Rows only in a, only in b, and classes that kept their slot but changed room."""
+    rows_a, rows_b = _row_set(a), _row_set(b)
+    only_a, only_b = rows_a - rows_b, rows_b - rows_a
+
+    def slot_key(row):  # day, period, teacher, subject, batch
+        return row[0], row[1], row[3], row[4], row[5]
+
+    rooms_a = {slot_key(r): r[2] for r in only_a}
+    room_changes = [
+        {"day": k[0], "period": k[1], "subject": k[3], "batch": k[4], "from": rooms_a[k], "to": r[2]}
+        for r in only_b for k in [slot_key(r)] if k in rooms_a
+    ]
+    moved = {(k["day"], k["period"], k["subject"], k["batch"]) for k in room_changes}
+
+    def listed(rows):
+        out = [dict(zip(columnar.COLUMNS, r)) for r in rows if (r[0], r[1], r[4], r[5]) not in moved]
+        out.sort(key=lambda e: (str(e["day"]), e["period"], str(e["batch"])))
+        return out
+
+    removed, added = listed(only_a), listed(only_b)
+    return {
+        "unchanged": len(rows_a & rows_b),
+        "room_changes": len(room_changes),
+        "removed": len(removed),
+        "added": len(added),
+        "details": {
+            "room_changes": room_changes[:MAX_DIFF_ROWS],
+            "removed": removed[:MAX_DIFF_ROWS],
+            "added": added[:MAX_DIFF_ROWS],
+        },
+    }
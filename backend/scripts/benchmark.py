@@ -0,0 +1,196 @@
+# backend/scripts/benchmark.py
+"""
+Solver benchmark: synthetic institutes of growing size through the same
+pipeline as POST /timetable/generate (_build_solver_state -> make_timetable
+-> scoring), with solve time, peak memory, score and feasibility rate
+written to JSON.
+
+    python -m backend.scripts.benchmark                       # small + medium, 3 seeds each
+    python -m backend.scripts.benchmark --tiers all --out bench.json
+    python -m backend.scripts.benchmark --compare bench.json  # exit 1 on a regression
+
+Each run solves in a fresh process, so its peak RSS is its own.
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import statistics
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+
+from backend import demo_data, scoring, soft_constraints, solver
+
+# Problem sizes (demo_data.get_synthetic_state arguments) and the time budget per solve
+TIERS = {
+    "small": {"batches": 6, "teachers": 12, "rooms": 6, "subjects_per_batch": 6, "time_limit": 10},
+    "medium": {"batches": 24, "teachers": 48, "rooms": 16, "subjects_per_batch": 7, "time_limit": 30},
+    "large": {"batches": 60, "teachers": 120, "rooms": 40, "subjects_per_batch": 7, "time_limit": 60},
+    "xlarge": {"batches": 150, "teachers": 300, "rooms": 100, "subjects_per_batch": 8, "time_limit": 120},
+}
+DEFAULT_TIERS = ("small", "medium")
+TOLERANCE = 0.25   # --compare: slower or worse by more than this share is a regression
+MIN_SLOWDOWN = 0.5  # ... and, for times, by more than this many seconds (timer noise on tiny tiers)
+
+
+# ------------------- One run -------------------
+
+def _peak_rss_mb() -> float:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)   # bytes on macOS, KB elsewhere
+
+
+def run_once(problem: dict, seed: int, time_limit: float, workers: int, soft: list) -> dict:
+    """Generate, build, solve and score one problem; runs in its own process."""
+    from backend.main import _build_solver_state
+
+    state = demo_data.get_synthetic_state(seed=seed, **problem)
+    solver_state = _build_solver_state(state)
+    result = {"seed": seed, "feasible": False, "error": None}
+    started = time.perf_counter()
+    try:
+        timetable = solver.make_timetable(solver_state, seed=seed, time_limit=time_limit, workers=workers, soft=soft)
+    except (ValueError, RuntimeError) as e:
+        result["error"] = str(e)
+    else:
+        ctx = scoring.Context.from_solver_state(solver_state)
+        values = scoring.metrics(timetable, ctx, soft)
+        result.update(feasible=True, entries=len(timetable),
+                      score=scoring.score(values, scoring.weights(soft)), metrics=values)
+    result["seconds"] = round(time.perf_counter() - started, 3)
+    result["peak_rss_mb"] = _peak_rss_mb()
+    return result
+
+
+# ------------------- Suite -------------------
+
+def _summary(runs: list) -> dict:
+    ok = [r for r in runs if r["feasible"]]
+    seconds = sorted(r["seconds"] for r in runs)
+    return {
+        "feasible_rate": round(len(ok) / len(runs), 3) if runs else 0.0,
+        "seconds_median": round(statistics.median(seconds), 3) if seconds else None,
+        "seconds_max": seconds[-1] if seconds else None,
+        "peak_rss_mb": max((r["peak_rss_mb"] for r in runs), default=None),
+        "score_median": round(statistics.median(r["score"] for r in ok), 4) if ok else None,
+    }
+
+
+def run_suite(tiers, seeds: int = 3, workers: int = 1, soft=None, overrides=None, log=print) -> dict:
+    """Every tier x seed; returns the report dict written by main()."""
+    soft = soft_constraints.resolve(soft)
+    report = {
+        "meta": {
+            "started_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "ortools": _version("ortools"),
+            "numpy": _version("numpy"),
+            "workers": workers,
+            "seeds": seeds,
+            "soft_constraints": soft,
+        },
+        "tiers": {},
+    }
+    ctx = multiprocessing.get_context("spawn")
+    for name in tiers:
+        params = {**TIERS[name], **(overrides or {})}
+        time_limit = params.pop("time_limit")
+        runs = []
+        for seed in range(seeds):
+            # max_tasks_per_child=1: a new process per run keeps peak memory per run
+            with ProcessPoolExecutor(max_workers=1, mp_context=ctx, max_tasks_per_child=1) as pool:
+                run = pool.submit(run_once, params, seed, time_limit, workers, soft).result()
+            runs.append(run)
+            status = f"score {run['score']}" if run["feasible"] else f"failed: {run['error']}"
+            log(f"  {name} seed {seed}: {run['seconds']}s, {run['peak_rss_mb']} MB, {status}")
+        report["tiers"][name] = {"problem": params, "time_limit": time_limit, "runs": runs, "summary": _summary(runs)}
+    return report
+
+
+def _version(package: str):
+    try:
+        from importlib.metadata import version
+        return version(package)
+    except Exception:
+        return None
+
+
+# ------------------- Comparison -------------------
+
+def compare(baseline: dict, current: dict, tolerance: float = TOLERANCE) -> list:
+    """Regressions of current against baseline, tier by tier, as readable lines."""
+    problems = []
+    for name, tier in current["tiers"].items():
+        base = baseline.get("tiers", {}).get(name)
+        if base is None:
+            continue
+        if (base["problem"], base["time_limit"]) != (tier["problem"], tier["time_limit"]):
+            problems.append(f"{name}: not comparable, the problem or time limit changed")
+            continue
+        was, now = base["summary"], tier["summary"]
+        if now["feasible_rate"] < was["feasible_rate"]:
+            problems.append(f"{name}: feasible rate {was['feasible_rate']} -> {now['feasible_rate']}")
+        for key in ("seconds_median", "peak_rss_mb", "score_median"):
+            if not was.get(key) or now.get(key) is None or now[key] <= was[key] * (1 + tolerance):
+                continue
+            if key == "seconds_median" and now[key] - was[key] <= MIN_SLOWDOWN:
+                continue
+            problems.append(f"{name}: {key} {was[key]} -> {now[key]}")
+    return problems
+
+
+# ------------------- CLI -------------------
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--tiers", default=",".join(DEFAULT_TIERS), help=f"comma separated, or 'all' ({', '.join(TIERS)})")
+    parser.add_argument("--seeds", type=int, default=3, help="runs per tier (seeds 0..n-1)")
+    parser.add_argument("--workers", type=int, default=1, help="CP-SAT workers per solve")
+    parser.add_argument("--time-limit", type=float, help="override every tier's time budget (seconds)")
+    parser.add_argument("--lab-share", type=float, default=0.2)
+    parser.add_argument("--availability", type=float, default=1.0)
+    parser.add_argument("--fixed-share", type=float, default=0.0)
+    parser.add_argument("--soft", default="", help="soft constraints to minimise, e.g. avoid_last_slot,spread_days")
+    parser.add_argument("--out", help="write the JSON report here (default: stdout)")
+    parser.add_argument("--compare", help="earlier report to check against; exit 1 on a regression")
+    parser.add_argument("--tolerance", type=float, default=TOLERANCE)
+    args = parser.parse_args(argv)
+
+    tiers = list(TIERS) if args.tiers == "all" else [t.strip() for t in args.tiers.split(",") if t.strip()]
+    unknown = [t for t in tiers if t not in TIERS]
+    if unknown:
+        parser.error(f"unknown tier(s) {unknown}")
+    overrides = {"lab_share": args.lab_share, "availability": args.availability, "fixed_share": args.fixed_share}
+    if args.time_limit:
+        overrides["time_limit"] = args.time_limit
+    soft = [{"name": n.strip()} for n in args.soft.split(",") if n.strip()]
+
+    log = lambda line: print(line, file=sys.stderr)
+    report = run_suite(tiers, args.seeds, args.workers, soft, overrides, log=log)
+    text = json.dumps(report, indent=2)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+        log(f"✅ Report written to {args.out}")
+    else:
+        print(text)
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            problems = compare(json.load(f), report, args.tolerance)
+        for line in problems:
+            log(f"⚠️ Regression {line}")
+        if problems:
+            return 1
+        log("✅ No regressions")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,339 @@
+# backend/scripts/loadtest.py
+"""
+HTTP load test: students reading timetables, faculty checking /auth/me and
+their own timetable, admins writing CRUD, in a weighted mix, with p50/p95/p99
+latency, throughput and error rate per route written to JSON.
+
+    python -m backend.scripts.loadtest                        # in-process, temp storage, 30 s
+    python -m backend.scripts.loadtest --concurrency 50 --duration 60 --out load.json
+    python -m backend.scripts.loadtest --url http://127.0.0.1:8000 --seed   # a running uvicorn
+    python -m backend.scripts.loadtest --compare load.json    # exit 1 on a regression
+
+In-process runs drive backend.main:app over the ASGI transport against a
+fresh temp data directory, so nothing real is touched. Against --url, the
+server's data is only replaced when --seed is given.
+"""
+import argparse
+import asyncio
+import contextlib
+import json
+import math
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Callable, Dict, List, NamedTuple, Optional
+
+try:  # optional: only the load test needs an HTTP client
+    import httpx
+except ImportError:
+    httpx = None
+
+from backend import demo_data
+
+ADMIN = ("admin", "admin123")        # the default admin main.py creates; --admin overrides it
+PASSWORD = "loadtest"                # for the generated faculty/student accounts
+USERS_PER_ROLE = 5
+SOLVE_SECONDS = 20                   # budget for the one generate that seeds the timetable
+TOLERANCE = 0.25                     # --compare: p95 / throughput / error rate worse by more than this share
+MIN_SLOWDOWN_MS = 5.0                # ... and p95 worse by more than this (timer noise)
+
+
+# ------------------- Scenarios -------------------
+
+class Scenario(NamedTuple):
+    name: str                        # the route, as reported
+    weight: float
+    role: str                        # whose token it uses: student | faculty | admin
+    request: Callable                # (rng, world) -> (method, path, kwargs)
+
+
+def _batch_view(rng, w):
+    return "GET", f"/timetable/latest/batch/{rng.choice(w['batches'])}", {}
+
+
+def _teacher_view(rng, w):
+    return "GET", f"/timetable/latest/teacher/{rng.choice(w['teachers'])}", {}
+
+
+def _revalidate(rng, w):
+    return "GET", "/timetable/latest", {"headers": {"If-None-Match": w["etag"]}}
+
+
+def _add_room(rng, w):
+    w["rooms_added"] += 1
+    return "POST", "/rooms", {"json": {"name": f"LT Room {w['rooms_added']}", "capacity": rng.choice((40, 60, 80))}}
+
+
+def _add_teacher(rng, w):
+    w["teachers_added"] += 1
+    n = w["teachers_added"]
+    return "POST", "/teachers", {"json": {"name": f"LT Teacher {n}", "code": f"LT{n}", "max_load": 12}}
+
+
+SCENARIOS = [
+    Scenario("GET /timetable/latest", 30, "student", lambda rng, w: ("GET", "/timetable/latest", {})),
+    Scenario("GET /timetable/latest (If-None-Match)", 15, "student", _revalidate),
+    Scenario("GET /timetable/latest/batch/{name}", 20, "student", _batch_view),
+    Scenario("GET /auth/me", 15, "faculty", lambda rng, w: ("GET", "/auth/me", {})),
+    Scenario("GET /timetable/latest/teacher/{code}", 10, "faculty", _teacher_view),
+    Scenario("GET /classrooms", 5, "admin", lambda rng, w: ("GET", "/classrooms", {})),
+    Scenario("POST /rooms", 3, "admin", _add_room),
+    Scenario("POST /teachers", 2, "admin", _add_teacher),
+]
+EXPECTED = {200, 304}
+
+
+# ------------------- Seeding -------------------
+
+async def _login(client, username: str, password: str) -> Dict[str, str]:
+    r = await client.post("/auth/login", data={"username": username, "password": password})
+    r.raise_for_status()
+    return {"Authorization": f"Bearer {r.json()['access_token']}"}
+
+
+async def seed(client, admin: Dict[str, str], problem: dict, seed_value: int, log) -> None:
+    """Fill the (empty) app with a synthetic institute, a finalized timetable and test users."""
+    state = demo_data.get_synthetic_state(seed=seed_value, **problem)
+    await client.post("/config", json=state["config"], headers=admin)
+    users = [{"username": f"{role}{i}", "password": PASSWORD, "role": role}
+             for role in ("faculty", "student") for i in range(1, USERS_PER_ROLE + 1)]
+    for kind, rows in (("rooms", state["rooms"]), ("teachers", state["teachers"]),
+                       ("batches", state["batches"]), ("subjects", state["subjects"]), ("users", users)):
+        r = await client.post(f"/import/{kind}", json=rows, headers=admin, params={"skip_invalid": "true"})
+        r.raise_for_status()
+    log(f"  seeded {len(state['batches'])} batches, {len(state['subjects'])} subjects")
+    r = await client.post("/timetable/generate", headers=admin, timeout=SOLVE_SECONDS * 5,
+                          json={"summary_only": True, "time_limit_seconds": SOLVE_SECONDS, "seed": seed_value})
+    r.raise_for_status()
+    best = r.json()["ranking"][0]
+    (await client.post("/timetable/finalize", json={"choice": best}, headers=admin)).raise_for_status()
+    log(f"  finalized candidate {best}")
+
+
+async def world(client, admin: Dict[str, str]) -> dict:
+    """Tokens per role and the names the scenarios pick from."""
+    tokens = {"admin": [admin]}
+    for role in ("faculty", "student"):
+        tokens[role] = [await _login(client, f"{role}{i}", PASSWORD) for i in range(1, USERS_PER_ROLE + 1)]
+    latest = await client.get("/timetable/latest", headers=admin)
+    latest.raise_for_status()
+    rows = latest.json()
+    return {
+        "tokens": tokens,
+        "etag": latest.headers.get("etag", ""),
+        "batches": sorted({r["batch"] for r in rows}) or ["-"],
+        "teachers": sorted({r["teacher"] for r in rows}) or ["-"],
+        "rooms_added": 0,
+        "teachers_added": 0,
+    }
+
+
+# ------------------- Driver -------------------
+
+async def _user(client, w: dict, rng: random.Random, deadline: float, samples: Dict[str, list]):
+    """One virtual user: weighted scenario picks until the deadline."""
+    weights = [s.weight for s in SCENARIOS]
+    while time.perf_counter() < deadline:
+        s = rng.choices(SCENARIOS, weights)[0]
+        method, path, kwargs = s.request(rng, w)
+        headers = {**rng.choice(w["tokens"][s.role]), **kwargs.pop("headers", {})}
+        started = time.perf_counter()
+        try:
+            r = await client.request(method, path, headers=headers, **kwargs)
+            await r.aread()
+            ok = r.status_code in EXPECTED
+        except httpx.HTTPError:
+            ok = False
+        samples[s.name].append(((time.perf_counter() - started) * 1000, ok))
+
+
+def percentile(sorted_values: List[float], q: float) -> Optional[float]:
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return None
+    k = max(0, min(len(sorted_values) - 1, math.ceil(q / 100 * len(sorted_values)) - 1))
+    return round(sorted_values[k], 2)
+
+
+def _stats(points: list, seconds: float) -> dict:
+    latencies = sorted(ms for ms, _ in points)
+    errors = sum(1 for _, ok in points if not ok)
+    return {
+        "requests": len(points),
+        "errors": errors,
+        "error_rate": round(errors / len(points), 4) if points else 0.0,
+        "throughput_rps": round(len(points) / seconds, 1),
+        "p50_ms": percentile(latencies, 50),
+        "p95_ms": percentile(latencies, 95),
+        "p99_ms": percentile(latencies, 99),
+        "max_ms": round(latencies[-1], 2) if latencies else None,
+    }
+
+
+async def drive(client, w: dict, concurrency: int, duration: float, seed_value: int) -> dict:
+    samples: Dict[str, list] = {s.name: [] for s in SCENARIOS}
+    started = time.perf_counter()
+    deadline = started + duration
+    await asyncio.gather(*(_user(client, w, random.Random(seed_value * 1000 + i), deadline, samples)
+                           for i in range(concurrency)))
+    seconds = time.perf_counter() - started
+    routes = {name: _stats(points, seconds) for name, points in samples.items() if points}
+    return {"seconds": round(seconds, 2), "total": _stats([p for ps in samples.values() for p in ps], seconds),
+            "routes": routes}
+
+
+# ------------------- Runs -------------------
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=Path(__file__).parent, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+@contextlib.contextmanager
+def _stdout_to_stderr():
+    """
+    Send everything printed meanwhile to stderr, including the app's startup
+    lines and its solver processes (which share fd 1), so stdout carries
+    nothing but the JSON report.
+    """
+    sys.stdout.flush()
+    saved = os.dup(1)
+    os.dup2(2, 1)
+    try:
+        with contextlib.redirect_stdout(sys.stderr):
+            yield
+    finally:
+        sys.stdout.flush()
+        os.dup2(saved, 1)
+        os.close(saved)
+
+
+async def run_in_process(args, log) -> dict:
+    from backend import storage
+    data = Path(tempfile.mkdtemp(prefix="timetable-load-"))
+    storage.DATA_FILE, storage.DB_FILE, storage.TENANTS_DIR = data / "data.json", data / "data.db", data / "tenants"
+    from backend.main import app
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://loadtest", timeout=args.timeout) as client:
+            admin = await _login(client, *ADMIN)
+            await seed(client, admin, _problem(args), args.seed_value, log)
+            w = await world(client, admin)
+            return await drive(client, w, args.concurrency, args.duration, args.seed_value)
+
+
+async def run_remote(args, log) -> dict:
+    limits = httpx.Limits(max_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=args.url, timeout=args.timeout, limits=limits) as client:
+        admin = await _login(client, *args.admin.split(":", 1))
+        if args.seed:
+            (await client.post("/reset", headers=admin)).raise_for_status()
+            admin = await _login(client, *ADMIN)   # /reset recreates the default admin
+            await seed(client, admin, _problem(args), args.seed_value, log)
+        w = await world(client, admin)
+        return await drive(client, w, args.concurrency, args.duration, args.seed_value)
+
+
+def _problem(args) -> dict:
+    from backend.scripts.benchmark import TIERS
+    return {k: v for k, v in TIERS[args.tier].items() if k != "time_limit"}
+
+
+# ------------------- Comparison -------------------
+
+def compare(baseline: dict, current: dict, tolerance: float = TOLERANCE) -> list:
+    """Routes whose p95, throughput or error rate got worse than in baseline."""
+    if baseline.get("settings") != current.get("settings"):
+        return ["not comparable, the settings (mode, tier, concurrency, duration, backend) changed"]
+    problems = []
+    for name, now in {"total": current["total"], **current["routes"]}.items():
+        was = baseline["total"] if name == "total" else baseline["routes"].get(name)
+        if was is None:
+            continue
+        if now["p95_ms"] > was["p95_ms"] * (1 + tolerance) and now["p95_ms"] - was["p95_ms"] > MIN_SLOWDOWN_MS:
+            problems.append(f"{name}: p95 {was['p95_ms']} -> {now['p95_ms']} ms")
+        if now["throughput_rps"] < was["throughput_rps"] * (1 - tolerance):
+            problems.append(f"{name}: throughput {was['throughput_rps']} -> {now['throughput_rps']} req/s")
+        if now["error_rate"] > was["error_rate"] + 0.01:
+            problems.append(f"{name}: error rate {was['error_rate']} -> {now['error_rate']}")
+    return problems
+
+
+# ------------------- CLI -------------------
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--url", help="load a running server instead of the app in-process")
+    parser.add_argument("--seed", action="store_true", help="with --url: reset and seed the server first")
+    parser.add_argument("--admin", default=":".join(ADMIN), help="with --url: admin user:password")
+    parser.add_argument("--tier", default="medium", help="synthetic institute size (benchmark TIERS)")
+    parser.add_argument("--seed-value", type=int, default=0, help="institute and scenario-mix seed")
+    parser.add_argument("--concurrency", type=int, default=20, help="virtual users")
+    parser.add_argument("--duration", type=float, default=30, help="seconds of load")
+    parser.add_argument("--timeout", type=float, default=30, help="per-request timeout (seconds)")
+    parser.add_argument("--out", help="write the JSON report here (default: stdout)")
+    parser.add_argument("--compare", help="earlier report to check against; exit 1 on a regression")
+    parser.add_argument("--tolerance", type=float, default=TOLERANCE)
+    args = parser.parse_args(argv)
+    if httpx is None:
+        parser.error("the load test needs httpx: pip install httpx")
+
+    log = lambda line: print(line, file=sys.stderr)
+    mode = "remote" if args.url else "in-process"
+    log(f"🚦 {mode} load: {args.concurrency} users for {args.duration:g}s")
+    with _stdout_to_stderr():
+        result = asyncio.run(run_remote(args, log) if args.url else run_in_process(args, log))
+
+    from backend import storage
+    report = {
+        "meta": {
+            "started_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "commit": _git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+        },
+        "settings": {
+            "mode": mode,
+            "tier": args.tier,
+            "seed": args.seed_value,
+            "concurrency": args.concurrency,
+            "duration": args.duration,
+            "storage": storage.STORAGE_BACKEND if not args.url else None,
+            "mix": {s.name: s.weight for s in SCENARIOS},
+        },
+        **result,
+    }
+    total = report["total"]
+    log(f"✅ {total['requests']} requests, {total['throughput_rps']} req/s, p50 {total['p50_ms']} ms, "
+        f"p95 {total['p95_ms']} ms, p99 {total['p99_ms']} ms, errors {total['error_rate']:.2%}")
+    text = json.dumps(report, indent=2)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+        log(f"✅ Report written to {args.out}")
+    else:
+        print(text)
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            problems = compare(json.load(f), report, args.tolerance)
+        for line in problems:
+            log(f"⚠️ Regression {line}")
+        if problems:
+            return 1
+        log("✅ No regressions")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
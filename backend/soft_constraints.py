@@ -0,0 +1,210 @@
+# backend/soft_constraints.py
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+# Solver objective coefficients are weight * SCALE, rounded (CP-SAT needs integers)
+SCALE = 10
+
+
+# ------------------- Model view -------------------
+
+class Placement:
+    """
+    What a constraint sees of the time-placement model: x[(i, day, start)]
+    booleans, the subjects, the day grid, and per (owner, day, period) the
+    x vars covering that period (cover["teacher"], cover["batch"]).
+    """
+
+    def __init__(self, model, x, subjects, grid, cover):
+        self.model = model
+        self.x = x
+        self.subjects = subjects
+        self.grid = grid   # week.Grid
+        self.n_days = grid.n_days
+        self.n_periods = grid.n_periods
+        self.cover = cover
+        self.last_period = grid.last_period   # per day
+
+
+# ------------------- Constraints -------------------
+
+class SoftConstraint:
+    """
+    One soft goal. terms() adds it to the placement model as (var, units, max
+    value) objective terms; count() counts the same units in a finished
+    timetable (a scoring.Rows), so solver objective and scorer agree.
+    """
+
+    name = ""
+    description = ""
+    defaults: Dict[str, Any] = {}
+    replaces: Optional[str] = None   # built-in scoring metric counting the same thing, left out of the score while on
+
+    def params(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        unknown = set(params) - set(self.defaults)
+        if unknown:
+            raise ValueError(f"Unknown parameter(s) {sorted(unknown)} for soft constraint '{self.name}'")
+        return {**self.defaults, **params}
+
+    def terms(self, m: Placement, params: Dict[str, Any]) -> List[Tuple[Any, int, int]]:
+        raise NotImplementedError
+
+    def count(self, rows, params: Dict[str, Any]) -> int:
+        raise NotImplementedError
+
+
+class AvoidLastSlot(SoftConstraint):
+    name = "avoid_last_slot"
+    description = "Class-periods in the last teaching period of the day"
+    replaces = "last_period"
+
+    def terms(self, m, params):
+        # Straight on the x vars: no auxiliary variables at all
+        return [(var, 1, 1) for (i, d, p), var in m.x.items()
+                if p <= m.last_period[d] < p + m.subjects[i]["duration"]]
+
+    def count(self, rows, params):
+        return int((rows.period == rows.ctx.last_period[rows.day]).sum())
+
+
+class SpreadDays(SoftConstraint):
+    name = "spread_days"
+    description = "Extra classes of a subject on a day that already has one"
+    replaces = "subject_repeats"
+
+    def terms(self, m, params):
+        starts: Dict[Tuple[int, int], list] = {}
+        for (i, d, p), var in m.x.items():
+            if m.subjects[i]["count"] > 1:
+                starts.setdefault((i, d), []).append(var)
+        terms = []
+        for (i, d), vars_ in starts.items():
+            if len(vars_) < 2:
+                continue
+            ub = min(len(vars_), m.subjects[i]["count"]) - 1
+            extra = m.model.NewIntVar(0, ub, f"spread_{i}_{d}")
+            m.model.Add(extra >= sum(vars_) - 1)
+            terms.append((extra, 1, ub))
+        return terms
+
+    def count(self, rows, params):
+        return rows.repeats()
+
+
+class MaxConsecutive(SoftConstraint):
+    name = "max_consecutive"
+    description = "Class-periods beyond `max` in a row for one batch (or teacher)"
+    defaults = {"max": 2, "owner": "batch"}
+
+    def params(self, params):
+        params = super().params(params)
+        if params["owner"] not in ("batch", "teacher"):
+            raise ValueError("max_consecutive: owner must be 'batch' or 'teacher'")
+        if int(params["max"]) < 1:
+            raise ValueError("max_consecutive: max must be at least 1")
+        return {"max": int(params["max"]), "owner": params["owner"]}
+
+    def terms(self, m, params):
+        # One boolean per window of max+1 periods that could be full: it is
+        # forced to 1 exactly when the whole window is taught. A run of L
+        # periods fills L - max windows, the same count count() reports.
+        k = params["max"]
+        cover = m.cover[params["owner"]]
+        owners = {key[0] for key in cover if key[0] is not None}
+        terms = []
+        for owner in owners:
+            for d in range(m.n_days):
+                for start in range(1, m.n_periods - k + 1):
+                    window = [cover.get((owner, d, q)) for q in range(start, start + k + 1)]
+                    if not all(window):
+                        continue  # a period nobody can teach (lunch, availability) breaks the run
+                    full = m.model.NewBoolVar(f"run_{owner}_{d}_{start}")
+                    m.model.Add(sum(v for vars_ in window for v in vars_) - k <= full)
+                    terms.append((full, 1, 1))
+        return terms
+
+    def count(self, rows, params):
+        k = params["max"]
+        busy = (rows.occupied(params["owner"]).reshape(-1, rows.P) > 0).astype(np.int64)
+        if busy.shape[1] < k + 1:
+            return 0
+        runs = np.cumsum(np.pad(busy, ((0, 0), (1, 0))), axis=1)
+        window = runs[:, k + 1:] - runs[:, :-(k + 1)]
+        return int((window == k + 1).sum())
+
+
+class PreferredPeriods(SoftConstraint):
+    name = "preferred_periods"
+    description = "Class-periods outside a teacher's preferred periods"
+    defaults = {"periods": [], "teachers": {}}
+
+    def params(self, params):
+        params = super().params(params)
+        return {"periods": sorted({int(q) for q in params["periods"] or ()}),
+                "teachers": {str(t): sorted({int(q) for q in qs}) for t, qs in (params["teachers"] or {}).items()}}
+
+    @staticmethod
+    def _preferred(params, teacher) -> Optional[set]:
+        periods = params["teachers"].get(teacher, params["periods"])
+        return set(periods) if periods else None
+
+    def terms(self, m, params):
+        terms = []
+        for (i, d, p), var in m.x.items():
+            s = m.subjects[i]
+            preferred = self._preferred(params, s["teacher"])
+            if preferred is None:
+                continue
+            outside = sum(1 for q in range(p, p + s["duration"]) if q not in preferred)
+            if outside:
+                terms.append((var, outside, 1))
+        return terms
+
+    def count(self, rows, params):
+        teachers = rows.tt.tables["teacher"]
+        mask = np.zeros((len(teachers), rows.P), dtype=bool)   # True = outside the preference
+        for t, code in enumerate(teachers):
+            preferred = self._preferred(params, code)
+            if preferred is not None:
+                mask[t] = [q not in preferred for q in range(rows.P)]
+        return int(mask[rows.code["teacher"], rows.period].sum())
+
+
+CONSTRAINTS: Dict[str, SoftConstraint] = {
+    c.name: c for c in (AvoidLastSlot(), SpreadDays(), MaxConsecutive(), PreferredPeriods())
+}
+
+
+# ------------------- Helpers -------------------
+
+def resolve(*specs) -> List[Dict[str, Any]]:
+    """
+    Validated {"name", "weight", "params"} list from one or more specs
+    (config first, then request); a later spec overrides the same name and
+    weight 0 switches a constraint off. Raises ValueError for bad input.
+    """
+    merged: Dict[str, Dict[str, Any]] = {}
+    for spec in specs:
+        for item in spec or ():
+            name = item.get("name")
+            if name not in CONSTRAINTS:
+                raise ValueError(f"Unknown soft constraint '{name}' (known: {', '.join(CONSTRAINTS)})")
+            weight = float(item.get("weight", 1.0))
+            if weight < 0:
+                raise ValueError(f"Soft constraint '{name}' needs a weight >= 0")
+            merged[name] = {"name": name, "weight": weight,
+                            "params": CONSTRAINTS[name].params(dict(item.get("params") or {}))}
+    return [c for c in merged.values() if c["weight"] > 0]
+
+
+def objective(soft: List[Dict[str, Any]], m: Placement):
+    """(vars, coefficients, upper bound of the weighted sum) for `soft` on a placement model."""
+    variables, coefficients, bound = [], [], 0
+    for c in soft or ():
+        coef = max(1, round(c["weight"] * SCALE))
+        for var, units, ub in CONSTRAINTS[c["name"]].terms(m, c["params"]):
+            variables.append(var)
+            coefficients.append(coef * units)
+            bound += coef * units * ub
+    return variables, coefficients, bound
@@ -1,15 +1,931 @@
 # backend/solver.py
-from typing import Dict, Any, List
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Callable, Dict, Any, List, Optional, Tuple
 
-def make_timetable(solver_state: Dict[str, Any]) -> List[Dict[str, Any]]:
+from ortools.sat.python import cp_model
+
+from . import metrics, soft_constraints, week
+
+DEFAULT_TIME_LIMIT = 20.0  # seconds for the whole make_timetable call
+
+
+MAX_WORKERS = 8   # more CP-SAT workers than this rarely pay off for one timetable
+
+
+def default_workers(parallel_runs: int = 1) -> int:
     """
-    OR-Tools solver logic goes here.
-    Input: solver_state (dict with config, rooms, teachers, subjects, batches)
-    Output: timetable list of dicts
+    CP-SAT workers per solve when `parallel_runs` solves share the machine:
+    together they use the cores and no more, down to one worker each.
+    """
+    return max(1, min(MAX_WORKERS, (os.cpu_count() or 1) // max(1, parallel_runs)))
+
+
+DEFAULT_WORKERS = default_workers()
+ROOM_PHASE_SHARE = 0.1     # part of the budget kept back for room assignment
+MIN_ROOM_PHASE = 1.0       # seconds for an exact room fallback
+STOP_POLL_SECONDS = 0.2    # how often a running solve checks `should_stop`
+DEFAULT_GAP_LIMIT = 0.05   # stop optimising soft constraints within 5% of the best bound
+SHARE_PHASE = 0.6          # with soft constraints: part of the placement budget for the per-group solves
+
+
+class SolveCancelled(RuntimeError):
+    """Raised when `should_stop` asked a running solve to give up."""
+
+
+class InfeasibleInput(ValueError):
+    """The input provably can't be scheduled; `issues` lists why (see analyze())."""
+
+    def __init__(self, issues: List[Dict[str, Any]]):
+        super().__init__(issues)
+        self.issues = issues
+
+    def __str__(self):
+        more = f" (+{len(self.issues) - 3} more)" if len(self.issues) > 3 else ""
+        return "; ".join(i["message"] for i in self.issues[:3]) + more
+
+
+# ------------------- Input helpers -------------------
+
+def _parse_fixed_slot(slot: str, days: List[str], code: str) -> Tuple[int, int]:
+    try:
+        day, period = slot.split("-")
+        return days.index(day), int(period)
+    except ValueError:
+        raise ValueError(f"Invalid fixed slot '{slot}' for subject {code}")
+
+
+def _subject_rows(solver_state: Dict[str, Any], grid: week.Grid) -> List[Dict[str, Any]]:
+    """A lab without its own duration spans the config's lab_length_minutes (grid.class_periods)."""
+    rows = []
+    for s in solver_state.get("subjects", []) or []:
+        code = s.get("code") or s.get("name")
+        rows.append({
+            "name": s.get("name") or code,
+            "code": code,
+            "batch": s.get("batch"),
+            "teacher": s.get("teacher_code"),
+            "count": int(s.get("classes_per_week", 1)),
+            "duration": grid.class_periods(s),
+            "fixed": list(s.get("fixed_slots") or []),
+        })
+    return rows
+
+
+def _status_error(status: int, what: str) -> RuntimeError:
+    if status == cp_model.INFEASIBLE:
+        return RuntimeError(f"No feasible {what} satisfies the constraints")
+    if status == cp_model.MODEL_INVALID:
+        return RuntimeError(f"Invalid {what} model")
+    return RuntimeError(f"Solver hit the time limit before finding a {what}")
+
+
+def _solver(time_limit: float, workers: int, seed: Optional[int]) -> cp_model.CpSolver:
+    solver = cp_model.CpSolver()
+    solver.parameters.max_time_in_seconds = max(0.1, time_limit)
+    solver.parameters.num_workers = max(1, workers)
+    if seed is not None:
+        solver.parameters.random_seed = int(seed)
+        solver.parameters.randomize_search = True
+    return solver
+
+
+# Set by search_logs(); while set, every solve in this process keeps its CP-SAT log
+_search_logs: Optional[List[Dict[str, Any]]] = None
+
+
+@contextmanager
+def search_logs():
+    """
+    Collect the CP-SAT search log and response stats of every solve in the
+    block, including the per-group solves running on other threads.
+    Meant for a worker process running one solve at a time (profiling).
+    """
+    global _search_logs
+    previous, _search_logs = _search_logs, []
+    try:
+        yield _search_logs
+    finally:
+        _search_logs = previous
+
+
+class _ProgressCallback(cp_model.CpSolverSolutionCallback):
+    def __init__(self, phase: str, on_progress: Callable[[Dict[str, Any]], None], has_objective: bool):
+        super().__init__()
+        self.phase = phase
+        self.on_progress = on_progress
+        self.has_objective = has_objective
+        self.solutions = 0
+
+    def on_solution_callback(self):
+        self.solutions += 1
+        self.on_progress({
+            "phase": self.phase,
+            "solutions": self.solutions,
+            "objective": self.ObjectiveValue() if self.has_objective else None,
+            "wall_time": self.WallTime(),
+        })
+
+
+def _solve(solver: cp_model.CpSolver, model: cp_model.CpModel, phase: str,
+           should_stop: Optional[Callable[[], bool]], on_progress: Optional[Callable[[Dict[str, Any]], None]],
+           build_started: Optional[float] = None) -> int:
+    """
+    Run one CP-SAT solve, reporting solutions and stopping early when asked to.
+    `build_started` (a perf_counter reading) times the model build as its own span.
+    """
+    size = {}
+    if metrics.ENABLED:
+        proto = model.Proto()
+        size = {"variables": len(proto.variables), "constraints": len(proto.constraints)}
+        if build_started is not None:
+            metrics.record("solver.build", time.perf_counter() - build_started, phase=phase)
+    callback = _ProgressCallback(phase, on_progress, model.HasObjective()) if on_progress else None
+    finished = threading.Event()
+    sink, log = _search_logs, []
+    if sink is not None:
+        solver.parameters.log_search_progress = True
+        solver.parameters.log_to_stdout = False
+        solver.log_callback = log.append
+
+    def watch():
+        while not finished.wait(STOP_POLL_SECONDS):
+            if should_stop():
+                solver.StopSearch()
+                return
+
+    if should_stop:
+        threading.Thread(target=watch, daemon=True).start()
+    with metrics.span("solver.solve", phase=phase) as span:
+        try:
+            status = solver.Solve(model, callback)
+        finally:
+            finished.set()
+        span.set(status=solver.StatusName(status), **size)
+    if sink is not None:
+        sink.append({"phase": phase, "status": solver.StatusName(status),
+                     "log": "\n".join(log), "response_stats": solver.ResponseStats()})
+    if should_stop and should_stop():
+        raise SolveCancelled("Solve cancelled")
+    return status
+
+
+def _diversify(model: cp_model.CpModel, literals: list, seed: Optional[int]):
+    """
+    Give each seed its own branching order so candidates differ in structure,
+    not just in which equivalent solution CP-SAT happens to report first.
+    """
+    if seed is None:
+        return
+    order = list(literals)
+    random.Random(seed).shuffle(order)
+    value = cp_model.SELECT_MAX_VALUE if seed % 2 == 0 else cp_model.SELECT_MIN_VALUE
+    model.AddDecisionStrategy(order, cp_model.CHOOSE_FIRST, value)
+
+
+# ------------------- Feasibility -------------------
+
+def _issue(code: str, kind: str, name, message: str, demand=None, supply=None) -> Dict[str, Any]:
+    return {"code": code, "kind": kind, "name": name, "message": message, "demand": demand, "supply": supply}
+
+
+def _analyze(p) -> Tuple[Dict[str, Any], Dict[int, set]]:
+    """
+    Counting checks that prove a timetable can't exist, in one pass over the
+    subjects. Returns (report, domains) where domains[i] is the set of
+    (day, start) subject i may still use: lunch, teacher availability and
+    other subjects' fixed slots are already taken out.
+    """
+    days, grid = p["days"], p["grid"]
+    subjects, teachers, batches, rooms = p["subjects"], p["teachers"], p["batches"], p["rooms"]
+    n_days = len(days)
+    week_slots = grid.open_count()
+    caps = sorted({int(r.get("capacity", 0)) for r in rooms})
+    supply = {c: sum(1 for r in rooms if int(r.get("capacity", 0)) >= c) for c in caps}
+
+    issues: List[Dict[str, Any]] = []
+    warnings: List[Dict[str, Any]] = []
+    teacher_demand: Dict[Any, int] = {}
+    batch_demand: Dict[Any, int] = {}
+    level_demand: Dict[int, int] = {}
+    too_big = set()
+    domains: Dict[int, set] = {}
+    fixed_starts: Dict[int, set] = {}
+    fixed_owner: Dict[Tuple[Any, int, int], int] = {}   # ((teacher|batch, name), day, period) -> subject
+    clashes = set()
+    start_cache: Dict[Tuple[int, frozenset], frozenset] = {}   # most subjects share a duration and availability
+
+    for i, s in enumerate(subjects):
+        dur, load = s["duration"], s["count"] * s["duration"]
+        teacher = teachers.get(s["teacher"])
+        if s["teacher"] is not None and teacher is None:
+            warnings.append(_issue("unknown_teacher", "subject", s["code"],
+                                   f"Subject {s['code']} uses unknown teacher {s['teacher']}"))
+        if s["batch"] not in batches:
+            warnings.append(_issue("unknown_batch", "subject", s["code"],
+                                   f"Subject {s['code']} is for unknown batch {s['batch']}"))
+        teacher_demand[s["teacher"]] = teacher_demand.get(s["teacher"], 0) + load
+        batch_demand[s["batch"]] = batch_demand.get(s["batch"], 0) + load
+
+        need = int(batches.get(s["batch"], {}).get("size", 0))
+        if need > caps[-1]:
+            if s["batch"] not in too_big:
+                too_big.add(s["batch"])
+                issues.append(_issue("room_capacity", "batch", s["batch"],
+                                     f"No room can seat batch {s['batch']} ({need} students)", need, caps[-1]))
+        else:
+            level = min(c for c in caps if c >= need)
+            level_demand[level] = level_demand.get(level, 0) + load
+
+        avail = frozenset((teacher or {}).get("avail_periods") or [])
+        starts = start_cache.get((dur, avail))
+        if starts is None:
+            starts = grid.starts(dur)
+            if avail:
+                starts = frozenset((d, start) for d, start in starts
+                                   if all(q in avail for q in range(start, start + dur)))
+            start_cache[dur, avail] = starts
+        fixed = set()
+        for slot in s["fixed"]:
+            d, start = _parse_fixed_slot(slot, days, s["code"])
+            if (d, start) not in starts:
+                issues.append(_issue("fixed_unusable", "subject", s["code"],
+                                     f"Fixed slot {slot} is not usable for subject {s['code']}"))
+                continue
+            fixed.add((d, start))
+            for q in range(start, start + dur):
+                for key in (("teacher", s["teacher"]), ("batch", s["batch"])):
+                    if key[1] is None:
+                        continue
+                    j = fixed_owner.setdefault((key, d, q), i)
+                    if j != i and (j, i, key) not in clashes:
+                        clashes.add((j, i, key))
+                        issues.append(_issue("fixed_clash", key[0], key[1],
+                                             f"Fixed slots of {subjects[j]['code']} and {s['code']} overlap "
+                                             f"for {key[0]} {key[1]} on {days[d]} period {q}"))
+        if len(s["fixed"]) > s["count"]:
+            issues.append(_issue("fixed_count", "subject", s["code"],
+                                 f"Subject {s['code']} has more fixed slots than classes_per_week",
+                                 len(s["fixed"]), s["count"]))
+        domains[i] = starts
+        fixed_starts[i] = fixed
+
+    # Tighten: fully fixed subjects keep only their slots; others lose slots
+    # their teacher or batch is already pinned to by another subject.
+    size_before = sum(len(d) for d in domains.values())
+    pinned = {key for key, _, _ in fixed_owner}
+    for i, s in enumerate(subjects):
+        if len(fixed_starts[i]) >= s["count"]:
+            domains[i] = set(fixed_starts[i])
+            continue
+        keys = [k for k in (("teacher", s["teacher"]), ("batch", s["batch"])) if k[1] is not None]
+        if pinned.intersection(keys):
+            domains[i] = {
+                (d, start) for d, start in domains[i]
+                if (d, start) in fixed_starts[i] or not any(
+                    fixed_owner.get((k, d, q), i) != i for k in keys for q in range(start, start + s["duration"]))
+            }
+        if len(domains[i]) < s["count"]:
+            issues.append(_issue("subject_slots", "subject", s["code"],
+                                 f"Subject {s['code']} has fewer usable slots than classes_per_week",
+                                 s["count"], len(domains[i])))
+
+    for code, demand in teacher_demand.items():
+        t = teachers.get(code) or {}
+        if t.get("max_load") is not None and demand > int(t["max_load"]):
+            issues.append(_issue("teacher_load", "teacher", code,
+                                 f"Teacher {code} needs {demand} periods but max_load is {t['max_load']}",
+                                 demand, int(t["max_load"])))
+        avail = set(t.get("avail_periods") or [])
+        usable = grid.open_count(avail)
+        if code is not None and demand > usable:
+            issues.append(_issue("teacher_time", "teacher", code,
+                                 f"Teacher {code} needs {demand} periods but is available for {usable}",
+                                 demand, usable))
+
+    for name, demand in batch_demand.items():
+        cap = batches.get(name, {}).get("max_per_day")
+        if cap is not None and demand > int(cap) * n_days:
+            issues.append(_issue("batch_load", "batch", name,
+                                 f"Batch {name} needs {demand} periods but max_per_day allows {int(cap) * n_days}",
+                                 demand, int(cap) * n_days))
+        if demand > week_slots:
+            issues.append(_issue("batch_time", "batch", name,
+                                 f"Batch {name} needs {demand} periods but the week has {week_slots}",
+                                 demand, week_slots))
+
+    for c in caps:
+        demand = sum(load for level, load in level_demand.items() if level >= c)
+        available = supply[c] * week_slots
+        if demand > available:
+            issues.append(_issue("room_time", "rooms", c,
+                                 f"Classes need {demand} room-periods with {c}+ seats but only {available} exist",
+                                 demand, available))
+
+    report = {
+        "feasible": not issues,
+        "issues": issues,
+        "warnings": warnings,
+        "stats": {
+            "subjects": len(subjects),
+            "class_periods": sum(s["count"] * s["duration"] for s in subjects),
+            "slots_before": size_before,
+            "slots_after": sum(len(d) for d in domains.values()),
+        },
+    }
+    return report, domains
+
+
+def analyze(solver_state: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Pre-solve report: {"feasible", "issues", "warnings", "stats"}. An issue
+    means no timetable exists (teacher over max_load, batch over its weekly
+    cap, no room big enough, clashing fixed slots, ...); it doesn't prove the
+    opposite. Raises ValueError for malformed input.
+    """
+    return _analyze(_prepare(solver_state))[0]
+
+
+# ------------------- Phase 1: time placement -------------------
+
+def _place_in_time(subjects, teachers, batches, rooms, grid,
+                   time_limit, workers, seed, should_stop=None, on_progress=None,
+                   allowed=None, hint=None, teacher_blocked=None, occupied=None, soft=None, gap_limit=None):
+    """
+    Choose (day, start period) for every class of every subject.
+
+    Rooms are only modelled through capacity thresholds here: at every slot,
+    the classes needing at least `c` seats never outnumber the rooms with at
+    least `c` seats. That is exactly the condition for a room matching to exist
+    per slot, and it keeps the model free of a room dimension.
+
+    For repairs, `allowed` limits subject i to the (day, start) pairs in
+    allowed[i], `teacher_blocked` holds (teacher, day, period) that are off
+    limits, and `hint` is the previous set of (i, day, start): the solver
+    starts from it and keeps as much of it as it can.
+
+    `occupied` maps (day, period) to the room levels already taken there by
+    classes solved separately, which shrinks the room supply accordingly.
+
+    `soft` (see soft_constraints.resolve) is minimised, stopping within
+    `gap_limit` of the best bound; with a `hint`, kept classes come first and
+    soft penalties only break ties.
+    """
+    build_started = time.perf_counter()
+    model = cp_model.CpModel()
+    x: Dict[Tuple[int, int, int], cp_model.IntVar] = {}
+    teacher_cover: Dict[Tuple[str, int, int], list] = {}
+    batch_cover: Dict[Tuple[str, int, int], list] = {}
+    need_cover: Dict[Tuple[int, int], list] = {}
+    teacher_load: Dict[str, list] = {}
+    batch_day_load: Dict[Tuple[str, int], list] = {}
+    caps = sorted({int(r.get("capacity", 0)) for r in rooms})
+    levels = _room_levels(subjects, batches, caps)
+
+    for i, s in enumerate(subjects):
+        teacher = teachers.get(s["teacher"], {})
+        avail = set(teacher.get("avail_periods") or [])
+        level = levels[i]
+        dur = s["duration"]
+        only = allowed.get(i) if allowed else None
+        starts = []
+
+        for d, p in sorted(grid.starts(dur) if only is None else grid.starts(dur) & only):
+            covered = range(p, p + dur)
+            if avail and any(q not in avail for q in covered):
+                continue
+            if teacher_blocked and any((s["teacher"], d, q) in teacher_blocked for q in covered):
+                continue
+            var = model.NewBoolVar(f"x_{i}_{d}_{p}")
+            x[i, d, p] = var
+            starts.append(var)
+            teacher_load.setdefault(s["teacher"], []).append(var * dur)
+            batch_day_load.setdefault((s["batch"], d), []).append(var * dur)
+            for q in covered:
+                teacher_cover.setdefault((s["teacher"], d, q), []).append(var)
+                batch_cover.setdefault((s["batch"], d, q), []).append(var)
+                need_cover.setdefault((d, q), []).append((level, var))
+
+        if len(starts) < s["count"]:
+            raise RuntimeError(f"Subject {s['code']} has fewer usable slots than classes_per_week")
+        model.Add(sum(starts) == s["count"])
+
+        for slot in s["fixed"]:
+            d, p = _parse_fixed_slot(slot, grid.days, s["code"])
+            if (i, d, p) not in x:
+                raise RuntimeError(f"Fixed slot {slot} is not usable for subject {s['code']}")
+            model.Add(x[i, d, p] == 1)
+
+    for cover in (teacher_cover, batch_cover):
+        for key, vars_ in cover.items():
+            if key[0] is not None and len(vars_) > 1:
+                model.AddAtMostOne(vars_)
+
+    supply = {c: sum(1 for r in rooms if int(r.get("capacity", 0)) >= c) for c in caps}
+    for (d, q), entries in need_cover.items():
+        taken = (occupied or {}).get((d, q), ())
+        for c in caps:
+            free = max(0, supply[c] - sum(1 for level in taken if level >= c))
+            demand = [v for level, v in entries if level >= c]
+            if len(demand) > free:
+                model.Add(sum(demand) <= free)
+
+    for code, load in teacher_load.items():
+        max_load = teachers.get(code, {}).get("max_load")
+        if max_load is not None:
+            model.Add(sum(load) <= int(max_load))
+
+    for (name, _), load in batch_day_load.items():
+        cap = batches.get(name, {}).get("max_per_day")
+        if cap is not None:
+            model.Add(sum(load) <= int(cap))
+
+    placement = soft_constraints.Placement(model, x, subjects, grid, {"teacher": teacher_cover, "batch": batch_cover})
+    variables, coefficients, bound = soft_constraints.objective(soft, placement)
+    penalty = cp_model.LinearExpr.WeightedSum(variables, coefficients) if variables else 0
+    if hint:
+        for key, var in x.items():
+            model.AddHint(var, key in hint)
+        # Lexicographic: one more kept class always outweighs every soft penalty
+        model.Maximize(sum(x[key] for key in hint if key in x) * (bound + 1) - penalty)
+    else:
+        if variables:
+            model.Minimize(penalty)
+        _diversify(model, list(x.values()), seed)
+    solver = _solver(time_limit, workers, seed)
+    if variables and not hint:
+        # Repairs keep searching for the smallest change; only soft goals stop early
+        solver.parameters.relative_gap_limit = DEFAULT_GAP_LIMIT if gap_limit is None else float(gap_limit)
+    status = _solve(solver, model, "time", should_stop, on_progress, build_started)
+    if status not in (cp_model.OPTIMAL, cp_model.FEASIBLE):
+        raise _status_error(status, "timetable")
+
+    return [(i, d, p) for (i, d, p), v in x.items() if solver.BooleanValue(v)]
+
+
+def _room_levels(subjects, batches, caps) -> List[int]:
+    """Smallest room capacity each subject's batch fits in."""
+    levels = []
+    for s in subjects:
+        need = int(batches.get(s["batch"], {}).get("size", 0))
+        if need > caps[-1]:
+            raise RuntimeError(f"No room can seat batch {s['batch']} ({need} students)")
+        levels.append(min(c for c in caps if c >= need))
+    return levels
+
+
+# ------------------- Decomposition -------------------
+
+def _components(subjects) -> List[List[int]]:
+    """
+    Split subjects into groups that share no batch and no teacher; such groups
+    only interact through rooms. Largest group first.
+    """
+    parent = list(range(len(subjects)))
+
+    def root(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    first: Dict[Tuple[str, Any], int] = {}
+    for i, s in enumerate(subjects):
+        for key in (("batch", s["batch"]), ("teacher", s["teacher"])):
+            if key[1] is None:
+                continue
+            j = first.setdefault(key, i)
+            parent[root(i)] = root(j)
+
+    groups: Dict[int, List[int]] = {}
+    for i in range(len(subjects)):
+        groups.setdefault(root(i), []).append(i)
+    return sorted(groups.values(), key=len, reverse=True)
+
+
+def _occupancy(sessions, subjects, levels, skip=()) -> Dict[Tuple[int, int], List[int]]:
+    """(day, period) -> room levels used by `sessions`, leaving out subjects in `skip`."""
+    used: Dict[Tuple[int, int], List[int]] = {}
+    for i, d, p in sessions:
+        if i in skip:
+            continue
+        for q in range(p, p + subjects[i]["duration"]):
+            used.setdefault((d, q), []).append(levels[i])
+    return used
+
+
+def _room_shares(groups, subjects, rooms, grid) -> List[Dict[Tuple[int, int], List[int]]]:
+    """
+    Deal the rooms of every slot out to the groups, in proportion to how many
+    class-periods each group needs, biggest rooms first so every group gets its
+    share of each size. Ties rotate with the slot, so no group is always last.
+    Returns, per group, the capacities of the rooms it does NOT get at each
+    slot, in the shape _place_in_time takes as `occupied`.
     """
-    # 🚀 Dummy timetable for testing
-    timetable = [
-        {"day": "Mon", "period": 1, "room": "Room-101", "teacher": "T1", "subject": "Math", "batch": "Batch-A"},
-        {"day": "Mon", "period": 2, "room": "Room-102", "teacher": "T2", "subject": "Physics", "batch": "Batch-B"},
-    ]
+    demand = [sum(subjects[i]["count"] * subjects[i]["duration"] for i in g) for g in groups]
+    total = sum(demand) or 1
+    caps = sorted((int(r.get("capacity", 0)) for r in rooms), reverse=True)
+    n = len(groups)
+    shares: List[Dict[Tuple[int, int], List[int]]] = [{} for _ in groups]
+    for slot in sorted(grid.open):   # nothing is taught in the other cells
+        t = grid.slot(*slot)
+        got = [0] * n
+        owner = []
+        for dealt, _ in enumerate(caps, start=1):
+            g = max(range(n), key=lambda g: (demand[g] * dealt / total - got[g], -((g - t) % n)))
+            got[g] += 1
+            owner.append(g)
+        for g in range(n):
+            shares[g][slot] = [cap for cap, o in zip(caps, owner) if o != g]
+    return shares
+
+
+def _place_decomposed(subjects, teachers, batches, rooms, grid,
+                      time_limit, workers, seed, should_stop=None, on_progress=None, allowed=None,
+                      soft=None, gap_limit=None):
+    """
+    _place_in_time per independent group, in parallel, then merged.
+
+    Each group is solved against its own share of the rooms at every slot
+    (see _room_shares), so the merged week never books more rooms than exist.
+    A group that doesn't fit its share is re-solved around everyone else's
+    actual classes; if even that fails, one solve over everything decides.
+    """
+    groups = _components(subjects)
+    if len(groups) == 1:
+        return _place_in_time(subjects, teachers, batches, rooms, grid,
+                              time_limit, workers, seed, should_stop, on_progress, allowed=allowed,
+                              soft=soft, gap_limit=gap_limit)
+
+    deadline = time.monotonic() + time_limit
+    levels = _room_levels(subjects, batches, sorted({int(r.get("capacity", 0)) for r in rooms}))
+    shares = _room_shares(groups, subjects, rooms, grid)
+
+    # Each group already runs `workers` CP-SAT threads
+    threads = max(1, min(len(groups), (os.cpu_count() or 1) // max(1, workers)))
+    # Soft objectives would let the first groups optimise away everyone's time:
+    # each round of parallel group solves gets an equal slice of SHARE_PHASE
+    rounds = -(-len(groups) // threads)
+    share_limit = time_limit * SHARE_PHASE / rounds if soft else time_limit
+
+    def solve(group, occupied, hint=None, limit=None):
+        local = [subjects[i] for i in group]
+        position = {i: k for k, i in enumerate(group)}
+        local_hint = {(position[i], d, p) for i, d, p in hint} if hint else None
+        local_allowed = {position[i]: allowed[i] for i in group} if allowed else None
+        budget = max(0.1, min(limit or time_limit, deadline - time.monotonic()))
+        placed = _place_in_time(local, teachers, batches, rooms, grid,
+                                budget, workers, seed, should_stop, on_progress, allowed=local_allowed,
+                                hint=local_hint, occupied=occupied, soft=soft, gap_limit=gap_limit)
+        return [(group[i], d, p) for i, d, p in placed]
+
+    def solve_share(g):
+        try:
+            return solve(groups[g], shares[g], limit=share_limit)
+        except SolveCancelled:
+            raise
+        except RuntimeError:
+            return None  # didn't fit its share; coordinated below
+
+    with ThreadPoolExecutor(max_workers=threads, thread_name_prefix="cp-group") as pool:
+        results = list(pool.map(solve_share, range(len(groups))))
+    sessions = [session for placed in results if placed for session in placed]
+
+    try:
+        for group, placed in zip(groups, results):
+            if placed is None:
+                sessions += solve(group, _occupancy(sessions, subjects, levels))
+        return sessions
+    except SolveCancelled:
+        raise
+    except RuntimeError:
+        remaining = max(0.1, deadline - time.monotonic())
+        return _place_in_time(subjects, teachers, batches, rooms, grid, remaining,
+                              workers, seed, should_stop, on_progress, allowed=allowed, hint=set(sessions),
+                              soft=soft, gap_limit=gap_limit)
+
+
+# ------------------- Phase 2: room assignment -------------------
+
+def _greedy_rooms(day_sessions, subjects, needs, rooms, preferred=None):
+    """
+    Best-fit greedy for one day: longest classes first, then largest batches,
+    each taking the smallest free room that seats it. For single-period
+    classes this is exact; returns None if some class could not be placed.
+    Sessions in `preferred` (session -> room) keep that room when it is free.
+    """
+    by_cap = sorted(range(len(rooms)), key=lambda r: int(rooms[r].get("capacity", 0)))
+    busy = set()
+    room_of = {}
+    order = sorted(day_sessions, key=lambda k: (-subjects[k[1][0]]["duration"], -needs[k[1][0]], k[1][2]))
+    for k, (i, d, p) in order if preferred else ():
+        r = preferred.get(k)
+        covered = range(p, p + subjects[i]["duration"])
+        if r is None or int(rooms[r].get("capacity", 0)) < needs[i] or any((r, q) in busy for q in covered):
+            continue
+        busy.update((r, q) for q in covered)
+        room_of[k] = r
+    for k, (i, d, p) in order:
+        if k in room_of:
+            continue
+        covered = range(p, p + subjects[i]["duration"])
+        for r in by_cap:
+            if int(rooms[r].get("capacity", 0)) < needs[i]:
+                continue
+            if any((r, q) in busy for q in covered):
+                continue
+            busy.update((r, q) for q in covered)
+            room_of[k] = r
+            break
+        else:
+            return None
+    return room_of
+
+
+def _cp_rooms(day_sessions, subjects, needs, rooms, time_limit, workers, seed, should_stop=None, preferred=None):
+    """Exact room assignment for one day, used when the greedy pass gets stuck."""
+    build_started = time.perf_counter()
+    model = cp_model.CpModel()
+    y: Dict[Tuple[int, int], cp_model.IntVar] = {}
+    room_cover: Dict[Tuple[int, int], list] = {}
+
+    for k, (i, d, p) in day_sessions:
+        options = []
+        for r, room in enumerate(rooms):
+            if int(room.get("capacity", 0)) < needs[i]:
+                continue
+            var = model.NewBoolVar(f"y_{k}_{r}")
+            y[k, r] = var
+            options.append(var)
+            for q in range(p, p + subjects[i]["duration"]):
+                room_cover.setdefault((r, q), []).append(var)
+        model.AddExactlyOne(options)
+
+    for vars_ in room_cover.values():
+        if len(vars_) > 1:
+            model.AddAtMostOne(vars_)
+
+    if preferred:
+        kept = [var for (k, r), var in y.items() if preferred.get(k) == r]
+        for (k, r), var in y.items():
+            model.AddHint(var, preferred.get(k) == r)
+        model.Maximize(sum(kept))
+
+    solver = _solver(time_limit, workers, seed)
+    status = _solve(solver, model, "rooms", should_stop, None, build_started)
+    if status not in (cp_model.OPTIMAL, cp_model.FEASIBLE):
+        raise _status_error(status, "room assignment")
+    return {k: r for (k, r), v in y.items() if solver.BooleanValue(v)}
+
+
+def _assign_rooms(sessions, subjects, batches, rooms, deadline, workers, seed, should_stop=None, preferred=None):
+    """Give every placed class a room, day by day, preferring the tightest fit (or `preferred[k]`)."""
+    needs = [int(batches.get(s["batch"], {}).get("size", 0)) for s in subjects]
+    by_day: Dict[int, list] = {}
+    for k, session in enumerate(sessions):
+        by_day.setdefault(session[1], []).append((k, session))
+
+    room_of = {}
+    for day_sessions in by_day.values():
+        placed = _greedy_rooms(day_sessions, subjects, needs, rooms, preferred)
+        if placed is None:
+            remaining = max(MIN_ROOM_PHASE, deadline - time.monotonic())
+            placed = _cp_rooms(day_sessions, subjects, needs, rooms, remaining, workers, seed, should_stop, preferred)
+        room_of.update(placed)
+    return room_of
+
+
+# ------------------- Entry point -------------------
+
+def _prepare(solver_state: Dict[str, Any]) -> Dict[str, Any]:
+    """Normalise solver_state into the pieces both phases work on."""
+    grid = week.compile(solver_state.get("config", {}) or {})
+    rooms = list(solver_state.get("rooms", []) or [])
+    teachers = {t.get("code"): t for t in solver_state.get("teachers", []) or []}
+    batches = solver_state.get("batches", {}) or {}
+    if isinstance(batches, list):
+        batches = {b["name"]: b for b in batches if "name" in b}
+    subjects = _subject_rows(solver_state, grid)
+
+    if not subjects:
+        raise ValueError("No subjects to schedule")
+    if not rooms:
+        raise ValueError("No rooms configured")
+    if not grid.days or not grid.open:
+        raise ValueError("Config needs at least one day and one teaching period")
+    return {"days": list(grid.days), "n_periods": grid.n_periods, "grid": grid, "rooms": rooms,
+            "teachers": teachers, "batches": batches, "subjects": subjects}
+
+
+def _rows(sessions, room_of, p) -> List[Dict[str, Any]]:
+    """One timetable row per occupied period, sorted by day, period and batch."""
+    days, subjects, rooms = p["days"], p["subjects"], p["rooms"]
+    timetable = []
+    for k, (i, d, start) in enumerate(sessions):
+        s = subjects[i]
+        for q in range(start, start + s["duration"]):
+            timetable.append({
+                "day": days[d],
+                "period": q,
+                "room": rooms[room_of[k]].get("name"),
+                "teacher": s["teacher"],
+                "subject": s["name"],
+                "batch": s["batch"],
+            })
+    timetable.sort(key=lambda e: (days.index(e["day"]), e["period"], str(e["batch"])))
     return timetable
+
+def make_timetable(
+    solver_state: Dict[str, Any],
+    seed: Optional[int] = None,
+    time_limit: Optional[float] = None,
+    workers: Optional[int] = None,
+    should_stop: Optional[Callable[[], bool]] = None,
+    on_progress: Optional[Callable[[Dict[str, Any]], None]] = None,
+    soft: Optional[List[Dict[str, Any]]] = None,
+    gap_limit: Optional[float] = None,
+) -> List[Dict[str, Any]]:
+    """
+    Build a timetable with OR-Tools CP-SAT.
+    Input: solver_state (dict with config, rooms, teachers, subjects, batches)
+    Output: timetable list of dicts, one per occupied (day, period)
+
+    `time_limit` is a wall-clock budget in seconds for the whole call and
+    `workers` the number of CP-SAT search workers. `should_stop` is polled
+    while solving (SolveCancelled is raised once it returns True) and
+    `on_progress` receives a dict per improving solution.
+    `soft` lists weighted soft constraints ({"name", "weight", "params"}, see
+    soft_constraints) to minimise; the search stops once within `gap_limit`
+    (relative) of the best bound or at the time limit, whichever comes first.
+    Raises InfeasibleInput (a ValueError) when analyze() proves there is no
+    timetable, ValueError for malformed input and RuntimeError when no
+    timetable is found in time.
+    """
+    started = time.monotonic()
+    budget = float(time_limit or DEFAULT_TIME_LIMIT)
+    workers = int(workers or DEFAULT_WORKERS)
+    soft = soft_constraints.resolve(soft)
+    with metrics.span("solver.prepare"):
+        p = _prepare(solver_state)
+        report, domains = _analyze(p)
+    if report["issues"]:
+        raise InfeasibleInput(report["issues"])
+
+    time_budget = max(0.1, budget * (1 - ROOM_PHASE_SHARE))
+    sessions = _place_decomposed(p["subjects"], p["teachers"], p["batches"], p["rooms"], p["grid"],
+                                 time_budget, workers, seed, should_stop, on_progress, allowed=domains,
+                                 soft=soft, gap_limit=gap_limit)
+
+    room_of = _assign_rooms(sessions, p["subjects"], p["batches"], p["rooms"], started + budget,
+                            workers, seed, should_stop)
+    return _rows(sessions, room_of, p)
+
+
+# ------------------- Repair -------------------
+
+def _previous_sessions(previous, p) -> List[Tuple[int, int, int, Optional[str]]]:
+    """
+    Turn timetable rows back into (subject index, day, start, room name) sessions.
+    Rows of subjects that no longer exist, or changed teacher, are dropped.
+    """
+    days, subjects = p["days"], p["subjects"]
+    index = {}
+    for i, s in enumerate(subjects):
+        index.setdefault((s["name"], s["batch"]), i)
+
+    runs: Dict[Tuple[int, int, Any], List[int]] = {}
+    for e in previous or []:
+        i = index.get((e.get("subject"), e.get("batch")))
+        if i is None or e.get("day") not in days or e.get("teacher") != subjects[i]["teacher"]:
+            continue  # gone, or handed to another teacher: counts as missing
+        runs.setdefault((i, days.index(e["day"]), e.get("room")), []).append(int(e["period"]))
+
+    sessions = []
+    for (i, d, room), periods in runs.items():
+        periods.sort()
+        dur = subjects[i]["duration"]
+        while periods:
+            start = periods[0]
+            chunk = list(range(start, start + dur))
+            if periods[:dur] != chunk:
+                chunk = [start]  # broken run: keep what is there so it counts as a move
+            periods = periods[len(chunk):]
+            sessions.append((i, d, start, room))
+    return sessions
+
+
+def _parse_unavailable(unavailable, days, n_periods) -> set:
+    """{"T1": ["Mon-3", "Tue"]} -> {("T1", day index, period)}; a bare day blocks all of it."""
+    blocked = set()
+    for teacher, slots in (unavailable or {}).items():
+        for slot in slots:
+            if "-" in slot:
+                blocked.add((teacher, *_parse_fixed_slot(slot, days, teacher)))
+            elif slot in days:
+                blocked.update((teacher, days.index(slot), q) for q in range(1, n_periods + 1))
+            else:
+                raise ValueError(f"Invalid unavailable slot '{slot}' for teacher {teacher}")
+    return blocked
+
+
+def _touched(prev, p, teacher_blocked) -> set:
+    """Subjects whose previous placement no longer holds."""
+    subjects, rooms, days = p["subjects"], p["rooms"], p["days"]
+    room_names = {r.get("name") for r in rooms}
+    placed: Dict[int, int] = {}
+    touched = set()
+    for i, d, start, room in prev:
+        s = subjects[i]
+        placed[i] = placed.get(i, 0) + 1
+        covered = range(start, start + s["duration"])
+        avail = set(p["teachers"].get(s["teacher"], {}).get("avail_periods") or [])
+        if room not in room_names \
+                or (d, start) not in p["grid"].starts(s["duration"]) \
+                or (avail and any(q not in avail for q in covered)) \
+                or any((s["teacher"], d, q) in teacher_blocked for q in covered):
+            touched.add(i)
+    for i, s in enumerate(subjects):
+        fixed = {_parse_fixed_slot(slot, days, s["code"]) for slot in s["fixed"]}
+        starts = {(d, start) for j, d, start, _ in prev if j == i}
+        if placed.get(i, 0) != s["count"] or not fixed <= starts:
+            touched.add(i)
+    return touched
+
+
+def repair_timetable(
+    solver_state: Dict[str, Any],
+    previous: List[Dict[str, Any]],
+    unavailable: Optional[Dict[str, List[str]]] = None,
+    time_limit: Optional[float] = None,
+    workers: Optional[int] = None,
+    should_stop: Optional[Callable[[], bool]] = None,
+    soft: Optional[List[Dict[str, Any]]] = None,
+    gap_limit: Optional[float] = None,
+) -> Dict[str, Any]:
+    """
+    Re-solve `previous` (timetable rows) against an edited solver_state while
+    moving as few classes as possible.
+
+    Subjects whose classes broke (teacher now `unavailable`, room gone, class
+    count or fixed slots changed, newly added) are freed together with every
+    subject sharing their batch or teacher; everything else stays pinned to
+    its old slot. If that neighborhood can't be repaired, the whole week is
+    re-solved, still hinted with and maximising overlap with `previous`.
+    `soft` constraints only break ties between equally small repairs.
+    Returns {"timetable", "moved", "scope", "freed_subjects"}.
+    """
+    started = time.monotonic()
+    budget = float(time_limit or DEFAULT_TIME_LIMIT)
+    workers = int(workers or DEFAULT_WORKERS)
+    soft = soft_constraints.resolve(soft)
+    with metrics.span("solver.prepare"):
+        p = _prepare(solver_state)
+        report, _ = _analyze(p)
+    if report["issues"]:
+        raise InfeasibleInput(report["issues"])
+    subjects = p["subjects"]
+    teacher_blocked = _parse_unavailable(unavailable, p["days"], p["n_periods"])
+
+    prev = _previous_sessions(previous, p)
+    hint = {(i, d, start) for i, d, start, _ in prev}
+    touched = _touched(prev, p, teacher_blocked)
+    batches_hit = {subjects[i]["batch"] for i in touched}
+    teachers_hit = {subjects[i]["teacher"] for i in touched}
+    freed = {i for i, s in enumerate(subjects) if s["batch"] in batches_hit or s["teacher"] in teachers_hit}
+
+    time_budget = max(0.1, budget * (1 - ROOM_PHASE_SHARE))
+    args = (subjects, p["teachers"], p["batches"], p["rooms"], p["grid"])
+    extra = {"teacher_blocked": teacher_blocked, "soft": soft, "gap_limit": gap_limit}
+    sessions, scope = None, "neighborhood"
+    if len(freed) < len(subjects):
+        allowed = {i: set() for i in range(len(subjects)) if i not in freed}
+        for i, d, start, _ in prev:
+            if i in allowed:
+                allowed[i].add((d, start))
+        try:
+            sessions = _place_in_time(*args, time_budget / 2, workers, None, should_stop,
+                                      allowed=allowed, hint=hint, **extra)
+        except SolveCancelled:
+            raise
+        except RuntimeError:
+            sessions = None  # pinned classes leave no room for the freed ones
+    if sessions is None:
+        scope = "full"
+        remaining = max(0.1, time_budget - (time.monotonic() - started))
+        sessions = _place_in_time(*args, remaining, workers, None, should_stop, hint=hint, **extra)
+        freed = set(range(len(subjects)))
+
+    room_index = {r.get("name"): k for k, r in enumerate(p["rooms"])}
+    prev_room = {(i, d, start): room_index.get(room) for i, d, start, room in prev}
+    preferred = {k: prev_room[s] for k, s in enumerate(sessions) if prev_room.get(s) is not None}
+    room_of = _assign_rooms(sessions, subjects, p["batches"], p["rooms"], started + budget,
+                            workers, None, should_stop, preferred)
+    timetable = _rows(sessions, room_of, p)
+
+    before = {(e.get("day"), e.get("period"), e.get("room"), e.get("subject"), e.get("batch")) for e in previous or []}
+    moved = sum(1 for e in timetable if (e["day"], e["period"], e["room"], e["subject"], e["batch"]) not in before)
+    return {"timetable": timetable, "moved": moved, "scope": scope, "freed_subjects": len(freed)}
@@ -0,0 +1,298 @@
+# backend/sqlite_storage.py
+import json
+import sqlite3
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional
+
+from . import columnar, metrics
+from .storage import COMPACT, ENTITY_KINDS, FrozenDict, JsonFileBackend, StorageBackend, freeze
+
+# Columns pulled out of each entity for indexing; the full entity stays in `data`.
+COLUMNS = {
+    "users": ("username", "role"),
+    "rooms": ("name", "type", "capacity"),
+    "teachers": ("code", "name"),
+    "subjects": ("code", "name", "batch", "teacher_code", "branch"),
+    "batches": ("name",),
+    "branches": ("name",),
+}
+# Timetable keys live in `candidates` + `timetable_entries`, told apart by is_latest,
+# and are handed out in the columnar stored form like the JSON backend does.
+TIMETABLE_KEYS = {"timetable_candidates": 0, "latest_timetable": 1}
+ENTRY_COLUMNS = ("day", "period", "room", "teacher", "subject", "batch")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (
+    id INTEGER PRIMARY KEY, username TEXT NOT NULL UNIQUE, role TEXT, data TEXT NOT NULL);
+CREATE INDEX IF NOT EXISTS users_role ON users(role);
+
+CREATE TABLE IF NOT EXISTS rooms (
+    id INTEGER PRIMARY KEY, name TEXT, type TEXT, capacity INTEGER, data TEXT NOT NULL);
+CREATE INDEX IF NOT EXISTS rooms_name ON rooms(name);
+
+CREATE TABLE IF NOT EXISTS teachers (
+    id INTEGER PRIMARY KEY, code TEXT, name TEXT, data TEXT NOT NULL);
+CREATE INDEX IF NOT EXISTS teachers_code ON teachers(code);
+
+CREATE TABLE IF NOT EXISTS subjects (
+    id INTEGER PRIMARY KEY, code TEXT, name TEXT, batch TEXT, teacher_code TEXT, branch TEXT,
+    data TEXT NOT NULL);
+CREATE INDEX IF NOT EXISTS subjects_code ON subjects(code);
+CREATE INDEX IF NOT EXISTS subjects_batch ON subjects(batch);
+CREATE INDEX IF NOT EXISTS subjects_teacher ON subjects(teacher_code);
+
+CREATE TABLE IF NOT EXISTS batches (
+    id INTEGER PRIMARY KEY, name TEXT, data TEXT NOT NULL);
+CREATE INDEX IF NOT EXISTS batches_name ON batches(name);
+
+CREATE TABLE IF NOT EXISTS branches (
+    id INTEGER PRIMARY KEY, name TEXT, data TEXT NOT NULL);
+CREATE INDEX IF NOT EXISTS branches_name ON branches(name);
+
+CREATE TABLE IF NOT EXISTS candidates (
+    id INTEGER PRIMARY KEY, position INTEGER NOT NULL, is_latest INTEGER NOT NULL DEFAULT 0);
+CREATE INDEX IF NOT EXISTS candidates_kind ON candidates(is_latest, position);
+
+CREATE TABLE IF NOT EXISTS timetable_entries (
+    id INTEGER PRIMARY KEY,
+    candidate_id INTEGER NOT NULL REFERENCES candidates(id) ON DELETE CASCADE,
+    day TEXT, period INTEGER, room TEXT, teacher TEXT, subject TEXT, batch TEXT,
+    extra TEXT);
+CREATE INDEX IF NOT EXISTS entries_batch ON timetable_entries(candidate_id, batch);
+CREATE INDEX IF NOT EXISTS entries_teacher ON timetable_entries(candidate_id, teacher);
+CREATE INDEX IF NOT EXISTS entries_room ON timetable_entries(candidate_id, room);
+CREATE INDEX IF NOT EXISTS entries_slot ON timetable_entries(candidate_id, day, period);
+
+CREATE TABLE IF NOT EXISTS kv (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+"""
+
+
+def _dumps(value) -> str:
+    return json.dumps(value, **COMPACT)
+
+
+class SqliteBackend(StorageBackend):
+    """
+    One table per entity kind, timetables as rows of entries, everything else
+    in a key/value table. Runs in WAL mode so readers in other processes never
+    block on a writer. CRUD goes straight to rows; read_state() assembles and
+    caches the full state only for callers that still want the whole thing.
+    """
+
+    def __init__(self, path: Path, import_from: Optional[Path] = None):
+        super().__init__()
+        self.path = Path(path)
+        self.conn = sqlite3.connect(str(self.path), check_same_thread=False, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("PRAGMA foreign_keys=ON")
+        self.conn.executescript(SCHEMA)
+        self._version = 0
+        self._data_version = None
+        self._view = None
+        self._view_version = None
+        if import_from is not None and self._is_empty():
+            self._import_json(Path(import_from))
+
+    def _import_json(self, path: Path):
+        """One-time migration: the JSON backend's snapshot with its journal replayed on top."""
+        source = JsonFileBackend(path)
+        if not path.exists() and not source.journal_path.exists():
+            return
+        state = source.get_state()
+        state.pop(JsonFileBackend.SEQ_KEY, None)
+        self.save_state(state)
+        print(f"✅ Imported {path.name} into {self.path.name}")
+
+    # ------------------- plumbing -------------------
+
+    @contextmanager
+    def _tx(self):
+        """One write transaction; bumps the version when it commits."""
+        with self.lock, metrics.span("storage.write", backend="sqlite"):
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield self.conn
+            except BaseException:
+                self.conn.execute("ROLLBACK")
+                raise
+            self.conn.execute("COMMIT")
+            self._version += 1
+
+    def _query(self, sql: str, params=()) -> List[tuple]:
+        with self.lock:
+            return self.conn.execute(sql, params).fetchall()
+
+    def _is_empty(self) -> bool:
+        return not any(self._query(f"SELECT 1 FROM {kind} LIMIT 1") for kind in ENTITY_KINDS) \
+            and not self._query("SELECT 1 FROM kv LIMIT 1")
+
+    def _check_kind(self, kind: str):
+        if kind not in COLUMNS:
+            raise ValueError(f"Unknown entity kind '{kind}'")
+
+    def _where(self, kind: str, match: Dict[str, Any]):
+        clauses, params = [], []
+        for field, value in match.items():
+            target = field if field in COLUMNS[kind] else f"json_extract(data, '$.{field}')"
+            if value is None:
+                clauses.append(f"{target} IS NULL")
+            else:
+                clauses.append(f"{target} = ?")
+                params.append(value)
+        return (" WHERE " + " AND ".join(clauses)) if clauses else "", params
+
+    def _insert_entities(self, conn, kind: str, items: Iterable[dict]):
+        cols = COLUMNS[kind]
+        conn.executemany(
+            f"INSERT INTO {kind} ({', '.join(cols)}, data) VALUES ({', '.join('?' * (len(cols) + 1))})",
+            [tuple(item.get(c) for c in cols) + (_dumps(item),) for item in items],
+        )
+
+    def _write_timetables(self, conn, key: str, value):
+        is_latest = TIMETABLE_KEYS[key]
+        conn.execute("DELETE FROM candidates WHERE is_latest = ?", (is_latest,))
+        timetables = [value] if is_latest else list(value or [])
+        for position, entries in enumerate(timetables):
+            cur = conn.execute("INSERT INTO candidates (position, is_latest) VALUES (?, ?)", (position, is_latest))
+            rows = []
+            for e in columnar.render(entries):
+                extra = {k: v for k, v in e.items() if k not in ENTRY_COLUMNS}
+                rows.append((cur.lastrowid, *(e.get(c) for c in ENTRY_COLUMNS), _dumps(extra) if extra else None))
+            conn.executemany(
+                "INSERT INTO timetable_entries (candidate_id, day, period, room, teacher, subject, batch, extra)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+
+    def _read_timetables(self, key: str):
+        is_latest = TIMETABLE_KEYS[key]
+        ids = [r[0] for r in self._query(
+            "SELECT id FROM candidates WHERE is_latest = ? ORDER BY position", (is_latest,))]
+        timetables = []
+        for cid in ids:
+            entries = []
+            for row in self._query(
+                "SELECT day, period, room, teacher, subject, batch, extra FROM timetable_entries"
+                " WHERE candidate_id = ? ORDER BY id", (cid,)
+            ):
+                entry = dict(zip(ENTRY_COLUMNS, row[:6]))
+                if row[6]:
+                    entry.update(json.loads(row[6]))
+                entries.append(entry)
+            timetables.append(columnar.pack(entries))
+        if is_latest:
+            return timetables[0] if timetables else None
+        return timetables
+
+    def _write_value(self, conn, key: str, value):
+        if key in COLUMNS:
+            conn.execute(f"DELETE FROM {key}")
+            self._insert_entities(conn, key, value or [])
+        elif key in TIMETABLE_KEYS:
+            self._write_timetables(conn, key, value)
+        else:
+            conn.execute("INSERT OR REPLACE INTO kv (key, value) VALUES (?, ?)", (key, _dumps(value)))
+
+    def _read_value(self, key: str):
+        if key in COLUMNS:
+            return [json.loads(r[0]) for r in self._query(f"SELECT data FROM {key} ORDER BY id")]
+        if key in TIMETABLE_KEYS:
+            return self._read_timetables(key)
+        rows = self._query("SELECT value FROM kv WHERE key = ?", (key,))
+        return json.loads(rows[0][0]) if rows else None
+
+    # ------------------- whole state -------------------
+
+    def version(self) -> int:
+        # data_version moves when another connection (e.g. another worker process) commits
+        data_version = self._query("PRAGMA data_version")[0][0]
+        if data_version != self._data_version:
+            with self.lock:
+                if self._data_version is not None:
+                    self._version += 1
+                self._data_version = data_version
+        return self._version
+
+    def get_state(self) -> dict:
+        with metrics.span("storage.load", backend="sqlite"):
+            return self._load_state()
+
+    def _load_state(self) -> dict:
+        state = {}
+        for kind in ENTITY_KINDS:
+            state[kind] = self._read_value(kind)
+        for key in TIMETABLE_KEYS:
+            value = self._read_value(key)
+            if value is not None:
+                state[key] = value
+        for key, value in self._query("SELECT key, value FROM kv ORDER BY key"):
+            state[key] = json.loads(value)
+        return state
+
+    def read_state(self) -> dict:
+        version = self.version()
+        if self._view is None or self._view_version != version:
+            view = freeze(self.get_state())
+            with self.lock:
+                self._view, self._view_version = view, version
+        return self._view if self._view is not None else FrozenDict()
+
+    def save_state(self, state: dict):
+        with self._tx() as conn:
+            conn.execute("DELETE FROM candidates")
+            conn.execute("DELETE FROM kv")
+            for kind in ENTITY_KINDS:
+                conn.execute(f"DELETE FROM {kind}")
+            for key, value in state.items():
+                self._write_value(conn, key, value)
+
+    # ------------------- rows -------------------
+
+    def find(self, kind: str, **match) -> List[dict]:
+        self._check_kind(kind)
+        where, params = self._where(kind, match)
+        return [json.loads(r[0]) for r in self._query(f"SELECT data FROM {kind}{where} ORDER BY id", params)]
+
+    def insert(self, kind: str, items: Iterable[dict], actor: Optional[str] = None) -> int:
+        self._check_kind(kind)
+        items = list(items)
+        with self._tx() as conn:
+            self._insert_entities(conn, kind, items)
+        return len(items)
+
+    def insert_new(self, kind: str, field: str, item: dict, actor: Optional[str] = None) -> bool:
+        try:
+            return super().insert_new(kind, field, item, actor=actor)
+        except sqlite3.IntegrityError:   # another process inserted it first (users.username is UNIQUE)
+            return False
+
+    def update(self, kind: str, match: Dict[str, Any], changes: Dict[str, Any], actor: Optional[str] = None) -> int:
+        self._check_kind(kind)
+        cols = COLUMNS[kind]
+        where, params = self._where(kind, match)
+        with self._tx() as conn:
+            rows = conn.execute(f"SELECT id, data FROM {kind}{where}", params).fetchall()
+            for row_id, data in rows:
+                item = {**json.loads(data), **changes}
+                conn.execute(
+                    f"UPDATE {kind} SET {', '.join(f'{c} = ?' for c in cols)}, data = ? WHERE id = ?",
+                    (*(item.get(c) for c in cols), _dumps(item), row_id),
+                )
+        return len(rows)
+
+    def delete(self, kind: str, match: Dict[str, Any], actor: Optional[str] = None) -> int:
+        self._check_kind(kind)
+        where, params = self._where(kind, match)
+        with self._tx() as conn:
+            return conn.execute(f"DELETE FROM {kind}{where}", params).rowcount
+
+    def get_value(self, key: str, default=None):
+        value = self._read_value(key)
+        return default if value is None else value
+
+    def set_values(self, values: Dict[str, Any], actor: Optional[str] = None):
+        with self._tx() as conn:
+            for key, value in values.items():
+                self._write_value(conn, key, value)
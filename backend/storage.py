@@ -1,26 +1,38 @@
 import json
+import os
+import re
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from contextvars import ContextVar
 from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional
 import bcrypt
 
+from . import columnar, metrics
+
 DATA_FILE = Path(__file__).parent / "data.json"
+DB_FILE = Path(os.environ.get("TIMETABLE_DB", Path(__file__).parent / "data.db"))
+STORAGE_BACKEND = os.environ.get("TIMETABLE_STORAGE", "json")  # "json" | "sqlite"
 
-def get_state() -> dict:
-    if DATA_FILE.exists():
-        try:
-            with open(DATA_FILE, "r") as f:
-                return json.load(f)
-        except json.JSONDecodeError:
-            print("⚠️ Corrupted data.json, resetting...")
-            reset_state()
-            return get_state()
-    return {}
+ENTITY_KINDS = ("users", "rooms", "teachers", "subjects", "batches", "branches")
+# Fields find() can answer from a hash index instead of a scan
+INDEXED_FIELDS = {
+    "users": ("username", "role"),
+    "rooms": ("name",),
+    "teachers": ("code",),
+    "subjects": ("code", "batch", "teacher_code"),
+    "batches": ("name",),
+    "branches": ("name",),
+}
+COMPACT = {"separators": (",", ":"), "ensure_ascii": False}
+PRETTY = {"indent": 2, "ensure_ascii": False}
 
-def save_state(state: dict):
-    with open(DATA_FILE, "w") as f:
-        json.dump(state, f, indent=2)
 
-def reset_state():
-    state = {
+def empty_state() -> dict:
+    return {
         "users": [],
         "config": {},
         "rooms": [],
@@ -29,33 +41,723 @@ def reset_state():
         "subjects": [],
         "latest_timetable": []
     }
-    save_state(state)
 
-def ensure_passwords_hashed():
+
+# ------------------- Read-only views -------------------
+
+class FrozenDict(dict):
+    """Read-only dict handed out by read_state(); mutate a get_state() copy instead."""
+
+    def _readonly(self, *args, **kwargs):
+        raise TypeError("State views are read-only; use storage.get_state() to modify")
+
+    __setitem__ = __delitem__ = __ior__ = _readonly
+    clear = pop = popitem = setdefault = update = _readonly
+
+    def __reduce__(self):
+        return FrozenDict, (dict(self),)
+
+
+def freeze(value):
+    if isinstance(value, dict):
+        return FrozenDict((k, freeze(v)) for k, v in value.items())
+    if isinstance(value, list):
+        return tuple(freeze(v) for v in value)
+    return value
+
+
+def _matches(item: dict, match: Dict[str, Any]) -> bool:
+    return all(item.get(k) == v for k, v in match.items())
+
+
+# ------------------- Backend interface -------------------
+
+class StorageBackend:
     """
-    Make sure all users in data.json have bcrypt-hashed passwords.
-    If they are plain text, hash them and update file.
+    What the app needs from storage. Subclasses implement the whole-state
+    methods; the entity helpers below default to a locked read-modify-write
+    of the full state, and row-oriented backends override them. `actor` is
+    the username behind a write, for backends that keep an audit trail.
     """
-    if not DATA_FILE.exists():
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self._indexes: Dict[tuple, dict] = {}
+        self._indexes_version = None
+
+    # --- whole state ---
+    def read_state(self) -> dict:
+        raise NotImplementedError
+
+    def get_state(self) -> dict:
+        raise NotImplementedError
+
+    def save_state(self, state: dict):
+        raise NotImplementedError
+
+    def version(self) -> int:
+        raise NotImplementedError
+
+    def export_state(self, pretty: bool = True) -> str:
+        return json.dumps(self.read_state(), **(PRETTY if pretty else COMPACT))
+
+    def history(self, limit: int = 100, op: Optional[str] = None) -> List[dict]:
+        """Most recent logged writes, newest last; empty for backends without a journal."""
+        return []
+
+    # --- entities (users, rooms, teachers, subjects, batches, branches) ---
+    def _index(self, kind: str, field: str) -> dict:
+        """field value -> entities of `kind`; built on first use and dropped by the next write."""
+        version = self.version()
+        view = self.read_state()
+        with self.lock:
+            if self._indexes_version != version:
+                self._indexes = {}
+                self._indexes_version = version
+            index = self._indexes.get((kind, field))
+            if index is None:
+                index = {}
+                for e in view.get(kind, ()):
+                    index.setdefault(e.get(field), []).append(e)
+                self._indexes[(kind, field)] = index
+            return index
+
+    def find(self, kind: str, **match) -> List[dict]:
+        """Entities of `kind` whose fields equal `match`; treat the results as read-only."""
+        indexed = [f for f in match if f in INDEXED_FIELDS.get(kind, ())]
+        if indexed:
+            pool = self._index(kind, indexed[0]).get(match[indexed[0]], ())
+        else:
+            pool = self.read_state().get(kind, ())
+        return [e for e in pool if _matches(e, match)]
+
+    def insert(self, kind: str, items: Iterable[dict], actor: Optional[str] = None) -> int:
+        items = list(items)
+        with self.lock:
+            state = self.get_state()
+            state.setdefault(kind, []).extend(items)
+            self.save_state(state)
+        return len(items)
+
+    def insert_new(self, kind: str, field: str, item: dict, actor: Optional[str] = None) -> bool:
+        """Insert `item` unless an entity of `kind` already has its `field` value (a username); False if one does."""
+        with self.lock:
+            if self.find(kind, **{field: item[field]}):
+                return False
+            self.insert(kind, [item], actor=actor)
+            return True
+
+    def update(self, kind: str, match: Dict[str, Any], changes: Dict[str, Any], actor: Optional[str] = None) -> int:
+        with self.lock:
+            state = self.get_state()
+            hits = [e for e in state.get(kind, []) if _matches(e, match)]
+            for e in hits:
+                e.update(changes)
+            if hits:
+                self.save_state(state)
+        return len(hits)
+
+    def delete(self, kind: str, match: Dict[str, Any], actor: Optional[str] = None) -> int:
+        with self.lock:
+            state = self.get_state()
+            items = state.get(kind, [])
+            kept = [e for e in items if not _matches(e, match)]
+            if len(kept) != len(items):
+                state[kind] = kept
+                self.save_state(state)
+        return len(items) - len(kept)
+
+    # --- other top-level keys (config, timetable_candidates, latest_timetable, ...) ---
+    def get_value(self, key: str, default=None):
+        return self.read_state().get(key, default)
+
+    def set_value(self, key: str, value, actor: Optional[str] = None):
+        self.set_values({key: value}, actor=actor)
+
+    def set_values(self, values: Dict[str, Any], actor: Optional[str] = None):
+        with self.lock:
+            state = self.get_state()
+            state.update(values)
+            self.save_state(state)
+
+    def finalize(self, choice: int, actor: Optional[str] = None):
+        """Copy timetable candidate `choice` into latest_timetable; IndexError if there is no such candidate."""
+        with self.lock:
+            candidates = self.get_value("timetable_candidates") or []
+            if not 0 <= choice < len(candidates):
+                raise IndexError(f"Invalid choice index {choice}")
+            self.set_values({"latest_timetable": columnar.pack(candidates[choice])}, actor=actor)
+
+
+# ------------------- JSON file backend -------------------
+
+COMPACT_OPS = 500                 # journal ops before a new snapshot is written
+COMPACT_BYTES = 8 * 1024 * 1024   # ... or journal bytes, whichever comes first
+ARCHIVE_BYTES = 16 * 1024 * 1024  # audit archive size before it is rotated to `.1`
+REDACTED = "<redacted>"
+
+
+def _apply(state: dict, op: dict):
+    """Apply one journal op to `state` in place; shared by live writes and replay."""
+    kind = op.get("kind")
+    if op["op"] == "insert":
+        state.setdefault(kind, []).extend(op["items"])
+    elif op["op"] == "update":
+        for e in state.get(kind, []):
+            if _matches(e, op["match"]):
+                e.update(op["changes"])
+    elif op["op"] == "delete":
+        state[kind] = [e for e in state.get(kind, []) if not _matches(e, op["match"])]
+    elif op["op"] == "set":
+        state.update(op["values"])
+    elif op["op"] == "finalize":
+        state["latest_timetable"] = columnar.pack(state["timetable_candidates"][op["choice"]])
+    else:
+        raise ValueError(f"Unknown journal op '{op['op']}'")
+
+
+def _audit_entry(op: dict) -> dict:
+    """A journal op as the audit trail keeps it: no password hashes, timetables reduced to their size."""
+    op = dict(op)
+    if op.get("kind") == "users":
+        if "items" in op:
+            op["items"] = [{**u, "hashed_password": REDACTED} if "hashed_password" in u else u for u in op["items"]]
+        if "hashed_password" in op.get("changes", {}):
+            op["changes"] = {**op["changes"], "hashed_password": REDACTED}
+    if op["op"] == "set":
+        values = dict(op["values"])
+        if isinstance(values.get("users"), list):
+            values["users"] = [{**u, "hashed_password": REDACTED} if "hashed_password" in u else u
+                               for u in values["users"]]
+        if values.get("timetable_candidates") is not None:
+            values["timetable_candidates"] = f"<{len(values['timetable_candidates'])} candidates>"
+        if values.get("latest_timetable") is not None:
+            values["latest_timetable"] = "<timetable>"
+        op["values"] = values
+    return op
+
+
+def _lines_backwards(path: Path, block: int = 64 * 1024):
+    """A file's lines from last to first, read in blocks from the end."""
+    try:
+        f = open(path, "rb")
+    except FileNotFoundError:
         return
+    with f:
+        pos = f.seek(0, os.SEEK_END)
+        rest = b""
+        while pos > 0:
+            step = min(block, pos)
+            pos -= step
+            f.seek(pos)
+            lines = (f.read(step) + rest).split(b"\n")
+            rest = lines.pop(0)
+            for line in reversed(lines):
+                if line:
+                    yield line
+        if rest:
+            yield rest
+
+
+class JsonFileBackend(StorageBackend):
+    """
+    The state as a JSON snapshot plus an append-only journal of typed ops
+    (insert / update / delete / set / finalize) in `<file>.log`.
+
+    A write appends one fsynced line and applies it in memory, so it costs
+    O(delta). Loading replays the journal on top of the snapshot. After
+    COMPACT_OPS ops or COMPACT_BYTES bytes, a background thread writes a new
+    snapshot (compact, temp file + fsync + rename) and moves the replayed ops
+    to `<file>.log.archive`, which keeps the audit trail (redacted, rotated
+    to `.1` past ARCHIVE_BYTES). Other processes
+    pick up changes through the files' (mtime, size); there should be only one
+    writer process per file.
+    """
+
+    SEQ_KEY = "_journal_seq"  # last journal op already folded into the snapshot
+
+    def __init__(self, path: Path):
+        super().__init__()
+        self.path = Path(path)
+        self.journal_path = self.path.with_name(self.path.name + ".log")
+        self.archive_path = self.path.with_name(self.path.name + ".log.archive")
+        self._state: Optional[dict] = None
+        self._view = None
+        self._raw = None
+        self._key = None
+        self._seq = 0
+        self._pending_ops = 0
+        self._journal_bytes = 0
+        self._version = 0
+        self._snapshots = 0      # bumped whenever the snapshot is replaced wholesale
+        self._compacting = False
+
+    # ------------------- loading -------------------
+
+    def _disk_key(self):
+        try:
+            st = os.stat(self.path)
+            snapshot = (st.st_mtime_ns, st.st_size)
+        except FileNotFoundError:
+            snapshot = None
+        try:
+            journal = os.stat(self.journal_path).st_size
+        except FileNotFoundError:
+            journal = 0
+        return snapshot, journal
+
+    def _ensure_loaded(self):
+        if self._state is not None and self._disk_key() == self._key:
+            return
+        with self.lock:
+            if self._state is None or self._disk_key() != self._key:
+                self._reload()
+
+    def _reload(self):
+        """Rebuild the in-memory state from the snapshot and the journal."""
+        with metrics.span("storage.load", backend="json") as span:
+            self._load(span)
+
+    def _load(self, span):
+        if self.path.exists():
+            try:
+                text = self.path.read_text(encoding="utf-8")
+                span.set(bytes=len(text))
+                state = json.loads(text)
+            except json.JSONDecodeError:
+                if self._state is not None:
+                    print(f"⚠️ {self.path.name} is unreadable, serving the last good copy")
+                    return
+                if self.journal_path.exists() and self.journal_path.stat().st_size:
+                    # The journal only holds changes made after the lost snapshot; replaying it alone is wrong
+                    raise RuntimeError(f"{self.path} is corrupt and {self.journal_path.name} cannot rebuild it; "
+                                       f"restore {self.path.name} from a backup or an export")
+                self._quarantine_corrupt_file()
+                state = empty_state()
+        else:
+            state = {}
+        seq = int(state.pop(self.SEQ_KEY, 0))
+
+        replayed, good_bytes = 0, 0
+        if self.journal_path.exists():
+            with open(self.journal_path, "rb") as f:
+                for line in f:
+                    try:
+                        op = json.loads(line)
+                    except ValueError:
+                        print(f"⚠️ Ignoring torn tail of {self.journal_path.name}")
+                        break
+                    good_bytes += len(line)
+                    if op["seq"] > seq + 1:
+                        raise RuntimeError(f"{self.journal_path.name} continues from op {op['seq'] - 1} but "
+                                           f"{self.path.name} ends at op {seq}; restore the matching snapshot")
+                    if op["seq"] > seq:
+                        _apply(state, op)
+                        seq = op["seq"]
+                        replayed += 1
+            if good_bytes != self.journal_path.stat().st_size:
+                os.truncate(self.journal_path, good_bytes)
+            span.set(journal_bytes=good_bytes)
+
+        self._state = state
+        self._seq = seq
+        self._pending_ops = replayed
+        self._journal_bytes = good_bytes
+        self._view = self._raw = None
+        self._version += 1
+        self._snapshots += 1
+        self._key = self._disk_key()
+
+    def _quarantine_corrupt_file(self):
+        """Move an unparseable snapshot aside instead of silently overwriting it."""
+        backup = self.path.with_name(f"{self.path.name}.corrupt-{int(time.time())}")
+        os.replace(self.path, backup)
+        print(f"⚠️ Corrupted {self.path.name} moved to {backup.name}, resetting...")
+
+    def _write_temp(self, path: Path, text: str) -> Path:
+        """`text` in a fsynced temp file of its own next to `path`, ready for _replace()."""
+        fd, tmp = tempfile.mkstemp(prefix=f".{path.name}.", suffix=".tmp", dir=path.parent)
+        try:
+            with open(fd, "w", encoding="utf-8") as f:
+                f.write(text)
+                f.flush()
+                os.fsync(f.fileno())
+        except BaseException:
+            os.unlink(tmp)
+            raise
+        return Path(tmp)
+
+    def _atomic_write(self, path: Path, text: str):
+        """Write to a temp file, fsync it and rename it over `path`: readers see the old or the new file, never half of one."""
+        tmp = self._write_temp(path, text)
+        try:
+            self._replace(tmp, path)
+        finally:
+            tmp.unlink(missing_ok=True)
+
+    def _replace(self, tmp: Path, path: Path):
+        os.replace(tmp, path)
+        if os.name == "posix":
+            fd = os.open(path.parent, os.O_RDONLY)
+            try:
+                os.fsync(fd)  # make the rename itself durable
+            finally:
+                os.close(fd)
+
+    # ------------------- journal -------------------
+
+    def _append(self, op: dict, actor: Optional[str]):
+        with self.lock:
+            self._ensure_loaded()
+            op = {"seq": self._seq + 1, "ts": time.time(), "actor": actor, **op}
+            line = json.dumps(op, **COMPACT) + "\n"
+            with metrics.span("storage.journal", backend="json", bytes=len(line)), \
+                    open(self.journal_path, "a", encoding="utf-8") as f:
+                f.write(line)
+                f.flush()
+                os.fsync(f.fileno())
+            # Apply the decoded line, so live state and replay can never drift apart
+            _apply(self._state, json.loads(line))
+            self._seq = op["seq"]
+            self._pending_ops += 1
+            self._journal_bytes += len(line.encode("utf-8"))
+            self._view = self._raw = None
+            self._version += 1
+            self._key = self._disk_key()
+            if (self._pending_ops >= COMPACT_OPS or self._journal_bytes >= COMPACT_BYTES) and not self._compacting:
+                self._compacting = True
+                threading.Thread(target=self.compact, daemon=True, name="journal-compaction").start()
+
+    def _archive_through(self, seq: int):
+        """Move journal lines up to `seq` into the archive and keep the rest. Caller holds the lock."""
+        if not self.journal_path.exists():
+            return
+        done, rest = [], []
+        with open(self.journal_path, "r", encoding="utf-8") as f:
+            for line in f:
+                op = json.loads(line)
+                if op["seq"] <= seq:
+                    done.append(json.dumps(_audit_entry(op), **COMPACT) + "\n")
+                else:
+                    rest.append(line)
+        if done:
+            with open(self.archive_path, "a", encoding="utf-8") as f:
+                f.writelines(done)
+                f.flush()
+                os.fsync(f.fileno())
+            if self.archive_path.stat().st_size > ARCHIVE_BYTES:
+                os.replace(self.archive_path, self._rotated_archive())
+        self._atomic_write(self.journal_path, "".join(rest))
+        self._pending_ops = len(rest)
+        self._journal_bytes = sum(len(line.encode("utf-8")) for line in rest)
+
+    def _rotated_archive(self) -> Path:
+        return self.archive_path.with_name(self.archive_path.name + ".1")
+
+    def compact(self):
+        """Write a snapshot of everything journaled so far and trim the journal."""
+        try:
+            with self.lock:
+                self._ensure_loaded()
+                seq, snapshots = self._seq, self._snapshots
+                text = json.dumps({**self._state, self.SEQ_KEY: seq}, **COMPACT)
+            # Written outside the lock so writers don't wait on the fsync, but only renamed
+            # into place if no save_state() replaced the snapshot meanwhile
+            with metrics.span("storage.compact", backend="json", bytes=len(text)):
+                tmp = self._write_temp(self.path, text)
+            try:
+                with self.lock:
+                    if self._snapshots != snapshots:
+                        return
+                    # The snapshot carries its seq, so a crash before the journal is trimmed is harmless
+                    self._replace(tmp, self.path)
+                    self._archive_through(seq)
+                    self._key = self._disk_key()
+            finally:
+                tmp.unlink(missing_ok=True)
+        finally:
+            self._compacting = False
+
+    def history(self, limit: int = 100, op: Optional[str] = None) -> List[dict]:
+        """
+        Read from the end of the journal and archive without taking the lock;
+        a compaction moving lines between them meanwhile is caught by seq.
+        """
+        if limit < 0:
+            raise ValueError("limit must be >= 0")
+        entries, last = [], float("inf")
+        for path in (self.journal_path, self.archive_path, self._rotated_archive()):
+            for line in _lines_backwards(path):
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue   # a line still being written
+                if entry["seq"] >= last:
+                    continue
+                last = entry["seq"]
+                if op is None or entry["op"] == op:
+                    entries.append(_audit_entry(entry))
+                    if len(entries) == limit:
+                        return entries[::-1]
+        return entries[::-1]
+
+    # ------------------- whole state -------------------
 
+    def read_state(self) -> dict:
+        self._ensure_loaded()
+        with self.lock:
+            if self._view is None:
+                self._view = freeze(self._state)
+            return self._view
+
+    def get_state(self) -> dict:
+        self._ensure_loaded()
+        with metrics.span("storage.get_state", backend="json") as span:
+            with self.lock:
+                if self._raw is None:
+                    self._raw = json.dumps(self._state, **COMPACT)
+                raw = self._raw
+            span.set(bytes=len(raw))
+            return json.loads(raw)
+
+    def save_state(self, state: dict):
+        """Replace everything: written straight to a new snapshot, superseding the journal."""
+        with self.lock, metrics.span("storage.save", backend="json") as span:
+            self._ensure_loaded()
+            raw = json.dumps(state, **COMPACT)
+            span.set(bytes=len(raw))
+            self._atomic_write(self.path, json.dumps({**json.loads(raw), self.SEQ_KEY: self._seq}, **COMPACT))
+            self._archive_through(self._seq)
+            self._state = json.loads(raw)
+            self._raw = raw
+            self._view = None
+            self._version += 1
+            self._snapshots += 1
+            self._key = self._disk_key()
+
+    def version(self) -> int:
+        self._ensure_loaded()
+        return self._version
+
+    # ------------------- typed writes -------------------
+
+    def insert(self, kind: str, items: Iterable[dict], actor: Optional[str] = None) -> int:
+        items = list(items)
+        self._append({"op": "insert", "kind": kind, "items": items}, actor)
+        return len(items)
+
+    def update(self, kind: str, match: Dict[str, Any], changes: Dict[str, Any], actor: Optional[str] = None) -> int:
+        with self.lock:
+            hits = len(self.find(kind, **match))
+            if hits:
+                self._append({"op": "update", "kind": kind, "match": match, "changes": changes}, actor)
+        return hits
+
+    def delete(self, kind: str, match: Dict[str, Any], actor: Optional[str] = None) -> int:
+        with self.lock:
+            hits = len(self.find(kind, **match))
+            if hits:
+                self._append({"op": "delete", "kind": kind, "match": match}, actor)
+        return hits
+
+    def set_values(self, values: Dict[str, Any], actor: Optional[str] = None):
+        self._append({"op": "set", "values": values}, actor)
+
+    def finalize(self, choice: int, actor: Optional[str] = None):
+        with self.lock:
+            candidates = self.read_state().get("timetable_candidates") or ()
+            if not 0 <= choice < len(candidates):
+                raise IndexError(f"Invalid choice index {choice}")
+            self._append({"op": "finalize", "choice": choice}, actor)
+
+
+# ------------------- Tenants -------------------
+# One shard per college: its own backend (file or database), lock and caches.
+# The tenant of the running request lives in a context variable, so the
+# facade functions below stay tenant-agnostic; auth sets it from the token.
+
+DEFAULT_TENANT = "default"   # keeps DATA_FILE / DB_FILE
+TENANTS_DIR = Path(os.environ.get("TIMETABLE_TENANTS_DIR", Path(__file__).parent / "tenants"))
+# Colleges that may log in before their shard exists, comma separated
+CONFIGURED_TENANTS = {t.strip() for t in os.environ.get("TIMETABLE_TENANTS", "").split(",") if t.strip()}
+TENANT_NAME = re.compile(r"^[a-z0-9][a-z0-9_-]{0,62}$")
+
+_tenant: ContextVar[str] = ContextVar("tenant", default=DEFAULT_TENANT)
+_backends: Dict[str, StorageBackend] = {}
+_backend_lock = threading.Lock()
+
+
+def current_tenant() -> str:
+    return _tenant.get()
+
+
+def use_tenant(tenant: Optional[str]):
+    """Make `tenant` current for this request/task (and the threads it hands work to)."""
+    tenant = tenant or DEFAULT_TENANT
+    if not TENANT_NAME.match(tenant):
+        raise ValueError(f"Invalid tenant name '{tenant}'")
+    return _tenant.set(tenant)
+
+
+@contextmanager
+def tenant_scope(tenant: Optional[str]):
+    """Run a block (a script, a test) against one tenant's shard."""
+    token = use_tenant(tenant)
     try:
-        with open(DATA_FILE, "r") as f:
-            data = json.load(f)
-    except json.JSONDecodeError:
-        print("⚠️ Corrupted data.json, skipping password check.")
+        yield
+    finally:
+        _tenant.reset(token)
+
+
+def _shard_path(tenant: str, suffix: str) -> Path:
+    if tenant == DEFAULT_TENANT:
+        return DB_FILE if suffix == ".db" else DATA_FILE
+    return TENANTS_DIR / f"{tenant}{suffix}"
+
+
+def tenant_exists(tenant: str) -> bool:
+    """Known colleges: the default, TIMETABLE_TENANTS, and any shard on disk or open."""
+    if tenant == DEFAULT_TENANT or tenant in CONFIGURED_TENANTS or tenant in _backends:
+        return True
+    return any(_shard_path(tenant, s).exists() for s in (".json", ".db")) if TENANT_NAME.match(tenant) else False
+
+
+def tenants() -> List[str]:
+    found = {DEFAULT_TENANT} | CONFIGURED_TENANTS | set(_backends)
+    if TENANTS_DIR.is_dir():
+        found |= {p.stem for p in TENANTS_DIR.iterdir() if p.suffix in (".json", ".db") and TENANT_NAME.match(p.stem)}
+    return sorted(found)
+
+
+def create_tenant(tenant: str):
+    """Start an empty shard for a new college."""
+    if not TENANT_NAME.match(tenant):
+        raise ValueError(f"Invalid tenant name '{tenant}'")
+    if tenant == DEFAULT_TENANT or tenant in _backends or any(_shard_path(tenant, s).exists() for s in (".json", ".db")):
+        raise ValueError(f"Tenant '{tenant}' already exists")
+    with tenant_scope(tenant):
+        backend().save_state(empty_state())
+
+
+def _open(tenant: str) -> StorageBackend:
+    if tenant != DEFAULT_TENANT:
+        TENANTS_DIR.mkdir(parents=True, exist_ok=True)
+    if STORAGE_BACKEND == "sqlite":
+        from .sqlite_storage import SqliteBackend
+        return SqliteBackend(_shard_path(tenant, ".db"), import_from=_shard_path(tenant, ".json"))
+    if STORAGE_BACKEND == "json":
+        return JsonFileBackend(_shard_path(tenant, ".json"))
+    raise ValueError(f"Unknown TIMETABLE_STORAGE '{STORAGE_BACKEND}'")
+
+
+# ------------------- Active backend -------------------
+
+def backend() -> StorageBackend:
+    """The current tenant's backend, picked by TIMETABLE_STORAGE and opened on first use."""
+    tenant = _tenant.get()
+    shard = _backends.get(tenant)
+    if shard is None:
+        with _backend_lock:
+            shard = _backends.get(tenant)
+            if shard is None:
+                shard = _backends[tenant] = _open(tenant)
+    return shard
+
+
+def state_version() -> int:
+    """Counter bumped on every save; useful for derived caches."""
+    return backend().version()
+
+
+def read_state() -> dict:
+    """
+    Shared, read-only view of the state. Cheap enough to call on every
+    request; raises TypeError if a caller tries to modify it.
+    """
+    return backend().read_state()
+
+
+def get_state() -> dict:
+    """Private, mutable copy of the state for callers that will save_state() it."""
+    return backend().get_state()
+
+def save_state(state: dict):
+    backend().save_state(state)
+
+
+def export_state(pretty: bool = True) -> str:
+    """Serialized state for download or backups, indented unless `pretty` is False."""
+    return backend().export_state(pretty)
+
+
+def find(kind: str, **match) -> List[dict]:
+    return backend().find(kind, **match)
+
+
+def insert(kind: str, items: Iterable[dict], actor: Optional[str] = None) -> int:
+    return backend().insert(kind, items, actor=actor)
+
+
+def insert_new(kind: str, field: str, item: dict, actor: Optional[str] = None) -> bool:
+    """Check-and-insert in one step, e.g. insert_new("users", "username", user); False if taken."""
+    return backend().insert_new(kind, field, item, actor=actor)
+
+
+def update(kind: str, match: Dict[str, Any], changes: Dict[str, Any], actor: Optional[str] = None) -> int:
+    return backend().update(kind, match, changes, actor=actor)
+
+
+def delete(kind: str, match: Dict[str, Any], actor: Optional[str] = None) -> int:
+    return backend().delete(kind, match, actor=actor)
+
+
+def get_value(key: str, default=None):
+    return backend().get_value(key, default)
+
+
+def set_value(key: str, value, actor: Optional[str] = None):
+    backend().set_value(key, value, actor=actor)
+
+
+def set_values(values: Dict[str, Any], actor: Optional[str] = None):
+    """Several top-level keys in one write."""
+    backend().set_values(values, actor=actor)
+
+
+def finalize(choice: int, actor: Optional[str] = None):
+    backend().finalize(choice, actor=actor)
+
+
+def history(limit: int = 100, op: Optional[str] = None) -> List[dict]:
+    return backend().history(limit, op)
+
+def set_state(patch, value=None):
+    """Merge top-level keys into the stored state: set_state({"users": [...]}) or set_state("key", value)."""
+    if isinstance(patch, str):
+        patch = {patch: value}
+    backend().set_values(patch)
+
+def reset_state():
+    save_state(empty_state())
+
+def ensure_passwords_hashed():
+    """
+    Make sure all users in storage have bcrypt-hashed passwords.
+    If they are plain text, hash them (in parallel) and update storage in one write.
+    """
+    users = [dict(u) for u in find("users")]
+    plain = [u for u in users if u.get("hashed_password") and not str(u["hashed_password"]).startswith("$2b$")]
+    if not plain:
         return
 
-    changed = False
-    for user in data.get("users", []):
-        pwd = user.get("hashed_password")
-        if pwd and not str(pwd).startswith("$2b$"):
-            hashed = bcrypt.hashpw(pwd.encode("utf-8"), bcrypt.gensalt()).decode("utf-8")
-            user["hashed_password"] = hashed
-            changed = True
-            print(f"🔐 Hashed password for user: {user['username']}")
-
-    if changed:
-        with open(DATA_FILE, "w") as f:
-            json.dump(data, f, indent=2)
-        print("✅ Updated data.json with secure password hashes")
+    def _hash(pwd) -> str:
+        return bcrypt.hashpw(str(pwd).encode("utf-8"), bcrypt.gensalt()).decode("utf-8")
+
+    with ThreadPoolExecutor(max_workers=max(2, min(8, os.cpu_count() or 1))) as pool:
+        hashes = list(pool.map(_hash, [u["hashed_password"] for u in plain]))
+    for user, hashed in zip(plain, hashes):
+        user["hashed_password"] = hashed
+        print(f"🔐 Hashed password for user: {user['username']}")
+
+    set_value("users", users)
+    print("✅ Updated storage with secure password hashes")
@@ -0,0 +1,193 @@
+# backend/streaming.py
+import json
+import zlib
+from typing import Any, Iterable, Iterator, Optional
+
+from fastapi import Request
+from fastapi.responses import StreamingResponse
+from starlette.datastructures import Headers, MutableHeaders
+
+try:  # optional: `pip install brotli` enables Content-Encoding: br
+    import brotli
+except ImportError:
+    brotli = None
+
+CHUNK_BYTES = 64 * 1024       # streamed bodies are sent in pieces of about this size
+MIN_COMPRESS_BYTES = 1024     # smaller plain responses go out as-is
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+
+NDJSON = "application/x-ndjson"
+
+
+# ------------------- Encoders -------------------
+
+class _Gzip:
+    name = "gzip"
+
+    def __init__(self):
+        self._z = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)  # 31 = gzip container
+
+    def compress(self, data: bytes, final: bool) -> bytes:
+        # Sync-flush each streamed piece so the client can start parsing right away
+        return self._z.compress(data) + self._z.flush(zlib.Z_FINISH if final else zlib.Z_SYNC_FLUSH)
+
+
+class _Brotli:
+    name = "br"
+
+    def __init__(self):
+        self._c = brotli.Compressor(quality=BROTLI_QUALITY)
+
+    def compress(self, data: bytes, final: bool) -> bytes:
+        out = self._c.process(data)
+        return out + (self._c.finish() if final else self._c.flush())
+
+
+def negotiate(accept_encoding: str) -> Optional[type]:
+    """Encoder class for an Accept-Encoding header: br if available and wanted, else gzip, else None."""
+    wanted = {}
+    for part in accept_encoding.split(","):
+        name, _, params = part.strip().partition(";")
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        if name:
+            wanted[name.strip().lower()] = q
+    star = wanted.get("*", 0.0)
+    options = [(wanted.get("gzip", star), 1, _Gzip)]
+    if brotli is not None:
+        options.append((wanted.get("br", star), 2, _Brotli))
+    q, _, encoder = max(options)
+    return encoder if q > 0 else None
+
+
+# ------------------- Middleware -------------------
+
+class CompressionMiddleware:
+    """
+    gzip/br for any response the client accepts it for. Plain bodies under
+    MIN_COMPRESS_BYTES are left alone; streamed bodies are compressed piece
+    by piece so they stay streamed.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoder_class = negotiate(Headers(scope=scope).get("accept-encoding", ""))
+        if encoder_class is None:
+            await self.app(scope, receive, send)
+            return
+
+        start = None
+        encoder = None   # set once we've decided to compress
+        passthrough = False
+
+        async def send_compressed(message):
+            nonlocal start, encoder, passthrough
+            if message["type"] == "http.response.start":
+                start = message
+                return
+            if message["type"] != "http.response.body":
+                await send(message)
+                return
+            body = message.get("body", b"")
+            more = message.get("more_body", False)
+
+            if start is not None:
+                headers = MutableHeaders(raw=start["headers"])
+                headers.add_vary_header("Accept-Encoding")
+                small = not more and len(body) < MIN_COMPRESS_BYTES
+                if "content-encoding" in headers or small or start["status"] in (204, 304):
+                    passthrough = True
+                else:
+                    encoder = encoder_class()
+                    headers["Content-Encoding"] = encoder.name
+                    if "content-length" in headers:
+                        del headers["content-length"]
+                    if not more:
+                        body = encoder.compress(body, True)
+                        headers["Content-Length"] = str(len(body))
+                        message = {**message, "body": body}
+                        encoder = None
+                await send(start)
+                start = None
+                if encoder is None:
+                    await send(message)
+                    return
+            elif passthrough or encoder is None:
+                await send(message)
+                return
+
+            await send({"type": "http.response.body", "body": encoder.compress(body, not more), "more_body": more})
+
+        await self.app(scope, receive, send_compressed)
+
+
+# ------------------- Streaming bodies -------------------
+
+def _chunks(pieces: Iterable[str]) -> Iterator[bytes]:
+    """Join small encoded pieces into CHUNK_BYTES writes."""
+    buffer, size = [], 0
+    for piece in pieces:
+        buffer.append(piece)
+        size += len(piece)
+        if size >= CHUNK_BYTES:
+            yield "".join(buffer).encode("utf-8")
+            buffer, size = [], 0
+    if buffer:
+        yield "".join(buffer).encode("utf-8")
+
+
+def _json_pieces(value: Any, depth: int) -> Iterator[str]:
+    """
+    JSON text of value in pieces. Dicts and lists are split `depth` levels
+    deep; any other iterable (a generator, say) is written as a list one
+    item at a time, so items can be built lazily while the response is sent.
+    """
+    if isinstance(value, dict) and depth > 0:
+        yield "{"
+        for n, (key, item) in enumerate(value.items()):
+            yield ("," if n else "") + json.dumps(str(key)) + ":"
+            yield from _json_pieces(item, depth - 1)
+        yield "}"
+    elif isinstance(value, (list, tuple)) and depth > 0 or _is_lazy(value):
+        yield "["
+        for n, item in enumerate(value):
+            if n:
+                yield ","
+            yield from _json_pieces(item, depth - 1)
+        yield "]"
+    else:
+        yield json.dumps(value, default=str)
+
+
+def _is_lazy(value) -> bool:
+    return hasattr(value, "__next__")
+
+
+def json_response(value: Any, depth: int = 2, headers: Optional[dict] = None) -> StreamingResponse:
+    """One JSON document, streamed; generators inside value are consumed as it goes out."""
+    return StreamingResponse(_chunks(_json_pieces(value, depth)), media_type="application/json", headers=headers)
+
+
+def ndjson_response(lines: Iterable[Any], headers: Optional[dict] = None) -> StreamingResponse:
+    """One JSON value per line, each encoded only when it is sent."""
+    pieces = (json.dumps(line, default=str) + "\n" for line in lines)
+    return StreamingResponse(_chunks(pieces), media_type=NDJSON, headers=headers)
+
+
+def wants_ndjson(request: Request, fmt: Optional[str] = None) -> bool:
+    """?format=ndjson, or an Accept header asking for NDJSON."""
+    if fmt:
+        return fmt == "ndjson"
+    accept = request.headers.get("accept", "")
+    return NDJSON in accept or "application/ndjson" in accept
@@ -15,7 +15,7 @@ class Subject(BaseModel):
 # ✅ Get all subjects
 @router.get("/", response_model=List[Subject])
 def get_subjects(current_user: dict = Depends(get_current_user)):
-    return storage.get_state().get("subjects", [])
+    return storage.read_state().get("subjects", [])
 
 
 # ✅ Add subject (admin only)
@@ -0,0 +1,184 @@
+# backend/tenants.py
+import hmac
+import threading
+from collections import OrderedDict, deque
+from concurrent.futures import CancelledError, Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import contextmanager
+from typing import Dict
+
+from fastapi import APIRouter, Depends, HTTPException, Request
+from pydantic import BaseModel
+
+from . import metrics, storage
+from .auth import get_current_user, oauth2_scheme
+
+MAX_SOLVES_PER_TENANT = 2   # generate/repair requests a college can have solving at once
+
+router = APIRouter(prefix="/tenants", tags=["tenants"])
+
+
+# ------------------- Fair solver queue -------------------
+
+class FairPool:
+    """
+    A process pool shared by all colleges, fed from one queue per tenant.
+    Work only reaches the pool when a worker is free, and the tenants take
+    turns, so a college with many solves queued delays another college by
+    at most the solves already running, not by its whole backlog.
+    """
+
+    def __init__(self, max_workers: int, mp_context):
+        self.max_workers = max_workers
+        self._mp_context = mp_context
+        self._pool = ProcessPoolExecutor(max_workers=max_workers, mp_context=mp_context)
+        self._queues: "OrderedDict[str, deque]" = OrderedDict()
+        self._running = 0
+        self._closed = False
+        self._cond = threading.Condition()
+        self._thread = threading.Thread(target=self._dispatch, name="solver-dispatch", daemon=True)
+        self._thread.start()
+
+    def submit(self, fn, *args, **kwargs) -> Future:
+        """Queue fn(*args, **kwargs) for the current tenant; the future can be cancelled until it starts."""
+        future = Future()
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("Solver pool is shut down")
+            self._queues.setdefault(storage.current_tenant(), deque()).append((future, fn, args, kwargs))
+            self._cond.notify()
+        return future
+
+    def queued(self) -> Dict[str, int]:
+        with self._cond:
+            return {tenant: len(q) for tenant, q in self._queues.items()}
+
+    def _next(self):
+        """Next live work item, round-robin over tenants (call with the lock held)."""
+        while self._queues:
+            tenant, queue = next(iter(self._queues.items()))
+            item = queue.popleft()
+            if queue:
+                self._queues.move_to_end(tenant)
+            else:
+                del self._queues[tenant]
+            if item[0].set_running_or_notify_cancel():
+                return item
+        return None
+
+    def _dispatch(self):
+        while True:
+            with self._cond:
+                item = None
+                while not self._closed:
+                    if self._running < self.max_workers:
+                        item = self._next()
+                        if item is not None:
+                            break
+                    self._cond.wait()
+                if self._closed:
+                    return
+                self._running += 1
+                pool = self._pool
+            future, fn, args, kwargs = item
+            try:
+                inner = pool.submit(fn, *args, **kwargs)
+            except Exception as e:
+                self._finished(pool, future, e)
+                continue
+            inner.add_done_callback(lambda inner, pool=pool, future=future: self._done(pool, future, inner))
+
+    def _done(self, pool, future: Future, inner: Future):
+        if inner.cancelled():
+            self._finished(pool, future, CancelledError())
+        elif inner.exception() is not None:
+            self._finished(pool, future, inner.exception())
+        else:
+            self._finished(pool, future, None, inner.result())
+
+    def _finished(self, pool, future: Future, error=None, result=None):
+        with self._cond:
+            self._running -= 1
+            if isinstance(error, BrokenProcessPool) and pool is self._pool and not self._closed:
+                # A crashed worker breaks the whole pool; start a fresh one for the next solves
+                self._pool = ProcessPoolExecutor(max_workers=self.max_workers, mp_context=self._mp_context)
+                pool.shutdown(wait=False, cancel_futures=True)
+            self._cond.notify()
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
+
+    def shutdown(self):
+        with self._cond:
+            self._closed = True
+            queued = [item[0] for q in self._queues.values() for item in q]
+            self._queues.clear()
+            self._cond.notify_all()
+        for future in queued:
+            future.cancel()
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+
+# ------------------- Per-tenant solve slots -------------------
+
+_slots: Dict[str, threading.BoundedSemaphore] = {}
+_slots_lock = threading.Lock()
+
+
+@contextmanager
+def solve_slot():
+    """
+    Hold one of the current tenant's MAX_SOLVES_PER_TENANT solve slots, or 429.
+    A blocking solve ties up a server thread, so one college can't take them all.
+    """
+    tenant = storage.current_tenant()
+    with _slots_lock:
+        slot = _slots.setdefault(tenant, threading.BoundedSemaphore(MAX_SOLVES_PER_TENANT))
+    if not slot.acquire(blocking=False):
+        raise HTTPException(
+            status_code=429,
+            detail="This college already has timetables solving; retry shortly or use background=true",
+            headers={"Retry-After": "5"},
+        )
+    try:
+        yield
+    finally:
+        slot.release()
+
+
+# ------------------- Routes -------------------
+
+class TenantCreate(BaseModel):
+    name: str
+
+
+def require_operator(current_user: dict):
+    """Colleges are managed by admins of the default tenant."""
+    if current_user["role"] != "admin" or storage.current_tenant() != storage.DEFAULT_TENANT:
+        raise HTTPException(status_code=403, detail="Only the default college's admin can manage colleges")
+
+
+async def require_metrics_access(request: Request):
+    """/metrics: a scraper sending TIMETABLE_METRICS_TOKEN as its bearer token, else the operator."""
+    token = await oauth2_scheme(request)   # 401 without a bearer token
+    if metrics.SCRAPE_TOKEN and hmac.compare_digest(token.encode(), metrics.SCRAPE_TOKEN.encode()):
+        return
+    require_operator(await get_current_user(token))
+
+
+@router.get("")
+def list_tenants(current_user: dict = Depends(get_current_user)):
+    require_operator(current_user)
+    return storage.tenants()
+
+
+@router.post("")
+def create_tenant(data: TenantCreate, current_user: dict = Depends(get_current_user)):
+    """Start an empty college; its admin/admin account is created on the first login."""
+    require_operator(current_user)
+    try:
+        storage.create_tenant(data.name)
+    except ValueError as e:
+        raise HTTPException(400, str(e))
+    return {"status": "tenant created", "tenant": data.name}
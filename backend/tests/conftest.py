@@ -0,0 +1,15 @@
+# backend/tests/conftest.py
+import pytest
+
+from backend import storage
+
+
+@pytest.fixture
+def fresh_storage(tmp_path, monkeypatch):
+    """Every tenant's storage under tmp_path (JSON backend), with no shard open yet."""
+    monkeypatch.setattr(storage, "STORAGE_BACKEND", "json")
+    monkeypatch.setattr(storage, "DATA_FILE", tmp_path / "data.json")
+    monkeypatch.setattr(storage, "DB_FILE", tmp_path / "data.db")
+    monkeypatch.setattr(storage, "TENANTS_DIR", tmp_path / "tenants")
+    monkeypatch.setattr(storage, "_backends", {})
+    return tmp_path
@@ -0,0 +1,58 @@
+# backend/tests/test_auth.py
+import asyncio
+import threading
+
+import pytest
+from fastapi import HTTPException
+
+from backend import auth, storage
+
+
+def _users(username):
+    return [(u["username"], u["role"]) for u in storage.find("users", username=username)]
+
+
+def test_default_admin_is_not_added_next_to_a_non_admin_named_admin(fresh_storage):
+    storage.insert("users", [{"username": "admin", "hashed_password": auth.get_password_hash("x"), "role": "faculty"}])
+    for _ in range(2):
+        assert auth.authenticate_user("admin", "admin") is None
+    assert _users("admin") == [("admin", "faculty")]
+
+
+def test_default_admin_is_created_when_there_is_none(fresh_storage):
+    user = auth.authenticate_user("admin", "admin")
+    assert user["role"] == "admin" and _users("admin") == [("admin", "admin")]
+
+
+# ---------------- Hashing pool ----------------
+
+def test_hashing_pool_answers_429_when_full(monkeypatch):
+    monkeypatch.setattr(auth, "_hash_slots", threading.BoundedSemaphore(1))
+    assert asyncio.run(auth.run_hashing(len, "ab")) == 2     # the slot is freed again afterwards
+
+    auth._hash_slots.acquire()
+    with pytest.raises(HTTPException) as e:
+        asyncio.run(auth.run_hashing(len, "ab"))
+    assert e.value.status_code == 429 and e.value.headers["Retry-After"] == "1"
+    auth._hash_slots.release()
+    assert asyncio.run(auth.run_hashing(len, "ab")) == 2
+
+
+@pytest.mark.parametrize("backend", ["json", "sqlite"])
+def test_concurrent_registrations_create_one_user(fresh_storage, monkeypatch, backend):
+    monkeypatch.setattr(storage, "STORAGE_BACKEND", backend)
+    results = []
+    start = threading.Barrier(8)
+
+    def register(i):
+        start.wait()
+        results.append(storage.insert_new("users", "username", {"username": "f1", "hashed_password": str(i),
+                                                               "role": "faculty"}))
+
+    threads = [threading.Thread(target=register, args=(i,)) for i in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert sorted(results) == [False] * 7 + [True]
+    assert _users("f1") == [("f1", "faculty")]
@@ -0,0 +1,58 @@
+# backend/tests/test_feasibility.py
+"""analyze() catches provably impossible input before any solve, and make_timetable refuses it."""
+import pytest
+
+from backend import solver, week
+
+# Mon/Tue, default day: periods 1-3, lunch (4), periods 5-8 -> 14 open slots a week
+CONFIG = week.solver_config({"days": ["Mon", "Tue"]})
+
+
+def _state(subjects, teachers=None, batch=None, rooms=None):
+    return {
+        "config": CONFIG,
+        "rooms": rooms or [{"name": "R1", "capacity": 40}],
+        "teachers": teachers or [{"code": "T1"}, {"code": "T2"}],
+        "batches": {"A": {"name": "A", "size": 30, **(batch or {})}},
+        "subjects": [{"name": code, "code": code, "batch": "A", "teacher_code": teacher, **extra}
+                     for code, teacher, extra in subjects],
+    }
+
+
+INFEASIBLE = [
+    ("teacher_load", _state([("Math", "T1", {"classes_per_week": 5})], teachers=[{"code": "T1", "max_load": 4}])),
+    ("teacher_time", _state([("Math", "T1", {"classes_per_week": 5})], teachers=[{"code": "T1", "avail_periods": [1, 2]}])),
+    ("batch_load", _state([("Math", "T1", {"classes_per_week": 5})], batch={"max_per_day": 2})),
+    ("batch_time", _state([("Math", "T1", {"classes_per_week": 8}), ("Phys", "T2", {"classes_per_week": 7})])),
+    ("room_capacity", _state([("Math", "T1", {"classes_per_week": 1})], rooms=[{"name": "R1", "capacity": 20}])),
+    ("fixed_clash", _state([("Math", "T1", {"classes_per_week": 1, "fixed_slots": ["Mon-1"]}),
+                            ("Phys", "T2", {"classes_per_week": 1, "fixed_slots": ["Mon-1"]})])),
+    ("fixed_unusable", _state([("Math", "T1", {"classes_per_week": 1, "fixed_slots": ["Mon-4"]})])),   # lunch
+    ("fixed_count", _state([("Math", "T1", {"classes_per_week": 1, "fixed_slots": ["Mon-1", "Tue-1"]})])),
+]
+
+
+@pytest.mark.parametrize("code,state", INFEASIBLE, ids=[code for code, _ in INFEASIBLE])
+def test_analyze_reports_the_issue(code, state):
+    report = solver.analyze(state)
+    assert not report["feasible"]
+    assert code in {i["code"] for i in report["issues"]}
+    with pytest.raises(solver.InfeasibleInput) as e:
+        solver.make_timetable(state, seed=0, time_limit=5, workers=1)
+    assert code in {i["code"] for i in e.value.issues}
+
+
+def test_feasible_input_has_no_issues_and_tighter_domains():
+    state = _state([("Math", "T1", {"classes_per_week": 2, "fixed_slots": ["Mon-1", "Mon-2"]}),
+                    ("Phys", "T2", {"classes_per_week": 3})])
+    report = solver.analyze(state)
+    assert report["feasible"] and not report["issues"]
+    # Phys loses the two batch slots Math is pinned to; Math keeps only its own
+    assert report["stats"]["slots_before"] == 28
+    assert report["stats"]["slots_after"] == 2 + 12
+    assert len(solver.make_timetable(state, seed=0, time_limit=5, workers=1)) == 5
+
+
+def test_unknown_teacher_is_a_warning_not_an_issue():
+    report = solver.analyze(_state([("Math", "T9", {"classes_per_week": 1})]))
+    assert report["feasible"] and [w["code"] for w in report["warnings"]] == ["unknown_teacher"]
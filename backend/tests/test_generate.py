@@ -0,0 +1,12 @@
+# backend/tests/test_generate.py
+import pytest
+
+from backend import main, solver
+
+
+@pytest.mark.parametrize("processes, share", [(3, 1), (2, 2), (1, 3)])
+def test_time_limit_is_the_budget_for_the_whole_generate(monkeypatch, processes, share):
+    monkeypatch.setattr(main, "SOLVER_PROCESSES", processes)
+    options = main._solver_options({"config": {}}, main.GenerateRequest(time_limit_seconds=30))
+    assert options["time_limit"] == 30 / share
+    assert options["workers"] == solver.default_workers(processes)
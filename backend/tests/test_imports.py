@@ -0,0 +1,88 @@
+# backend/tests/test_imports.py
+import json
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from backend import imports, storage
+from backend.auth import get_current_user
+
+NDJSON = {"Content-Type": "application/x-ndjson"}
+
+
+@pytest.fixture
+def client(fresh_storage):
+    app = FastAPI()
+    app.include_router(imports.router)
+    app.dependency_overrides[get_current_user] = lambda: {"username": "admin", "role": "admin"}
+    return TestClient(app)
+
+
+def _ndjson(*rows):
+    return "\n".join(r if isinstance(r, str) else json.dumps(r) for r in rows)
+
+
+def test_row_errors_carry_their_line_numbers(client):
+    body = _ndjson({"name": "R1", "capacity": 30}, {"name": "R2", "capacity": 0}, '{"name": "R3", ', {"name": "R4", "capacity": 5})
+    r = client.post("/import/rooms", content=body, headers=NDJSON)
+    assert r.status_code == 422
+    report = r.json()["detail"]
+    assert (report["received"], report["valid"], report["inserted"]) == (4, 2, 0)
+    assert [e["row"] for e in report["errors"]] == [2, 3]
+    assert report["errors"][0]["errors"][0]["loc"] == ["capacity"]
+    assert report["errors"][1]["errors"][0]["msg"].startswith("Invalid JSON")
+    assert storage.find("rooms") == []
+
+    r = client.post("/import/rooms?skip_invalid=true", content=body, headers=NDJSON)
+    assert r.status_code == 200 and r.json()["inserted"] == 2
+    assert sorted(room["name"] for room in storage.find("rooms")) == ["R1", "R4"]
+
+
+def test_csv_rows_split_list_cells(client):
+    body = "name,code,max_load,avail_periods\nAda,T1,10,1;2;3\nBob,T2,5,\"[4, 5]\"\n"
+    r = client.post("/import/teachers", content=body, headers={"Content-Type": "text/csv"})
+    assert r.status_code == 200, r.text
+    assert [list(t["avail_periods"]) for t in storage.find("teachers")] == [[1, 2, 3], [4, 5]]
+
+
+@pytest.mark.parametrize("fmt, body", [
+    ("ndjson", _ndjson(*({"name": f"R{i}", "capacity": 1} for i in range(3)), "not json either")),
+    ("csv", "name,capacity\n" + "".join(f"R{i},1\n" for i in range(4))),
+    ("json", json.dumps([{"name": f"R{i}", "capacity": 1} for i in range(4)])),
+])
+def test_row_cap(client, monkeypatch, fmt, body):
+    monkeypatch.setattr(imports, "MAX_IMPORT_ROWS", 3)
+    assert len(imports._parse_rows(body.encode(), fmt, imports.IMPORT_MODELS["rooms"])) == 4
+    r = client.post(f"/import/rooms?format={fmt}", content=body)
+    assert r.status_code == 413
+    assert storage.find("rooms") == []
+
+
+def test_row_cap_stops_parsing_early(monkeypatch):
+    monkeypatch.setattr(imports, "MAX_IMPORT_ROWS", 2)
+    parsed = []
+
+    def rows(text):
+        for row in real(text):
+            parsed.append(row)
+            yield row
+
+    real = imports._ndjson_rows
+    monkeypatch.setattr(imports, "_ndjson_rows", rows)
+    imports._parse_rows(_ndjson(*({"n": i} for i in range(100))).encode(), "ndjson", None)
+    assert len(parsed) == 3
+
+
+def test_oversized_body_is_refused(client, monkeypatch):
+    monkeypatch.setattr(imports, "MAX_IMPORT_BYTES", 100)
+    body = _ndjson(*({"name": f"Room {i}", "capacity": 1} for i in range(10)))
+    r = client.post("/import/rooms", content=body, headers=NDJSON)
+    assert r.status_code == 413
+
+    def chunks():                    # no Content-Length: capped while reading
+        yield body.encode()
+
+    r = client.post("/import/rooms", content=chunks(), headers=NDJSON)
+    assert r.status_code == 413
+    assert storage.find("rooms") == []
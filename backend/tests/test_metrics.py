@@ -0,0 +1,42 @@
+# backend/tests/test_metrics.py
+import pytest
+from fastapi.testclient import TestClient
+
+from backend import auth, main, metrics, storage
+
+
+@pytest.fixture
+def client(fresh_storage, monkeypatch):
+    monkeypatch.setattr(metrics, "SCRAPE_TOKEN", "scrape-secret")
+    storage.insert("users", [{"username": "root", "hashed_password": "-", "role": "admin"},
+                             {"username": "f1", "hashed_password": "-", "role": "faculty"}])
+    return TestClient(main.app)   # no lifespan: the solver pool isn't started
+
+
+def _bearer(token):
+    return {"Authorization": f"Bearer {token}"}
+
+
+def _login(username):
+    return _bearer(auth.create_access_token({"sub": username, "tenant": storage.DEFAULT_TENANT}))
+
+
+@pytest.mark.skipif(not metrics.ENABLED, reason="TIMETABLE_METRICS=0")
+@pytest.mark.parametrize("headers, status", [
+    ({}, 401),
+    (_bearer("wrong"), 401),
+    (_bearer("scrape-secret"), 200),
+    ("root", 200),
+    ("f1", 403),
+])
+def test_metrics_needs_the_scrape_token_or_the_operator(client, headers, status):
+    r = client.get("/metrics", headers=_login(headers) if isinstance(headers, str) else headers)
+    assert r.status_code == status
+    if status == 200:
+        assert "timetable_http_request_duration_seconds" in r.text
+
+
+def test_no_scrape_token_means_operator_only(client, monkeypatch):
+    monkeypatch.setattr(metrics, "SCRAPE_TOKEN", None)
+    assert client.get("/metrics", headers=_bearer("scrape-secret")).status_code == 401
+    assert client.get("/metrics", headers=_login("root")).status_code == (200 if metrics.ENABLED else 404)
@@ -0,0 +1,43 @@
+# backend/tests/test_repair.py
+"""Repair frees only the subjects a change breaks (plus their batch/teacher neighbours)."""
+from backend import solver, week
+
+CONFIG = week.solver_config({"days": ["Mon", "Tue", "Wed"]})
+
+
+def _state():
+    subjects = [("Math", "A", "T1"), ("Eng", "A", "T2"), ("Phys", "B", "T3"), ("Chem", "B", "T4")]
+    return {
+        "config": CONFIG,
+        "rooms": [{"name": "R1", "capacity": 40}, {"name": "R2", "capacity": 40}],
+        "teachers": [{"code": t} for t in ("T1", "T2", "T3", "T4")],
+        "batches": {b: {"name": b, "size": 30} for b in ("A", "B")},
+        "subjects": [{"name": name, "code": name, "batch": batch, "teacher_code": teacher, "classes_per_week": 4}
+                     for name, batch, teacher in subjects],
+    }
+
+
+def _slots(timetable, batch):
+    return sorted((e["day"], e["period"], e["subject"], e["room"]) for e in timetable if e["batch"] == batch)
+
+
+def test_repair_keeps_untouched_batches_fixed():
+    state = _state()
+    previous = solver.make_timetable(state, seed=0, time_limit=10, workers=1)
+
+    result = solver.repair_timetable(state, previous, {"T1": ["Mon"]}, time_limit=10, workers=1)
+    timetable = result["timetable"]
+    assert result["scope"] == "neighborhood"
+    assert result["freed_subjects"] == 2                   # Math and its batch-mate Eng
+    assert not [e for e in timetable if e["subject"] == "Math" and e["day"] == "Mon"]
+    assert len([e for e in timetable if e["batch"] == "A"]) == 8
+    assert _slots(timetable, "B") == _slots(previous, "B")
+    assert result["moved"] == len(set(_slots(timetable, "A")) - set(_slots(previous, "A")))
+
+
+def test_repair_with_no_change_moves_nothing():
+    state = _state()
+    previous = solver.make_timetable(state, seed=0, time_limit=10, workers=1)
+    result = solver.repair_timetable(state, previous, {}, time_limit=10, workers=1)
+    assert result["moved"] == 0 and result["freed_subjects"] == 0
+    assert _slots(result["timetable"], "A") == _slots(previous, "A")
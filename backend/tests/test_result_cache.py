@@ -0,0 +1,75 @@
+# backend/tests/test_result_cache.py
+import threading
+from collections import OrderedDict
+
+import pytest
+
+from backend import main, result_cache
+
+
+@pytest.fixture
+def cache(tmp_path, monkeypatch):
+    """An empty result cache persisting under tmp_path."""
+    monkeypatch.setattr(result_cache, "_entries", OrderedDict())
+    monkeypatch.setattr(result_cache, "_bytes", 0)
+    monkeypatch.setattr(result_cache, "CACHE_DIR", str(tmp_path))
+    return tmp_path
+
+
+def test_problem_key_is_canonical():
+    key = result_cache.problem_key({"a": 1, "b": [1, 2]}, (3, 4), 7)
+    assert key == result_cache.problem_key({"b": (1, 2), "a": 1}, [3, 4], 7)
+    assert key != result_cache.problem_key({"a": 1, "b": [2, 1]}, (3, 4), 7)
+    assert key != result_cache.problem_key({"a": 1, "b": [1, 2]}, (3, 4), 8)
+    assert result_cache.problem_key(1, namespace="c1") == "c1/" + result_cache.problem_key(1)
+
+
+def test_persisted_entries_survive_a_restart(cache, monkeypatch):
+    result_cache.put("c1/k", [{"x": 1}])
+    monkeypatch.setattr(result_cache, "_entries", OrderedDict())
+    assert result_cache.get("c1/k") == [{"x": 1}]
+    assert result_cache.clear("c1") == 1 and result_cache.get("c1/k") is None
+
+
+def test_concurrent_puts_of_one_key_leave_no_temp_files(cache):
+    errors = []
+
+    def put(i):
+        try:
+            for _ in range(20):
+                result_cache.put("k", [i] * 100)
+        except Exception as e:   # noqa: BLE001 - any error fails the test below
+            errors.append(e)
+
+    threads = [threading.Thread(target=put, args=(i,)) for i in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert not errors
+    assert [p.name for p in cache.iterdir()] == ["k.json"]
+
+
+def test_disk_is_pruned_to_max_entries(cache, monkeypatch):
+    monkeypatch.setattr(result_cache, "MAX_ENTRIES", 3)
+    (cache / "old").mkdir()
+    (cache / "old" / "left-by-an-earlier-run.json").write_text("[]", encoding="utf-8")
+    for i in range(5):
+        result_cache.put(f"k{i}", [i])
+    assert len(list(cache.rglob("*.json"))) == 3
+
+
+@pytest.mark.parametrize("solved, cached", [(main.CANDIDATE_COUNT, True), (main.CANDIDATE_COUNT - 1, False)])
+def test_only_complete_candidate_sets_are_cached(cache, monkeypatch, solved, cached):
+    calls = []
+
+    def generate(solver_state, count, options, seed, job=None):
+        calls.append(seed)
+        return [{"candidate": i} for i in range(solved)]
+
+    monkeypatch.setattr(main, "_generate_candidates", generate)
+    for _ in range(2):
+        candidates, hit = main._cached_candidates({"subjects": []}, {"time_limit": 1}, seed=0)
+        assert len(candidates) == solved
+    assert hit is cached
+    assert len(calls) == (1 if cached else 2)
@@ -0,0 +1,82 @@
+# backend/tests/test_soft_constraints.py
+"""
+Solver objective vs scorer: with every class pinned by fixed_slots, the
+objective CP-SAT reports for a soft constraint must equal weight x SCALE
+times what the scorer counts on the resulting timetable.
+"""
+import pytest
+
+from backend import scoring, soft_constraints, solver, week
+
+# Mon/Tue, default day: periods 1-3, lunch (4), periods 5-8
+CONFIG = week.solver_config({"days": ["Mon", "Tue"]})
+
+
+def _state(*subjects):
+    return {
+        "config": CONFIG,
+        "rooms": [{"name": "R1", "capacity": 40}, {"name": "R2", "capacity": 40}],
+        "teachers": [{"code": "T1"}, {"code": "T2"}],
+        "batches": {"A": {"name": "A", "size": 30}},
+        "subjects": [{"name": name, "code": name, "batch": "A", "teacher_code": teacher,
+                      "classes_per_week": len(slots), "fixed_slots": slots, **extra}
+                     for name, teacher, slots, extra in subjects],
+    }
+
+
+def _objective_and_count(state, name, params=None):
+    soft = soft_constraints.resolve([{"name": name, "weight": 1, "params": params or {}}])
+    objectives = []
+    timetable = solver.make_timetable(
+        state, seed=0, time_limit=10, workers=1, soft=soft, gap_limit=0,
+        should_stop=None, on_progress=lambda info: objectives.append(info["objective"]) if info["phase"] == "time" else None)
+    values = scoring.metrics(timetable, scoring.Context.from_solver_state(state), soft)
+    assert objectives, "the time phase reported no solution"
+    # No objective at all when the pinned classes leave the constraint nothing to count
+    return (objectives[-1] or 0) / soft_constraints.SCALE, values
+
+
+SPREAD_CASES = [
+    # (subjects, spread_days count)
+    ([("Math", "T1", ["Mon-1", "Mon-2"], {})], 1),                     # back-to-back singles are two classes
+    ([("Math", "T1", ["Mon-1", "Mon-5"], {})], 1),
+    ([("Math", "T1", ["Mon-1", "Tue-1"], {})], 0),
+    ([("Math", "T1", ["Mon-1", "Mon-2", "Mon-3"], {})], 2),
+    ([("Lab", "T1", ["Mon-5", "Mon-7"], {"duration": 2})], 1),         # back-to-back doubles
+    ([("Lab", "T1", ["Mon-1", "Tue-5"], {"duration": 2})], 0),         # a double period is one class
+    ([("Lab", "T1", ["Mon-5", "Tue-5"], {"lab": True})], 0),           # lab length 100 min = 2 periods
+    ([("Math", "T1", ["Mon-1", "Mon-2"], {}), ("Phys", "T2", ["Mon-3", "Tue-1"], {})], 1),
+]
+
+
+@pytest.mark.parametrize("subjects,expected", SPREAD_CASES)
+def test_spread_days_scorer_matches_objective(subjects, expected):
+    objective, values = _objective_and_count(_state(*subjects), "spread_days")
+    assert objective == values["spread_days"] == values["subject_repeats"] == expected
+
+
+SCHEDULE = [
+    ("Math", "T1", ["Mon-1", "Mon-2", "Tue-8"], {}),
+    ("Phys", "T2", ["Mon-3", "Mon-5", "Tue-1"], {}),
+    ("Lab", "T1", ["Mon-6", "Tue-5"], {"duration": 2}),
+]
+
+
+@pytest.mark.parametrize("name,params", [
+    ("avoid_last_slot", {}),
+    ("spread_days", {}),
+    ("max_consecutive", {"max": 2}),
+    ("max_consecutive", {"max": 1, "owner": "teacher"}),
+    ("preferred_periods", {"periods": [1, 2, 3], "teachers": {"T2": [5, 6]}}),
+])
+def test_every_constraint_scorer_matches_objective(name, params):
+    objective, values = _objective_and_count(_state(*SCHEDULE), name, params)
+    assert objective == values[name]
+
+
+def test_soft_constraint_replaces_builtin_metric():
+    soft = soft_constraints.resolve([{"name": "spread_days"}, {"name": "avoid_last_slot", "weight": 2}])
+    weights = scoring.weights(soft)
+    assert "subject_repeats" not in weights and "last_period" not in weights
+    assert weights["spread_days"] == 1 and weights["avoid_last_slot"] == 2
+    assert "subject_repeats" in scoring.weights([])
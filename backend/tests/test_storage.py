@@ -0,0 +1,188 @@
+# backend/tests/test_storage.py
+import json
+import threading
+
+import pytest
+
+from backend import storage
+from backend.sqlite_storage import SqliteBackend
+from backend.storage import JsonFileBackend
+
+
+def _names(backend, kind="rooms"):
+    return sorted(e["name"] for e in backend.find(kind))
+
+
+# ------------------- Backends -------------------
+
+def test_sqlite_import_replays_the_json_journal(tmp_path):
+    source = JsonFileBackend(tmp_path / "data.json")
+    source.save_state({**storage.empty_state(), "rooms": [{"name": "R1"}]})
+    source.compact()
+    source.insert("rooms", [{"name": "R2"}])   # only in data.json.log
+
+    db = SqliteBackend(tmp_path / "data.db", import_from=tmp_path / "data.json")
+    assert _names(db) == ["R1", "R2"]
+    assert JsonFileBackend.SEQ_KEY not in db.get_state()
+
+
+# ------------------- Journal -------------------
+
+def test_torn_journal_tail_is_dropped_on_replay(tmp_path):
+    backend = JsonFileBackend(tmp_path / "data.json")
+    backend.insert("rooms", [{"name": "R1"}])
+    backend.insert("rooms", [{"name": "R2"}])
+    good = backend.journal_path.stat().st_size
+    with open(backend.journal_path, "a", encoding="utf-8") as f:
+        f.write('{"seq":3,"ts":1,"actor":null,"op":"insert","kind":"ro')   # crash mid-append
+
+    reopened = JsonFileBackend(tmp_path / "data.json")
+    assert _names(reopened) == ["R1", "R2"]
+    assert reopened.journal_path.stat().st_size == good
+    reopened.insert("rooms", [{"name": "R3"}])
+    assert _names(JsonFileBackend(tmp_path / "data.json")) == ["R1", "R2", "R3"]
+
+
+@pytest.mark.parametrize("lose", ["corrupt", "missing"])
+def test_journal_is_not_replayed_onto_a_lost_snapshot(tmp_path, lose):
+    backend = JsonFileBackend(tmp_path / "data.json")
+    backend.insert("rooms", [{"name": "R1"}])
+    backend.compact()
+    backend.insert("rooms", [{"name": "R2"}])
+    if lose == "corrupt":
+        backend.path.write_text('{"rooms": [', encoding="utf-8")
+    else:
+        backend.path.unlink()
+
+    with pytest.raises(RuntimeError):
+        JsonFileBackend(tmp_path / "data.json").read_state()
+
+
+def test_compaction_racing_writers_loses_nothing(tmp_path):
+    backend = JsonFileBackend(tmp_path / "data.json")
+    done = threading.Event()
+
+    def write(worker):
+        for i in range(40):
+            backend.insert("rooms", [{"name": f"R{worker}-{i}"}])
+
+    def compact():
+        while not done.is_set():
+            backend.compact()
+
+    compactor = threading.Thread(target=compact)
+    compactor.start()
+    writers = [threading.Thread(target=write, args=(w,)) for w in range(4)]
+    for t in writers:
+        t.start()
+    for t in writers:
+        t.join()
+    done.set()
+    compactor.join()
+
+    expected = sorted(f"R{w}-{i}" for w in range(4) for i in range(40))
+    assert _names(backend) == expected
+    assert _names(JsonFileBackend(tmp_path / "data.json")) == expected
+    seqs = [entry["seq"] for entry in backend.history(limit=1000)]
+    assert seqs == list(range(1, 161))
+
+
+def test_compaction_does_not_clobber_a_concurrent_save(tmp_path, monkeypatch):
+    backend = JsonFileBackend(tmp_path / "data.json")
+    backend.insert("rooms", [{"name": "Old"}])
+    write_temp = backend._write_temp
+
+    def save_meanwhile(path, text):
+        tmp = write_temp(path, text)
+        monkeypatch.setattr(backend, "_write_temp", write_temp)
+        backend.save_state({**storage.empty_state(), "rooms": [{"name": "New"}]})
+        return tmp
+
+    monkeypatch.setattr(backend, "_write_temp", save_meanwhile)
+    backend.compact()
+
+    assert _names(backend) == ["New"]
+    assert _names(JsonFileBackend(tmp_path / "data.json")) == ["New"]
+    assert not list(tmp_path.glob("*.tmp"))
+
+
+def test_password_hashes_never_reach_the_audit_trail(tmp_path):
+    backend = JsonFileBackend(tmp_path / "data.json")
+    hashed = "$2b$12$" + "x" * 53
+    backend.insert("users", [{"username": "a", "hashed_password": hashed}])
+    backend.update("users", {"username": "a"}, {"hashed_password": hashed})
+    backend.set_values({"users": [{"username": "b", "hashed_password": hashed}]})
+    assert "$2b$" not in json.dumps(backend.history())
+    backend.compact()
+    assert "$2b$" not in backend.archive_path.read_text(encoding="utf-8")
+    assert "$2b$" not in json.dumps(backend.history())
+    assert len(backend.history()) == 3
+
+
+# ------------------- Caching -------------------
+
+def test_read_state_is_cached_until_a_write(tmp_path):
+    backend = JsonFileBackend(tmp_path / "data.json")
+    backend.save_state({**storage.empty_state(), "rooms": [{"name": "R1"}]})
+    view, version = backend.read_state(), backend.version()
+    assert backend.read_state() is view
+    with pytest.raises(TypeError):
+        view["rooms"][0]["name"] = "changed"
+
+    backend.insert("rooms", [{"name": "R2"}])
+    assert backend.version() > version
+    assert backend.read_state() is not view
+    assert [r["name"] for r in backend.read_state()["rooms"]] == ["R1", "R2"]
+
+
+def test_read_state_picks_up_another_writer(tmp_path):
+    reader = JsonFileBackend(tmp_path / "data.json")
+    writer = JsonFileBackend(tmp_path / "data.json")
+    writer.save_state({**storage.empty_state(), "rooms": [{"name": "R1"}]})
+    assert _names(reader) == ["R1"]
+    version = reader.version()
+
+    writer.insert("rooms", [{"name": "R2"}])        # journal grows
+    assert _names(reader) == ["R1", "R2"]
+    writer.save_state({**storage.empty_state(), "rooms": [{"name": "R3"}]})   # snapshot replaced
+    assert _names(reader) == ["R3"]
+    assert reader.version() > version
+
+
+# ------------------- Atomic saves -------------------
+
+def test_save_state_leaves_no_temp_files(tmp_path):
+    backend = JsonFileBackend(tmp_path / "data.json")
+    for i in range(3):
+        backend.save_state({**storage.empty_state(), "rooms": [{"name": f"R{i}"}]})
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["data.json"]
+    assert json.loads(backend.path.read_text(encoding="utf-8"))["rooms"] == [{"name": "R2"}]
+
+
+def test_failed_save_keeps_the_previous_file(tmp_path, monkeypatch):
+    backend = JsonFileBackend(tmp_path / "data.json")
+    backend.save_state({**storage.empty_state(), "rooms": [{"name": "Old"}]})
+    before = backend.path.read_bytes()
+
+    def crash(*args):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(storage.os, "replace", crash)
+    with pytest.raises(OSError):
+        backend.save_state({**storage.empty_state(), "rooms": [{"name": "New"}]})
+    monkeypatch.undo()
+
+    assert backend.path.read_bytes() == before
+    assert not list(tmp_path.glob("*.tmp"))
+    assert _names(JsonFileBackend(tmp_path / "data.json")) == ["Old"]
+
+
+def test_unreadable_snapshot_is_quarantined_not_wiped(tmp_path):
+    backend = JsonFileBackend(tmp_path / "data.json")
+    backend.save_state({**storage.empty_state(), "rooms": [{"name": "R1"}]})
+    assert _names(backend) == ["R1"]
+    backend.path.write_text('{"rooms": [', encoding="utf-8")
+
+    assert _names(backend) == ["R1"]                # serves the last good copy
+    assert _names(JsonFileBackend(tmp_path / "data.json")) == []
+    assert [p.read_text(encoding="utf-8") for p in tmp_path.glob("data.json.corrupt-*")] == ['{"rooms": [']
@@ -0,0 +1,43 @@
+# backend/tests/test_tenants.py
+import pytest
+from fastapi import HTTPException
+
+from backend import storage, tenants
+
+
+def _rooms():
+    return [r["name"] for r in storage.find("rooms")]
+
+
+def test_each_college_has_its_own_shard(fresh_storage):
+    storage.create_tenant("c1")
+    storage.insert("rooms", [{"name": "Default hall"}])
+    with storage.tenant_scope("c1"):
+        assert _rooms() == []
+        storage.insert("rooms", [{"name": "C1 hall"}])
+        assert _rooms() == ["C1 hall"]
+    assert _rooms() == ["Default hall"]
+
+    assert (fresh_storage / "tenants" / "c1.json").exists()
+    assert storage.tenants() == ["c1", "default"]
+    assert storage.tenant_exists("c1") and not storage.tenant_exists("c2")
+
+
+@pytest.mark.parametrize("name", ["default", "c1", "Bad Name", "../etc"])
+def test_create_tenant_rejects_taken_and_invalid_names(fresh_storage, name):
+    storage.create_tenant("c1")
+    with pytest.raises(ValueError):
+        storage.create_tenant(name)
+
+
+def test_solve_slots_are_per_college(monkeypatch):
+    monkeypatch.setattr(tenants, "_slots", {})
+    monkeypatch.setattr(tenants, "MAX_SOLVES_PER_TENANT", 1)
+    with storage.tenant_scope("c1"), tenants.solve_slot():
+        with pytest.raises(HTTPException) as e, tenants.solve_slot():
+            pass
+        assert e.value.status_code == 429
+        with storage.tenant_scope("c2"), tenants.solve_slot():
+            pass                                   # another college is not held up
+    with storage.tenant_scope("c1"), tenants.solve_slot():
+        pass                                       # released on exit
@@ -0,0 +1,66 @@
+# backend/tests/test_timetable_views.py
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from backend import columnar, storage, timetable_views
+from backend.auth import get_current_user
+
+ROWS = [
+    {"day": "Mon", "period": 1, "room": "R1", "teacher": "T1", "subject": "Math", "batch": "A"},
+    {"day": "Mon", "period": 2, "room": "R1", "teacher": "T2", "subject": "Phys", "batch": "A"},
+    {"day": "Mon", "period": 1, "room": "R2", "teacher": "T2", "subject": "Phys", "batch": "B"},
+]
+
+
+@pytest.fixture
+def client(fresh_storage, monkeypatch):
+    monkeypatch.setattr(timetable_views, "_current", {})
+    storage.set_values({"latest_timetable": columnar.pack(ROWS),
+                        "rooms": [{"name": "R1", "capacity": 40}, {"name": "R2", "capacity": 40}]})
+    app = FastAPI()
+    app.include_router(timetable_views.router)
+    app.dependency_overrides[get_current_user] = lambda: {"username": "f1", "role": "faculty"}
+    return TestClient(app)
+
+
+def test_views_answer_304_until_the_timetable_changes(client):
+    r = client.get("/timetable/latest/batch/A")
+    assert r.status_code == 200 and [row["subject"] for row in r.json()] == ["Math", "Phys"]
+    etag = r.headers["ETag"]
+
+    r = client.get("/timetable/latest/batch/A", headers={"If-None-Match": etag})
+    assert r.status_code == 304 and r.headers["ETag"] == etag
+    assert client.get("/timetable/latest/batch/A", headers={"If-None-Match": f"W/{etag}, \"other\""}).status_code == 304
+    assert client.get("/timetable/latest/batch/B", headers={"If-None-Match": etag}).status_code == 200
+
+    storage.insert("teachers", [{"code": "T3"}])      # a write that leaves the timetable alone
+    assert client.get("/timetable/latest/batch/A", headers={"If-None-Match": etag}).status_code == 304
+
+    storage.set_value("latest_timetable", columnar.pack(ROWS[1:]))
+    r = client.get("/timetable/latest/batch/A", headers={"If-None-Match": etag})
+    assert r.status_code == 200 and r.headers["ETag"] != etag
+    assert [row["subject"] for row in r.json()] == ["Phys"]
+
+
+def test_free_etag_follows_the_entity_lists(client):
+    r = client.get("/timetable/latest/free/Mon-1")
+    assert r.status_code == 200 and r.json()["rooms"] == []
+    etag = r.headers["ETag"]
+
+    storage.insert("rooms", [{"name": "R3", "capacity": 40}])
+    r = client.get("/timetable/latest/free/Mon-1", headers={"If-None-Match": etag})
+    assert r.status_code == 200 and r.json()["rooms"] == ["R3"]
+
+
+def test_unknown_views_are_404(client):
+    assert client.get("/timetable/latest/teacher/T9").status_code == 404
+    assert client.get("/timetable/latest/slot/Mon-x").status_code == 400
+    assert client.get("/timetable/latest/slot/Sun-1").status_code == 404
+
+
+def test_slots_outside_the_week_grid_are_still_served(client):
+    storage.set_value("latest_timetable", columnar.pack([{**ROWS[0], "day": "Sun"}]))
+    r = client.get("/timetable/latest/slot/Sun-1")
+    assert r.status_code == 200 and [row["subject"] for row in r.json()] == ["Math"]
+    assert client.get("/timetable/latest/free/Sun-1").json()["start"] is None
@@ -9,9 +9,10 @@ router = APIRouter(prefix="/timetable", tags=["timetable"])
 @router.post("/generate")
 def generate_timetable(user: dict = Depends(get_current_user)):
     # get stored teachers/rooms/batches (demo only)
-    teachers = storage.get_state().get("teachers", [])
-    rooms = storage.get_state().get("rooms", [])
-    batches = storage.get_state().get("batches", [])
+    state = storage.read_state()
+    teachers = state.get("teachers", [])
+    rooms = state.get("rooms", [])
+    batches = state.get("batches", [])
 
     timetable = []
     days = ["Mon", "Tue", "Wed", "Thu", "Fri"]
@@ -34,4 +35,4 @@ def generate_timetable(user: dict = Depends(get_current_user)):
 # ✅ get latest timetable
 @router.get("/latest")
 def get_latest_timetable(user: dict = Depends(get_current_user)):
-    return storage.get_state().get("timetable", [])
+    return storage.read_state().get("timetable", [])
@@ -0,0 +1,162 @@
+# backend/timetable_views.py
+import hashlib
+import json
+import threading
+from typing import Dict, List, Tuple
+
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
+from fastapi.responses import JSONResponse
+
+from . import columnar, storage, week
+from .auth import get_current_user
+
+router = APIRouter(prefix="/timetable/latest", tags=["timetable"])
+
+INDEXED = ("batch", "teacher", "room")
+
+
+# ------------------- Index -------------------
+
+class _Index:
+    """Row numbers of the finalized timetable by batch, teacher, room and (day, period)."""
+
+    def __init__(self, latest, etag: str):
+        self.etag = etag
+        self.timetable = columnar.unpack(latest)
+        tt = self.timetable
+        self.by: Dict[str, Dict[object, List[int]]] = {c: {} for c in INDEXED}
+        for c in INDEXED:
+            table, index = tt.tables[c], self.by[c]
+            for i, code in enumerate(tt.codes[c]):
+                index.setdefault(table[code], []).append(i)
+        self.by_slot: Dict[tuple, List[int]] = {}
+        days, periods = tt.tables["day"], tt.tables["period"]
+        for i, (d, p) in enumerate(zip(tt.codes["day"], tt.codes["period"])):
+            self.by_slot.setdefault((days[d], periods[p]), []).append(i)
+
+    def rows(self, numbers: List[int]) -> List[dict]:
+        return [self.timetable.row(i) for i in numbers]
+
+
+_current: Dict[str, Tuple[object, _Index]] = {}   # tenant -> (storage version, index)
+_lock = threading.Lock()
+
+
+def _hash(value) -> str:
+    text = json.dumps(value, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+def current_index() -> _Index:
+    """
+    The current tenant's index for latest_timetable. Storage writes bump the
+    version; the index is only rebuilt when the timetable itself changed
+    (finalize, repair).
+    """
+    tenant = storage.current_tenant()
+    version = storage.state_version()
+    with _lock:
+        hit = _current.get(tenant)
+        if hit is not None and hit[0] == version:
+            return hit[1]
+    latest = storage.get_value("latest_timetable")
+    etag = _hash(latest)
+    with _lock:
+        hit = _current.get(tenant)
+        index = hit[1] if hit is not None and hit[1].etag == etag else _Index(latest, etag)
+        _current[tenant] = (version, index)
+        return index
+
+
+# ------------------- Responses -------------------
+
+def conditional(request: Request, etag: str, build) -> Response:
+    """304 when the client already has this version, else the JSON from build()."""
+    tag = f'"{etag}"'
+    sent = request.headers.get("if-none-match", "")
+    if sent.strip() == "*" or tag in [t.strip().removeprefix("W/") for t in sent.split(",")]:
+        return Response(status_code=304, headers={"ETag": tag})
+    return JSONResponse(build(), headers={"ETag": tag, "Cache-Control": "no-cache"})
+
+
+def _view(request: Request, column: str, value: str) -> Response:
+    index = current_index()
+    numbers = index.by[column].get(value)
+    if numbers is None:
+        raise HTTPException(404, detail=f"No {column} '{value}' in the finalized timetable")
+    return conditional(request, f"{index.etag[:20]}-{column}-{_hash(value)[:8]}", lambda: index.rows(numbers))
+
+
+def current_grid() -> week.Grid:
+    """The current tenant's week, compiled once per distinct config."""
+    return week.compile(week.solver_config(storage.get_value("config") or {}))
+
+
+def _parse_slot(slot: str, grid: week.Grid, index: _Index):
+    """
+    (day, period) of a slot such as Tue-3 and its (d, q) cell in the week,
+    None when only the timetable has it (solved with request periods or an
+    older config). 404 when neither does.
+    """
+    try:
+        day, period = slot.split("-")
+        q = int(period)
+    except ValueError:
+        raise HTTPException(400, detail=f"Invalid slot '{slot}', expected e.g. Tue-3")
+    try:
+        d, q = grid.parse(slot)
+    except ValueError as e:
+        if (day, q) not in index.by_slot:
+            raise HTTPException(404, detail=str(e))
+        return (day, q), None
+    return (grid.days[d], q), (d, q)
+
+
+# ------------------- Routes -------------------
+
+@router.get("/batch/{name}")
+def batch_timetable(name: str, request: Request, current_user: dict = Depends(get_current_user)):
+    return _view(request, "batch", name)
+
+
+@router.get("/teacher/{code}")
+def teacher_timetable(code: str, request: Request, current_user: dict = Depends(get_current_user)):
+    return _view(request, "teacher", code)
+
+
+@router.get("/room/{name}")
+def room_timetable(name: str, request: Request, current_user: dict = Depends(get_current_user)):
+    return _view(request, "room", name)
+
+
+@router.get("/slot/{slot}")
+def slot_timetable(slot: str, request: Request, current_user: dict = Depends(get_current_user)):
+    """Every class running at a slot such as Tue-3."""
+    index = current_index()
+    key, _ = _parse_slot(slot, current_grid(), index)
+    numbers = index.by_slot.get(key, [])
+    return conditional(request, f"{index.etag[:20]}-slot-{_hash(key)[:8]}", lambda: index.rows(numbers))
+
+
+@router.get("/free/{slot}")
+def free_at(slot: str, request: Request, current_user: dict = Depends(get_current_user)):
+    """Rooms, teachers and batches with nothing scheduled at a slot such as Tue-3."""
+    grid = current_grid()
+    index = current_index()
+    key, cell = _parse_slot(slot, grid, index)
+    busy = {c: {row[c] for row in index.rows(index.by_slot.get(key, []))} for c in INDEXED}
+    everyone = {
+        "room": [r.get("name") for r in storage.find("rooms")],
+        "teacher": [t.get("code") for t in storage.find("teachers")],
+        "batch": [b.get("name") for b in storage.find("batches")],
+    }
+    plural = {"room": "rooms", "teacher": "teachers", "batch": "batches"}
+    free = {plural[c]: [v for v in everyone[c] if v not in busy[c]] for c in INDEXED}
+    if cell is None:   # not in the current week: no times to show
+        when = {"start": None, "end": None, "teaching": None}
+    else:
+        period = grid.periods[cell[0]][cell[1] - 1]
+        when = {"start": period.get("start"), "end": period.get("end"), "teaching": grid.is_open(*cell)}
+    # Depends on the entity lists and the day grid too, so they are part of the tag
+    etag = f"{index.etag[:20]}-free-{_hash([key, everyone, when])[:8]}"
+    return conditional(request, etag, lambda: {"slot": slot, **when, **free})
@@ -0,0 +1,255 @@
+# backend/week.py
+import json
+import math
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, FrozenSet, List, Optional, Sequence, Tuple
+
+DEFAULT_DAYS = ["Mon", "Tue", "Wed", "Thu", "Fri"]
+DEFAULT_START, DEFAULT_END = "09:00", "16:00"
+DEFAULT_PERIOD_MINUTES = 50
+DEFAULT_LUNCH_AFTER = 3      # the period after this one is lunch (single-shift days only)
+DEFAULT_LAB_MINUTES = 100
+CACHE_SIZE = 64              # compiled grids kept; one per distinct config
+
+Cell = Tuple[int, int]       # (day index, 1-based period)
+
+
+# ------------------- Config -> periods -------------------
+
+def _minutes(text: Optional[str], default: str) -> int:
+    try:
+        h, m = (text or default).split(":")
+        return int(h) * 60 + int(m)
+    except (AttributeError, ValueError):
+        h, m = default.split(":")
+        return int(h) * 60 + int(m)
+
+
+def _hhmm(minutes: int) -> str:
+    return f"{minutes // 60:02d}:{minutes % 60:02d}"
+
+
+def _shift_periods(start: int, end: int, length: int, lunch_after: Optional[int], shift: Optional[str],
+                   first: int) -> List[dict]:
+    """Back-to-back periods of `length` minutes from start to end; period lunch_after + 1 is lunch."""
+    periods = []
+    cur, idx = start, 1
+    while length > 0 and cur + length <= end:
+        lunch = lunch_after is not None and idx == lunch_after + 1
+        period = {
+            "name": "Lunch" if lunch else f"Period {first + idx - 1}",
+            "start": _hhmm(cur),
+            "end": _hhmm(cur + length),
+            "is_lunch": lunch,
+        }
+        if shift is not None:
+            period["shift"] = shift
+        periods.append(period)
+        cur += length
+        idx += 1
+    return periods
+
+
+def _day_periods(cfg: Dict[str, Any]) -> List[dict]:
+    """One day's periods from times: a single start/end range, or several `shifts`."""
+    if cfg.get("periods"):
+        return [dict(p) for p in cfg["periods"]]
+    length = int(cfg.get("period_length_minutes") or DEFAULT_PERIOD_MINUTES)
+    shifts = cfg.get("shifts")
+    if not shifts:
+        lunch_after = cfg.get("lunch_after_period")
+        return _shift_periods(_minutes(cfg.get("start_time"), DEFAULT_START), _minutes(cfg.get("end_time"), DEFAULT_END),
+                              length, DEFAULT_LUNCH_AFTER if lunch_after is None else int(lunch_after), None, 1)
+    periods: List[dict] = []
+    for n, shift in enumerate(shifts):
+        lunch_after = shift.get("lunch_after_period")
+        periods += _shift_periods(
+            _minutes(shift.get("start_time"), DEFAULT_START), _minutes(shift.get("end_time"), DEFAULT_END),
+            int(shift.get("period_length_minutes") or length),
+            None if lunch_after is None else int(lunch_after),
+            str(shift.get("name") or f"Shift {n + 1}"),
+            len(periods) + 1,
+        )
+    return periods
+
+
+def solver_config(config: Dict[str, Any], periods: Optional[List[dict]] = None) -> Dict[str, Any]:
+    """
+    The "config" part of solver_state: the stored config's times, shifts and
+    per-day overrides expanded into period lists. `periods` (from a generate
+    request) replaces the default day's. compile() turns this into a Grid.
+    """
+    base = [dict(p) for p in periods] if periods else _day_periods(config)
+    overrides = config.get("day_overrides") or {}
+    out = {
+        "days": config.get("days") or list(DEFAULT_DAYS),
+        "periods_per_day": int(config.get("periods_per_day") or len(base) or 6),
+        "periods": base,
+        "lab_length_minutes": int(config.get("lab_length_minutes") or DEFAULT_LAB_MINUTES),
+    }
+    if overrides:
+        out["day_periods"] = {day: _day_periods(_override(config, o)) for day, o in overrides.items()}
+    return out
+
+
+def _override(config: Dict[str, Any], override: Dict[str, Any]) -> Dict[str, Any]:
+    """A day's settings: its own fields, then the config's, minus what its own fields replace."""
+    own = {k: v for k, v in (override or {}).items() if v is not None}
+    merged = {**config, **own}
+    if "periods" not in own and own:
+        merged.pop("periods", None)      # the day is cut from times
+        if "shifts" not in own and ("start_time" in own or "end_time" in own):
+            merged.pop("shifts", None)   # ... one range of them
+    return merged
+
+
+# ------------------- Grid -------------------
+
+class Grid:
+    """
+    The week compiled into integer form: days x periods, each cell with a
+    global slot id (day * n_periods + period - 1), the teaching cells, the
+    contiguous teaching runs of each day (lunch and shift changes end a run),
+    and per session length the set of cells it may start at. Immutable and
+    shared: get one from compile().
+    """
+
+    __slots__ = ("days", "day_index", "n_days", "n_periods", "n_slots", "periods", "teaching", "open", "blocked",
+                 "runs", "last_period", "lab_periods", "_starts", "_lock")
+
+    def __init__(self, days: Sequence[str], periods: Sequence[Sequence[dict]], lab_length_minutes: int):
+        self.days: Tuple[str, ...] = tuple(days)
+        self.day_index = {d: i for i, d in enumerate(self.days)}
+        self.n_days = len(self.days)
+        self.periods: Tuple[Tuple[dict, ...], ...] = tuple(tuple(day) for day in periods)
+        self.n_periods = max((len(day) for day in self.periods), default=0)
+        self.n_slots = self.n_days * self.n_periods
+
+        teaching, runs, last = [], [], []
+        for day in self.periods:
+            row = [False] * (self.n_periods + 1)   # index 0 unused, periods are 1-based
+            day_runs: List[Tuple[int, int]] = []
+            for q, period in enumerate(day, start=1):
+                if period.get("is_lunch"):
+                    continue
+                row[q] = True
+                if day_runs and row[q - 1] and day[q - 2].get("shift") == period.get("shift"):
+                    day_runs[-1] = (day_runs[-1][0], day_runs[-1][1] + 1)
+                else:
+                    day_runs.append((q, 1))
+            teaching.append(tuple(row))
+            runs.append(tuple(day_runs))
+            last.append(max((q for q, ok in enumerate(row) if ok), default=0))
+        self.teaching: Tuple[Tuple[bool, ...], ...] = tuple(teaching)
+        self.runs: Tuple[Tuple[Tuple[int, int], ...], ...] = tuple(runs)   # per day: (first period, length)
+        self.last_period: Tuple[int, ...] = tuple(last)                    # per day, 0 when none
+        self.open: FrozenSet[Cell] = frozenset(
+            (d, q) for d, row in enumerate(self.teaching) for q in range(1, self.n_periods + 1) if row[q])
+        self.blocked: FrozenSet[Cell] = frozenset(
+            (d, q) for d in range(self.n_days) for q in range(1, self.n_periods + 1)) - self.open
+        self.lab_periods = max(1, math.ceil(lab_length_minutes / self._period_minutes()))
+        self._starts: Dict[int, FrozenSet[Cell]] = {}
+        self._lock = threading.Lock()
+
+    def _period_minutes(self) -> int:
+        for day in self.periods:
+            for p in day:
+                if p.get("start") and p.get("end") and not p.get("is_lunch"):
+                    length = _minutes(p["end"], DEFAULT_END) - _minutes(p["start"], DEFAULT_START)
+                    if length > 0:
+                        return length
+        return DEFAULT_PERIOD_MINUTES
+
+    # ---- slots ----
+
+    def slot(self, d: int, q: int) -> int:
+        return d * self.n_periods + q - 1
+
+    def cell(self, slot: int) -> Cell:
+        d, r = divmod(slot, self.n_periods)
+        return d, r + 1
+
+    def is_open(self, d: int, q: int) -> bool:
+        return 0 < q <= self.n_periods and self.teaching[d][q]
+
+    def starts(self, duration: int) -> FrozenSet[Cell]:
+        """Every (day, first period) where `duration` teaching periods in a row fit inside one run."""
+        hit = self._starts.get(duration)
+        if hit is None:
+            hit = frozenset((d, first + k) for d, day_runs in enumerate(self.runs)
+                            for first, length in day_runs for k in range(length - duration + 1))
+            with self._lock:
+                hit = self._starts.setdefault(duration, hit)
+        return hit
+
+    def class_periods(self, subject: Dict[str, Any]) -> int:
+        """Periods one class of a stored subject takes: its duration, else lab_periods for a lab."""
+        return max(1, int(subject.get("duration") or (self.lab_periods if subject.get("lab") else 1)))
+
+    def teaching_periods(self, d: int) -> List[int]:
+        return [q for q in range(1, self.n_periods + 1) if self.teaching[d][q]]
+
+    def open_count(self, avail=None) -> int:
+        """Teaching cells in the week, only counting periods in `avail` when given."""
+        if not avail:
+            return len(self.open)
+        return sum(1 for _, q in self.open if q in avail)
+
+    def label(self, d: int, q: int) -> str:
+        return f"{self.days[d]}-{q}"
+
+    def parse(self, slot: str) -> Cell:
+        """Parse a slot such as Tue-3 into (day index, period); ValueError when it isn't in the week."""
+        day, period = slot.split("-")
+        d, q = self.day_index[day] if day in self.day_index else -1, int(period)
+        if d < 0 or not 0 < q <= len(self.periods[d]):
+            raise ValueError(f"No slot {slot} in the week")
+        return d, q
+
+    def describe(self) -> Dict[str, Any]:
+        """The grid as JSON: per day its periods with slot ids, teaching flag and runs."""
+        return {
+            "days": list(self.days),
+            "n_periods": self.n_periods,
+            "n_slots": self.n_slots,
+            "teaching_slots": len(self.open),
+            "lab_periods": self.lab_periods,
+            "grid": [{
+                "day": day,
+                "periods": [{**p, "period": q, "slot": self.slot(d, q), "teaching": self.teaching[d][q]}
+                            for q, p in enumerate(self.periods[d], start=1)],
+                "runs": [{"first": first, "length": length} for first, length in self.runs[d]],
+            } for d, day in enumerate(self.days)],
+        }
+
+
+# ------------------- Compile cache -------------------
+
+_cache: "OrderedDict[str, Grid]" = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def compile(config: Dict[str, Any]) -> Grid:
+    """
+    The Grid of a solver_state config (see solver_config()), built once per
+    distinct config. Without `periods` every day gets `periods_per_day`
+    plain periods, as solver_state built by hand (tests, scripts) expects.
+    """
+    key = json.dumps([config.get(k) for k in ("days", "periods", "day_periods", "periods_per_day",
+                                              "lab_length_minutes")], sort_keys=True, default=str)
+    with _cache_lock:
+        grid = _cache.get(key)
+        if grid is not None:
+            _cache.move_to_end(key)
+            return grid
+    days = list(config.get("days") or DEFAULT_DAYS)
+    base = config.get("periods") or [{"name": f"Period {q}"} for q in range(1, int(config.get("periods_per_day", 6)) + 1)]
+    by_day = config.get("day_periods") or {}
+    grid = Grid(days, [by_day.get(day) or base for day in days],
+                int(config.get("lab_length_minutes") or DEFAULT_LAB_MINUTES))
+    with _cache_lock:
+        _cache[key] = grid
+        while len(_cache) > CACHE_SIZE:
+            _cache.popitem(last=False)
+    return grid